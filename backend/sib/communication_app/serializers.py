@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from .models import Message
 from users_app.serializers import UtilisateurSerializer
+from sib.fieldsets import SparseFieldsetMixin
 
-class MessageSerializer(serializers.ModelSerializer):
+class MessageSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     id_expediteur_details = UtilisateurSerializer(source='id_expediteur', read_only=True)
     id_destinataire_details = UtilisateurSerializer(source='id_destinataire', read_only=True)
 
@@ -10,6 +11,7 @@ class MessageSerializer(serializers.ModelSerializer):
         model = Message
         fields = ('id', 'id_expediteur', 'id_expediteur_details', 'id_destinataire', 'id_destinataire_details', 'message', 'cree_le', 'statut_lu')
         read_only_fields = ('id', 'cree_le', 'id_expediteur_details', 'id_destinataire_details')
+        expandable_fields = ('id_expediteur_details', 'id_destinataire_details')
         extra_kwargs = {
             'id_expediteur': {'write_only': True, 'required': False} # L'expéditeur sera défini automatiquement
         }
@@ -1,12 +1,14 @@
+from django.db.models import Q
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 from .models import Message
 from .serializers import MessageSerializer
-from users_app.permissions import IsAdmin, IsOwnerOrAdmin
+from users_app.permissions import IsAdmin, IsOwnerOrAdmin, get_permission_context
 from logs_app.mixins import LoggingMixin
+from sib.fieldsets import SparseQuerysetMixin
 
-class MessageViewSet(LoggingMixin, viewsets.ModelViewSet):
-    queryset = Message.objects.all().select_related('id_expediteur', 'id_destinataire')
+class MessageViewSet(SparseQuerysetMixin, LoggingMixin, viewsets.ModelViewSet):
+    queryset = Message.objects.all()  # related rows: see SparseQuerysetMixin
     serializer_class = MessageSerializer
 
     def get_permissions(self):
@@ -24,12 +26,9 @@ class MessageViewSet(LoggingMixin, viewsets.ModelViewSet):
             # Check if user is admin (superuser, staff, or belongs to Administrateurs group)
             if (self.request.user.is_superuser or 
                 self.request.user.is_staff or 
-                self.request.user.groups.filter(name='Administrateurs').exists()):
-                return Message.objects.all().select_related('id_expediteur', 'id_destinataire')
+                get_permission_context(self.request.user).in_groups(['Administrateurs'])):
+                return self.queryset.all()
             
-            return Message.objects.filter(
-                id_expediteur=self.request.user.utilisateur
-            ) | Message.objects.filter(
-                id_destinataire=self.request.user.utilisateur
-            ).select_related('id_expediteur', 'id_destinataire').distinct()
+            utilisateur = self.request.user.utilisateur
+            return self.queryset.filter(Q(id_expediteur=utilisateur) | Q(id_destinataire=utilisateur))
         return Message.objects.none()
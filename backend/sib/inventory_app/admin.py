@@ -12,7 +12,8 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 from io import BytesIO
-from users_app.permissions import get_user_accessible_warehouses
+from users_app.permissions import get_permission_context
+from reports_app.mixins import SpreadsheetExportAdminMixin
 
 class WarehouseAccessFilter(admin.SimpleListFilter):
     title = 'Entrepôt'
@@ -20,15 +21,14 @@ class WarehouseAccessFilter(admin.SimpleListFilter):
 
     def lookups(self, request, model_admin):
         # Get warehouses the current user has access to
-        if hasattr(request.user, 'utilisateur') and request.user.utilisateur:
-            if request.user.utilisateur.acces_tous_entrepots:
-                # User has access to all warehouses
-                from warehouse.models import Entrepot
-                return [(w.id, w.nom) for w in Entrepot.objects.all()]
-            else:
+        context = get_permission_context(request.user)
+        if context.has_profile:
+            from warehouse.models import Entrepot
+            warehouses = Entrepot.objects.all()
+            if not context.acces_tous_entrepots:
                 # User only has access to specific warehouses
-                accessible_warehouses = request.user.utilisateur.entrepots_autorises.all()
-                return [(w.entrepot.id, w.entrepot.nom) for w in accessible_warehouses]
+                warehouses = warehouses.filter(pk__in=context.warehouse_ids)
+            return [(w.id, w.nom) for w in warehouses]
         return []
 
     def queryset(self, request, queryset):
@@ -37,24 +37,31 @@ class WarehouseAccessFilter(admin.SimpleListFilter):
         return queryset
 
 @admin.register(Stock)
-class StockAdmin(admin.ModelAdmin):
+class StockAdmin(SpreadsheetExportAdminMixin, admin.ModelAdmin):
     list_display = ('get_article_name', 'type_article', 'quantite', 'entrepot', 'derniere_maj')
     list_filter = (WarehouseAccessFilter, 'type_article', 'entrepot', 'derniere_maj')
     search_fields = ('entrepot__nom',)
     readonly_fields = ('derniere_maj',)
+    actions = ['export_csv', 'export_xlsx']
+    export_select_related = ('entrepot',)
+    export_prefetch_related = ('article',)
+    export_fields = (
+        ('Article', 'article'),
+        ("Type d'Article", 'get_type_article_display'),
+        ('Quantité', 'quantite'),
+        ('Entrepôt', 'entrepot.nom'),
+        ('Dernière Mise à Jour', 'derniere_maj'),
+    )
     
     def get_queryset(self, request):
         """Filter stock based on user's warehouse permissions"""
         qs = super().get_queryset(request)
         
         # If user has access to all warehouses, show everything
-        if hasattr(request.user, 'utilisateur') and request.user.utilisateur:
-            if request.user.utilisateur.acces_tous_entrepots:
-                return qs
-            else:
-                # Only show stock from accessible warehouses
-                accessible_warehouses = get_user_accessible_warehouses(request.user)
-                return qs.filter(entrepot__in=accessible_warehouses)
+        context = get_permission_context(request.user)
+        if context.has_profile and not context.acces_tous_entrepots:
+            # Only show stock from accessible warehouses
+            return qs.filter(entrepot_id__in=context.warehouse_ids)
         
         return qs
     
@@ -66,24 +73,37 @@ class StockAdmin(admin.ModelAdmin):
     get_article_name.short_description = 'Article'
 
 @admin.register(MouvementStock)
-class MouvementStockAdmin(admin.ModelAdmin):
+class MouvementStockAdmin(SpreadsheetExportAdminMixin, admin.ModelAdmin):
     list_display = ('get_article_name', 'type_mouvement', 'quantite', 'entrepot', 'utilisateur', 'date_mouvement')
     list_filter = (WarehouseAccessFilter, 'type_mouvement', 'entrepot', 'date_mouvement')
     search_fields = ('entrepot__nom', 'utilisateur__nom')
     readonly_fields = ('date_mouvement',)
+    actions = ['export_csv', 'export_xlsx']
+    export_select_related = ('entrepot', 'utilisateur')
+    export_prefetch_related = ('article',)
+    export_fields = (
+        ('Date', 'date_mouvement'),
+        ('Type', 'get_type_mouvement_display'),
+        ('Motif', 'get_motif_display'),
+        ('Article', 'article'),
+        ('Quantité', 'quantite'),
+        ('Entrepôt', 'entrepot.nom'),
+        ('Utilisateur', 'utilisateur.nom'),
+        ('Source', 'source_nom'),
+        ('Destination', 'destination_nom'),
+        ('Référence', 'reference'),
+        ('Commentaire', 'commentaire'),
+    )
     
     def get_queryset(self, request):
         """Filter stock movements based on user's warehouse permissions"""
         qs = super().get_queryset(request)
         
         # If user has access to all warehouses, show everything
-        if hasattr(request.user, 'utilisateur') and request.user.utilisateur:
-            if request.user.utilisateur.acces_tous_entrepots:
-                return qs
-            else:
-                # Only show movements from accessible warehouses
-                accessible_warehouses = get_user_accessible_warehouses(request.user)
-                return qs.filter(entrepot__in=accessible_warehouses)
+        context = get_permission_context(request.user)
+        if context.has_profile and not context.acces_tous_entrepots:
+            # Only show movements from accessible warehouses
+            return qs.filter(entrepot_id__in=context.warehouse_ids)
         
         return qs
     
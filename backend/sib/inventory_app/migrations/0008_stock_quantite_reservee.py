@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0007_mouvementstock_entrepot_destination_fk_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='quantite_reservee',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10, verbose_name='Quantité Réservée'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0008_stock_quantite_reservee'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matierepremiere',
+            name='cout_unitaire',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=12, verbose_name='Coût Unitaire'),
+        ),
+        migrations.AddField(
+            model_name='produitfini',
+            name='cout_standard',
+            field=models.DecimalField(decimal_places=4, default=0, editable=False, max_digits=14, verbose_name='Coût Standard'),
+        ),
+        migrations.AddField(
+            model_name='produitsemifini',
+            name='cout_standard',
+            field=models.DecimalField(decimal_places=4, default=0, editable=False, max_digits=14, verbose_name='Coût Standard'),
+        ),
+    ]
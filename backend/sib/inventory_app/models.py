@@ -10,6 +10,7 @@ class MatierePremiere(models.Model):
     unite = models.CharField(max_length=50, verbose_name="Unité")
     description = models.TextField(blank=True, verbose_name="Description")
     niveau_min_stock = models.DecimalField(max_digits=10, decimal_places=2, default=0.0, verbose_name="Niveau Min. Stock")
+    cout_unitaire = models.DecimalField(max_digits=12, decimal_places=4, default=0, verbose_name="Coût Unitaire")
     est_archive = models.BooleanField(default=False, verbose_name="Est Archivé")
     cree_le = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
 
@@ -21,12 +22,25 @@ class MatierePremiere(models.Model):
     def __str__(self):
         return self.nom
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the cost when loaded: a change is rolled up by production_app.couts
+        instance._cout_origine = instance.cout_origine()
+        return instance
+
+    def cout_origine(self):
+        """cout_unitaire, or None when deferred"""
+        return None if 'cout_unitaire' in self.get_deferred_fields() else self.cout_unitaire
+
 class ProduitSemiFini(models.Model):
     nom = models.CharField(max_length=255, verbose_name="Nom")
     code_reference = models.CharField(max_length=100, unique=True, verbose_name="Code de Référence")
     unite = models.CharField(max_length=50, verbose_name="Unité")
     description = models.TextField(blank=True, verbose_name="Description")
     niveau_min_stock = models.DecimalField(max_digits=10, decimal_places=2, default=0.0, verbose_name="Niveau Min. Stock")
+    # Cost rollup of the nomenclature (production_app.couts)
+    cout_standard = models.DecimalField(max_digits=14, decimal_places=4, default=0, editable=False, verbose_name="Coût Standard")
     est_archive = models.BooleanField(default=False, verbose_name="Est Archivé")
     cree_le = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
 
@@ -44,6 +58,8 @@ class ProduitFini(models.Model):
     unite = models.CharField(max_length=50, verbose_name="Unité")
     description = models.TextField(blank=True, verbose_name="Description")
     niveau_min_stock = models.DecimalField(max_digits=10, decimal_places=2, default=0.0, verbose_name="Niveau Min. Stock")
+    # Cost rollup of the nomenclature (production_app.couts)
+    cout_standard = models.DecimalField(max_digits=14, decimal_places=4, default=0, editable=False, verbose_name="Coût Standard")
     est_archive = models.BooleanField(default=False, verbose_name="Est Archivé")
     cree_le = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
 
@@ -191,6 +207,23 @@ class MouvementStock(models.Model):
             pass
         super().save(*args, **kwargs)
 
+class StockQuerySet(models.QuerySet):
+    def with_quantite_disponible(self):
+        """Annotate quantite_calculee, the result of calculer_quantite_disponible, in the same query"""
+        mouvements = MouvementStock.objects.filter(
+            content_type=models.OuterRef('content_type'),
+            id_article=models.OuterRef('id_article'),
+            entrepot=models.OuterRef('entrepot'),
+        ).order_by().values('entrepot').annotate(total=models.Sum(models.Case(
+            models.When(type_mouvement='sortie', then=-models.F('quantite')),
+            # A transfer out of and back into the same warehouse cancels out
+            models.When(type_mouvement='transfert', entrepot_source=models.F('entrepot'), then=models.Value(0)),
+            models.When(type_mouvement__in=['entree', 'ajustement', 'transfert'], then=models.F('quantite')),
+            default=models.Value(0),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ))).values('total')
+        return self.annotate(quantite_calculee=models.Subquery(mouvements))
+
 class Stock(models.Model):
     TYPE_ARTICLE_CHOICES = [
         ('matiere', 'Matière Première'),
@@ -206,9 +239,13 @@ class Stock(models.Model):
     article = GenericForeignKey('content_type', 'id_article')
 
     quantite = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Quantité", default=0)
+    # Active order reservations (sales_app.reservations); free stock is quantite - quantite_reservee
+    quantite_reservee = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False, verbose_name="Quantité Réservée")
     entrepot = models.ForeignKey(Entrepot, on_delete=models.PROTECT, verbose_name="Entrepôt")
     derniere_maj = models.DateTimeField(auto_now=True, verbose_name="Dernière Mise à Jour")
 
+    objects = StockQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Stock"
         verbose_name_plural = "Stocks"
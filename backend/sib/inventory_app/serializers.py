@@ -166,8 +166,8 @@ class StockSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Stock
-        fields = ('id', 'type_article', 'content_type', 'id_article', 'article_nom', 'quantite', 'quantite_disponible', 'entrepot', 'entrepot_nom', 'derniere_maj')
-        read_only_fields = ('id', 'derniere_maj', 'article_nom', 'entrepot_nom', 'quantite_disponible')
+        fields = ('id', 'type_article', 'content_type', 'id_article', 'article_nom', 'quantite', 'quantite_reservee', 'quantite_disponible', 'entrepot', 'entrepot_nom', 'derniere_maj')
+        read_only_fields = ('id', 'derniere_maj', 'article_nom', 'quantite_reservee', 'entrepot_nom', 'quantite_disponible')
 
     def get_article_nom(self, obj):
         if obj.article:
@@ -176,6 +176,8 @@ class StockSerializer(serializers.ModelSerializer):
 
     def get_quantite_disponible(self, obj):
         """Calculate and return available quantity"""
+        if hasattr(obj, 'quantite_calculee'):  # annotated by StockQuerySet.with_quantite_disponible()
+            return obj.quantite_calculee if obj.quantite_calculee is not None else 0
         return obj.calculer_quantite_disponible()
 
     def validate(self, data):
@@ -228,5 +230,6 @@ class StockSerializer(serializers.ModelSerializer):
             instance.quantite = validated_data['quantite']
             validated_data.pop('quantite')
         
-        instance.save()
+        # quantite_reservee is maintained with F() updates by the reservation signals
+        instance.save(update_fields=['entrepot', 'quantite', 'derniere_maj'])
         return instance
@@ -4,9 +4,8 @@ Signals for automatic logging in inventory app
 
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.contrib.contenttypes.models import ContentType
 from .models import Stock, MouvementStock, MatierePremiere, ProduitFini, ProduitSemiFini
-from logs_app.models import HistoriqueActivite
+from logs_app.utils import record_activity
 
 def get_current_user():
     """Get current user from request or default to system user"""
@@ -25,16 +24,12 @@ def create_log_entry(action, instance, details=None, user=None):
         if user is None:
             return
         
-        # Get content type
-        content_type = ContentType.objects.get_for_model(instance.__class__)
-        
-        # Create log entry
-        HistoriqueActivite.objects.create(
-            action=action,
-            id_utilisateur=user.utilisateur if hasattr(user, 'utilisateur') else None,
-            content_type=content_type,
-            id_entite=instance.id,
-            details=details or f"{action} de {instance}"
+        # Send the entry to the configured audit sink
+        record_activity(
+            user.utilisateur if hasattr(user, 'utilisateur') else None,
+            action,
+            instance,
+            details or f"{action} de {instance}"
         )
         
     except Exception as e:
@@ -10,9 +10,9 @@ from .serializers import (
 )
 from users_app.permissions import (
     IsAdminOrReadOnly, IsMagasinierOrAdmin, CanViewStock, CanManageInventory, IsAdmin, 
-    CanViewWarehouseStock, CanManageWarehouseStock, HasWarehouseObjectPermission
+    CanViewWarehouseStock, CanManageWarehouseStock, HasWarehouseObjectPermission, WarehouseBulkMixin
 )
-from users_app.permissions import get_user_accessible_warehouses, get_user_warehouse_permissions
+from users_app.permissions import filter_queryset_by_warehouse_access, get_user_warehouse_permissions
 
 class MatierePremiereViewSet(viewsets.ModelViewSet):
     queryset = MatierePremiere.objects.filter(est_archive=False)
@@ -46,8 +46,8 @@ class ProduitFiniViewSet(viewsets.ModelViewSet):
         instance.est_archive = True
         instance.save()
 
-class StockViewSet(viewsets.ModelViewSet):
-    queryset = Stock.objects.all().select_related('entrepot')  # Default queryset
+class StockViewSet(WarehouseBulkMixin, viewsets.ModelViewSet):
+    queryset = Stock.objects.all().select_related('entrepot').prefetch_related('article')  # Default queryset
     serializer_class = StockSerializer
     permission_classes = [CanViewWarehouseStock, HasWarehouseObjectPermission]  # Use warehouse-specific permissions
 
@@ -58,24 +58,28 @@ class StockViewSet(viewsets.ModelViewSet):
         if not self.request.user.is_authenticated:
             return Stock.objects.none()
         
-        # Get accessible warehouses for the user
-        accessible_warehouses = get_user_accessible_warehouses(self.request.user)
-        
-        # Filter stock by accessible warehouses
-        return Stock.objects.filter(entrepot__in=accessible_warehouses).select_related('entrepot')
+        # Filter stock by accessible warehouse ids (no filter for acces_tous_entrepots)
+        queryset = Stock.objects.select_related('entrepot').prefetch_related('article').with_quantite_disponible()
+        return filter_queryset_by_warehouse_access(queryset, self.request.user)
 
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'bulk']:
             return [CanManageWarehouseStock(), HasWarehouseObjectPermission()]  # Only magasiniers with warehouse access can manage
         return [CanViewWarehouseStock(), HasWarehouseObjectPermission()]  # All roles with warehouse access can view
 
     def perform_create(self, serializer):
         serializer.save()
 
-class MouvementStockViewSet(viewsets.ModelViewSet):
-    queryset = MouvementStock.objects.all().select_related('entrepot', 'utilisateur')  # Default queryset
+MOUVEMENT_SELECT_RELATED = (
+    'entrepot', 'utilisateur', 'entrepot_source', 'fournisseur_source', 'entrepot_source_fk',
+    'client_destination', 'entrepot_destination_fk',
+)
+
+class MouvementStockViewSet(WarehouseBulkMixin, viewsets.ModelViewSet):
+    queryset = MouvementStock.objects.all().select_related(*MOUVEMENT_SELECT_RELATED).prefetch_related('article')  # Default queryset
     serializer_class = MouvementStockSerializer
     permission_classes = [CanViewWarehouseStock, HasWarehouseObjectPermission]  # Use warehouse-specific permissions
+    warehouse_target_fields = ('entrepot', 'entrepot_source')  # a transfer writes to both warehouses
 
     def get_queryset(self):
         """
@@ -84,16 +88,13 @@ class MouvementStockViewSet(viewsets.ModelViewSet):
         if not self.request.user.is_authenticated:
             return MouvementStock.objects.none()
         
-        # Get accessible warehouses for the user
-        accessible_warehouses = get_user_accessible_warehouses(self.request.user)
-        
-        # Filter movements by accessible warehouses
-        return MouvementStock.objects.filter(
-            entrepot__in=accessible_warehouses
-        ).select_related('entrepot', 'utilisateur')
+        # Filter movements by accessible warehouse ids (no filter for acces_tous_entrepots)
+        return filter_queryset_by_warehouse_access(
+            MouvementStock.objects.select_related(*MOUVEMENT_SELECT_RELATED).prefetch_related('article'), self.request.user
+        )
 
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'bulk']:
             return [CanManageWarehouseStock(), HasWarehouseObjectPermission()]  # Only magasiniers with warehouse access can manage
         return [CanViewWarehouseStock(), HasWarehouseObjectPermission()]  # All roles with warehouse access can view
 
@@ -114,7 +115,7 @@ class MouvementStockViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        queryset = self.queryset.filter(
+        queryset = self.get_queryset().filter(
             content_type_id=content_type_id,
             id_article=id_article
         )
@@ -0,0 +1,55 @@
+import os
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from logs_app.sinks import SegmentReader, import_segment, sort_segment, OPEN_SUFFIX, CLOSED_SUFFIX
+
+class Command(BaseCommand):
+    help = 'Bulk load closed audit segments (AUDIT_SINK=file) into historique_activites'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', type=str, help='Segment directory (defaults to AUDIT_SINK_DIR)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert')
+        parser.add_argument('--delete', action='store_true', help='Delete segments after import instead of archiving them')
+        parser.add_argument(
+            '--recover-orphans',
+            action='store_true',
+            help='Close open segments left behind by processes that are no longer running on this host'
+        )
+
+    def handle(self, *args, **options):
+        directory = Path(options['directory'] or settings.AUDIT_SINK_DIR)
+        reader = SegmentReader(directory)
+
+        if options['recover_orphans']:
+            self.recover_orphans(reader)
+
+        archive = directory / 'imported'
+        total = 0
+        for path in reader.segments():
+            count = import_segment(path, batch_size=options['batch_size'])
+            total += count
+            if options['delete']:
+                path.unlink()
+            else:
+                archive.mkdir(exist_ok=True)
+                os.replace(path, archive / path.name)
+            self.stdout.write(f'✅ {path.name}: {count} activités importées')
+
+        self.stdout.write(f'📊 Total: {total} activités importées')
+
+    def recover_orphans(self, reader):
+        for path in reader.segments(include_open=True):
+            if not path.name.endswith(OPEN_SUFFIX):
+                continue
+            pid = int(path.name[:-len(OPEN_SUFFIX)].rsplit('-', 1)[1])
+            try:
+                os.kill(pid, 0)
+                continue  # writer still alive
+            except ProcessLookupError:
+                pass
+            except PermissionError:
+                continue
+            sort_segment(path)  # closed segments are read by binary search
+            os.replace(path, str(path)[:-len(OPEN_SUFFIX)] + CLOSED_SUFFIX)
+            self.stdout.write(f'♻️  Segment orphelin fermé: {path.name}')
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:28
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historiqueactivite',
+            name='horodatage',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Horodatage'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from users_app.models import Utilisateur
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
@@ -12,7 +13,8 @@ class HistoriqueActivite(models.Model):
     id_entite = models.PositiveIntegerField(verbose_name="ID Entité")
     entite_affectee = GenericForeignKey('content_type', 'id_entite')
 
-    horodatage = models.DateTimeField(auto_now_add=True, verbose_name="Horodatage")
+    # A default rather than auto_now_add: bulk imports of audit segments keep the event times
+    horodatage = models.DateTimeField(default=timezone.now, editable=False, verbose_name="Horodatage")
     details = models.TextField(blank=True, verbose_name="Détails")
 
     class Meta:
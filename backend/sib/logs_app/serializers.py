@@ -1,8 +1,43 @@
+from collections import defaultdict
+
 from rest_framework import serializers
 from .models import HistoriqueActivite
 from users_app.serializers import UtilisateurSerializer
+from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 
+
+def load_entities(logs):
+    """
+    Affected entities of ``logs`` as {(content_type_id, id_entite): object},
+    one query per model. The relations used by the entities' __str__ are
+    loaded along (foreign keys joined, generic foreign keys prefetched);
+    deleted entities are simply missing.
+    """
+    ids_by_type = defaultdict(set)
+    for log in logs:
+        ids_by_type[log.content_type_id].add(log.id_entite)
+    entities = {}
+    for content_type_id, ids in ids_by_type.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        if model is None:
+            continue
+        queryset = model._base_manager.filter(pk__in=ids).select_related(
+            *[field.name for field in model._meta.concrete_fields if field.is_relation]
+        ).prefetch_related(
+            *[field.name for field in model._meta.private_fields if isinstance(field, GenericForeignKey)]
+        )
+        entities.update(((content_type_id, entity.pk), entity) for entity in queryset)
+    return entities
+
+
+class HistoriqueActiviteListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        logs = list(data.all() if hasattr(data, 'all') else data)
+        self.child.entities = load_entities(logs)
+        return super().to_representation(logs)
+
+
 class HistoriqueActiviteSerializer(serializers.ModelSerializer):
     id_utilisateur_details = UtilisateurSerializer(source='id_utilisateur', read_only=True)
     
@@ -14,13 +49,20 @@ class HistoriqueActiviteSerializer(serializers.ModelSerializer):
     class Meta:
         model = HistoriqueActivite
         fields = ('id', 'id_utilisateur', 'id_utilisateur_details', 'action', 'type_entite_nom', 'id_entite', 'entite_affectee_nom', 'horodatage', 'details')
+        list_serializer_class = HistoriqueActiviteListSerializer
         # Removed read_only_fields = '__all__' as it causes issues with DRF
 
     def get_entite_affectee_nom(self, obj):
-        if obj.entite_affectee:
-            return str(obj.entite_affectee)
+        entities = getattr(self, 'entities', None)
+        if entities is not None:
+            # Loaded for the whole page by HistoriqueActiviteListSerializer
+            entite = entities.get((obj.content_type_id, obj.id_entite))
+        else:
+            entite = obj.entite_affectee
+        if entite:
+            return str(entite)
         return None
 
     def get_type_entite_nom(self, obj):
         # Return the model name of the content type
-        return obj.content_type.model if obj.content_type else None
+        return ContentType.objects.get_for_id(obj.content_type_id).model if obj.content_type_id else None
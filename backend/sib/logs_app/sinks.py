@@ -0,0 +1,384 @@
+"""
+Audit sinks for activity events.
+
+The default sink writes each event as a row in ``historique_activites``.
+The segmented file sink appends events to rotating JSONL segment files from
+a background writer thread; closed segments are loaded into the database in
+bulk with ``python manage.py import_audit_segments``.
+
+Select the sink with the ``AUDIT_SINK`` setting ('db' or 'file').
+"""
+import atexit
+import json
+import logging
+import mmap
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+SEGMENT_PREFIX = 'audit-'
+OPEN_SUFFIX = '.jsonl.open'
+CLOSED_SUFFIX = '.jsonl'
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+logger = logging.getLogger(__name__)
+
+
+def format_timestamp(value):
+    """Serialize a datetime as a fixed-width UTC string (sorts lexicographically)"""
+    return value.astimezone(dt_timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+
+def parse_timestamp(value):
+    return datetime.strptime(value, TIMESTAMP_FORMAT).replace(tzinfo=dt_timezone.utc)
+
+
+def make_event(utilisateur_id, action, content_type_id, id_entite, details='', horodatage=None):
+    """Build an audit event dict; the key order is part of the segment format"""
+    return {
+        'horodatage': format_timestamp(horodatage or timezone.now()),
+        'id_utilisateur': utilisateur_id,
+        'action': action,
+        'content_type': content_type_id,
+        'id_entite': id_entite,
+        'details': details or '',
+    }
+
+
+def event_to_model(event):
+    from .models import HistoriqueActivite
+    return HistoriqueActivite(
+        id_utilisateur_id=event['id_utilisateur'],
+        action=event['action'],
+        content_type_id=event['content_type'],
+        id_entite=event['id_entite'],
+        horodatage=parse_timestamp(event['horodatage']),
+        details=event['details'],
+    )
+
+
+class DatabaseSink:
+    """Writes events straight into the historique_activites table"""
+
+    def emit(self, event):
+        self.emit_many([event])
+
+    def emit_many(self, events):
+        from .models import HistoriqueActivite
+        # Rows keep the timestamp of the event (HistoriqueActivite.horodatage has a default, not auto_now_add)
+        objs = [event_to_model(event) for event in events]
+        if len(objs) == 1:
+            objs[0].save()
+        elif objs:
+            HistoriqueActivite.objects.bulk_create(objs, batch_size=500)
+
+    def flush(self, timeout=None):
+        return True
+
+    def close(self):
+        pass
+
+
+class SegmentedFileSink:
+    """
+    Appends events to rotating JSONL segments from a background thread.
+
+    The active segment is named ``audit-<start>-<pid>.jsonl.open`` and is
+    renamed to ``.jsonl`` once it exceeds ``max_bytes`` or ``max_age``
+    seconds, or when the process exits. Only closed segments are imported.
+
+    A batch that cannot be written (full disk, permissions) is saved with
+    DatabaseSink instead, and the writer starts a new segment.
+    """
+    _FLUSH = object()
+    _STOP = object()
+
+    def __init__(self, directory, max_bytes, max_age, flush_interval=1.0):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+
+    def emit(self, event):
+        self._ensure_started()
+        self._queue.put(event)
+
+    def emit_many(self, events):
+        self._ensure_started()
+        for event in events:
+            self._queue.put(event)
+
+    def flush(self, timeout=None):
+        """Block until every event queued so far is written to disk"""
+        if self._thread is None or self._pid != os.getpid():
+            return True
+        done = threading.Event()
+        self._queue.put((self._FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self, timeout=5):
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._queue.put((self._STOP, None))
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _ensure_started(self):
+        # Restart the writer after a fork: threads do not survive it
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._pid = os.getpid()
+            self._queue = queue.SimpleQueue()
+            self._thread = threading.Thread(target=self._run, name='audit-segment-writer', daemon=True)
+            self._thread.start()
+
+    def _open_segment(self):
+        started = time.time()
+        stamp = datetime.fromtimestamp(started, dt_timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+        path = self.directory / f"{SEGMENT_PREFIX}{stamp}-{self._pid}{OPEN_SUFFIX}"
+        return path, open(path, 'ab'), started
+
+    def _close_segment(self, path, handle, in_order=True):
+        handle.flush()
+        os.fsync(handle.fileno())
+        size = handle.tell()
+        handle.close()
+        if size:
+            if not in_order:
+                sort_segment(path)
+            os.replace(path, str(path)[:-len('.open')])
+        else:
+            os.remove(path)
+
+    def _abandon_segment(self, path, handle, position, in_order):
+        """Close a segment after a failed write, without the lines of the failed batch"""
+        try:
+            if position is not None:
+                handle.truncate(position)
+            self._close_segment(path, handle, in_order)
+        except Exception:
+            logger.exception("Error closing audit segment %s", path)
+            try:
+                handle.close()
+            except OSError:
+                pass
+
+    def _save_to_database(self, batch):
+        try:
+            DatabaseSink().emit_many(batch)
+        except Exception:
+            logger.exception("%d audit events lost", len(batch))
+        finally:
+            # The writer thread opened its own database connection
+            connections.close_all()
+
+    def _run(self):
+        path = handle = None
+        started = 0.0
+        last = ''  # latest timestamp written to the open segment
+        in_order = True
+        while True:
+            batch, control = [], None
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                while True:
+                    if isinstance(item, tuple) and item and item[0] in (self._FLUSH, self._STOP):
+                        control = item
+                        break
+                    batch.append(item)
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            written, position = False, None
+            try:
+                if batch:
+                    if handle is None:
+                        path, handle, started = self._open_segment()
+                        last, in_order = '', True
+                    # Events from concurrent threads may be queued slightly out of order; an
+                    # event older than one of an earlier batch makes the segment sorted on close
+                    batch.sort(key=lambda e: e['horodatage'])
+                    position = handle.tell()
+                    handle.write(b''.join(
+                        json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n' for event in batch
+                    ))
+                    handle.flush()
+                    in_order = in_order and batch[0]['horodatage'] >= last
+                    last = max(last, batch[-1]['horodatage'])
+                written = True
+                if handle is not None and (
+                    handle.tell() >= self.max_bytes
+                    or time.time() - started >= self.max_age
+                    or (control and control[0] is self._STOP)
+                ):
+                    self._close_segment(path, handle, in_order)
+                    path = handle = None
+            except Exception:
+                logger.exception("Error writing audit segment %s", path)
+                if handle is not None:
+                    self._abandon_segment(path, handle, None if written else position, in_order)
+                    path = handle = None
+                if batch and not written:
+                    self._save_to_database(batch)
+
+            if control:
+                if control[0] is self._STOP:
+                    return
+                control[1].set()
+
+
+class SegmentReader:
+    """
+    Memory-mapped reader for audit segments.
+
+    Within a closed segment events are ordered by timestamp (see
+    sort_segment), so the first event of a time range is found by binary
+    search over line boundaries. Open segments are only ordered batch by
+    batch and are scanned in full.
+    """
+    def __init__(self, directory=None):
+        self.directory = Path(directory or settings.AUDIT_SINK_DIR)
+
+    def segments(self, include_open=False):
+        if not self.directory.exists():
+            return []
+        suffixes = (CLOSED_SUFFIX, OPEN_SUFFIX) if include_open else (CLOSED_SUFFIX,)
+        return sorted(p for p in self.directory.iterdir() if p.is_file() and p.name.startswith(SEGMENT_PREFIX) and p.name.endswith(suffixes))
+
+    def query(self, debut=None, fin=None, include_open=False):
+        """Yield events with debut <= horodatage <= fin, segment by segment"""
+        lower = format_timestamp(debut).encode() if debut else None
+        upper = format_timestamp(fin).encode() if fin else None
+        for path in self.segments(include_open=include_open):
+            yield from self.query_segment(path, lower, upper, ordered=not path.name.endswith(OPEN_SUFFIX))
+
+    def query_segment(self, path, lower=None, upper=None, ordered=True):
+        """Yield the events of one segment; bounds are encoded timestamps"""
+        if not ordered:
+            for line in self.lines(path):
+                timestamp = self._line_timestamp(line)
+                if (lower is None or timestamp >= lower) and (upper is None or timestamp <= upper):
+                    yield json.loads(line)
+            return
+        with open(path, 'rb') as handle:
+            try:
+                data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                return
+            with data:
+                end = data.rfind(b'\n') + 1  # ignore a partially written last line
+                if not end:
+                    return
+                if upper is not None and self._timestamp_at(data, 0) > upper:
+                    return
+                offset = self._lower_bound(data, lower, end) if lower is not None else 0
+                while offset < end:
+                    stop = data.find(b'\n', offset, end)
+                    line = data[offset:stop]
+                    offset = stop + 1
+                    if upper is not None and self._line_timestamp(line) > upper:
+                        return
+                    yield json.loads(line)
+
+    @staticmethod
+    def lines(path):
+        """Complete lines of a segment, in file order"""
+        with open(path, 'rb') as handle:
+            data = handle.read()
+        end = data.rfind(b'\n') + 1  # ignore a partially written last line
+        return data[:end].splitlines()
+
+    @staticmethod
+    def _line_timestamp(line):
+        # Lines start with {"horodatage": "<fixed width timestamp>"
+        start = line.index(b'"', 14) + 1
+        return line[start:line.index(b'"', start)]
+
+    def _timestamp_at(self, data, offset):
+        return self._line_timestamp(data[offset:data.find(b'\n', offset)])
+
+    def _lower_bound(self, data, lower, end):
+        """Offset of the first line whose timestamp is >= lower"""
+        lo, hi = 0, end
+        while lo < hi:
+            mid = (lo + hi) // 2
+            line_start = data.rfind(b'\n', 0, mid) + 1
+            if line_start < lo:
+                line_start = lo
+            if self._timestamp_at(data, line_start) < lower:
+                lo = data.find(b'\n', line_start, end) + 1
+            else:
+                hi = line_start
+        return lo
+
+
+def sort_segment(path):
+    """Rewrite a segment ordered by timestamp (stable), dropping a partially written last line"""
+    lines = SegmentReader.lines(path)
+    timestamps = [SegmentReader._line_timestamp(line) for line in lines]
+    if all(a <= b for a, b in zip(timestamps, timestamps[1:])) and os.path.getsize(path) == sum(len(line) + 1 for line in lines):
+        return
+    order = sorted(range(len(lines)), key=timestamps.__getitem__)
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as handle:
+        handle.write(b''.join(lines[i] + b'\n' for i in order))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, path)
+
+
+def import_segment(path, batch_size=1000):
+    """Bulk load a closed segment into historique_activites; returns the row count"""
+    from .models import HistoriqueActivite
+    objs = []
+    count = 0
+    with transaction.atomic():
+        for event in SegmentReader(Path(path).parent).query_segment(path):
+            objs.append(event_to_model(event))
+            if len(objs) >= batch_size:
+                HistoriqueActivite.objects.bulk_create(objs)
+                count += len(objs)
+                objs = []
+        if objs:
+            HistoriqueActivite.objects.bulk_create(objs)
+            count += len(objs)
+    return count
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_audit_sink():
+    """Return the process-wide sink configured by settings.AUDIT_SINK"""
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                if getattr(settings, 'AUDIT_SINK', 'db') == 'file':
+                    _sink = SegmentedFileSink(
+                        settings.AUDIT_SINK_DIR,
+                        max_bytes=settings.AUDIT_SINK_SEGMENT_MAX_BYTES,
+                        max_age=settings.AUDIT_SINK_SEGMENT_MAX_AGE,
+                        flush_interval=settings.AUDIT_SINK_FLUSH_INTERVAL,
+                    )
+                    atexit.register(_sink.close)
+                else:
+                    _sink = DatabaseSink()
+    return _sink
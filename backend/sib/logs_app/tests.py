@@ -0,0 +1,140 @@
+import errno
+import io
+import json
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from .models import HistoriqueActivite
+from .sinks import SegmentReader, SegmentedFileSink, make_event
+
+DEBUT = datetime(2026, 1, 5, 10, 0, tzinfo=dt_timezone.utc)
+ORPHAN_PID = 4194305  # above the largest pid_max: never a running process
+
+
+class AuditSegmentTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Group.objects.get_or_create(name='Administrateurs')
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        cls.content_type = ContentType.objects.get_for_model(User)
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def event(self, seconds, action='Test'):
+        return make_event(self.admin.utilisateur.pk, action, self.content_type.pk, 1, horodatage=DEBUT + timedelta(seconds=seconds))
+
+    def actions(self, events):
+        return [event['action'] for event in events]
+
+    def test_late_events_are_found_in_open_and_closed_segments(self):
+        sink = SegmentedFileSink(self.directory, max_bytes=10 ** 6, max_age=3600, flush_interval=0.01)
+        self.addCleanup(sink.close)
+        sink.emit_many([self.event(2, 'b'), self.event(4, 'd')])
+        self.assertTrue(sink.flush(5))
+        sink.emit_many([self.event(1, 'a'), self.event(3, 'c')])  # queued late by another thread
+        self.assertTrue(sink.flush(5))
+
+        reader = SegmentReader(self.directory)
+        self.assertEqual(reader.segments(), [])
+        self.assertEqual(self.actions(reader.query(DEBUT, DEBUT + timedelta(seconds=1), include_open=True)), ['a'])
+
+        sink.close()
+        [segment] = reader.segments()
+        self.assertEqual(self.actions(json.loads(line) for line in reader.lines(segment)), ['a', 'b', 'c', 'd'])
+        self.assertEqual(self.actions(reader.query(DEBUT + timedelta(seconds=1), DEBUT + timedelta(seconds=3))), ['a', 'b', 'c'])
+
+    def test_import_recovers_orphans_and_keeps_event_timestamps(self):
+        orphan = self.directory / f'audit-20260105T100000000000-{ORPHAN_PID}.jsonl.open'
+        orphan.write_bytes(b''.join(
+            json.dumps(self.event(seconds, action)).encode() + b'\n' for seconds, action in ((2, 'b'), (1, 'a'))
+        ) + b'{"horodatage": "2026')  # the writer died mid-line
+
+        call_command('import_audit_segments', directory=str(self.directory), recover_orphans=True, delete=True, stdout=io.StringIO())
+        self.assertEqual(list(self.directory.glob('audit-*')), [])
+        self.assertEqual(
+            list(HistoriqueActivite.objects.filter(action__in=['a', 'b']).order_by('horodatage').values_list('action', 'horodatage')),
+            [('a', DEBUT + timedelta(seconds=1)), ('b', DEBUT + timedelta(seconds=2))],
+        )
+
+    def test_segments_endpoint_limite(self):
+        path = self.directory / 'audit-20260105T100000000000-1.jsonl'
+        path.write_bytes(b''.join(json.dumps(self.event(seconds)).encode() + b'\n' for seconds in range(3)))
+        api = APIClient()
+        api.force_authenticate(self.admin)
+        with override_settings(AUDIT_SINK_DIR=self.directory):
+            self.assertEqual(api.get('/api/v1/logs/historique-activites/segments/', {'limite': 2}).data['count'], 2)
+            for limite in (0, -1, 'x'):
+                self.assertEqual(api.get('/api/v1/logs/historique-activites/segments/', {'limite': limite}).status_code, 400)
+
+
+class FullDisk:
+    """Segment file whose second write fails halfway through"""
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        if self.writes == 2:
+            self.handle.write(data[:len(data) // 2])
+            self.handle.flush()
+            raise OSError(errno.ENOSPC, 'No space left on device')
+        return self.handle.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.handle, name)
+
+
+class AuditSegmentFailureTests(TransactionTestCase):
+    # The writer thread saves failed batches through its own database connection
+
+    def setUp(self):
+        self.utilisateur = User.objects.create_user('auditeur', password='x').utilisateur
+        self.content_type = ContentType.objects.get_for_model(User)
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def event(self, seconds, action):
+        return make_event(self.utilisateur.pk, action, self.content_type.pk, 1, horodatage=DEBUT + timedelta(seconds=seconds))
+
+    def test_failed_write_falls_back_to_the_database(self):
+        sink = SegmentedFileSink(self.directory, max_bytes=10 ** 6, max_age=3600, flush_interval=0.01)
+        self.addCleanup(sink.close)
+        open_segment = sink._open_segment
+
+        def open_full_disk_segment():
+            path, handle, started = open_segment()
+            return path, FullDisk(handle), started
+
+        with mock.patch.object(sink, '_open_segment', open_full_disk_segment):
+            sink.emit_many([self.event(1, 'a'), self.event(2, 'b')])
+            self.assertTrue(sink.flush(5))
+            with self.assertLogs('logs_app.sinks', 'ERROR') as logs:
+                sink.emit_many([self.event(3, 'c'), self.event(4, 'd')])
+                self.assertTrue(sink.flush(5))
+            self.assertIn('Error writing audit segment', logs.output[0])
+            self.assertIn('No space left on device', logs.output[0])
+            sink.emit_many([self.event(5, 'e')])  # in a new segment
+            sink.close()
+
+        reader = SegmentReader(self.directory)
+        self.assertEqual(
+            [[event['action'] for event in map(json.loads, reader.lines(segment))] for segment in reader.segments()],
+            [['a', 'b'], ['e']],
+        )
+        # the half-written line of the failed batch was cut off
+        self.assertTrue(all(segment.read_bytes().endswith(b'}\n') for segment in reader.segments()))
+        self.assertEqual(list(HistoriqueActivite.objects.order_by('horodatage').values_list('action', flat=True)), ['c', 'd'])
@@ -1,8 +1,25 @@
 from django.contrib.contenttypes.models import ContentType
-from .models import HistoriqueActivite
+from .sinks import get_audit_sink, make_event
 from users_app.models import Utilisateur
 from django.core.exceptions import ObjectDoesNotExist # Import this
 
+def record_activity(utilisateur, action, entity, details=''):
+    """
+    Sends an activity event to the configured audit sink (settings.AUDIT_SINK).
+    :param utilisateur: The Utilisateur profile responsible for the action, or None.
+    :param action: A string describing the action.
+    :param entity: The model instance that was affected.
+    :param details: Optional additional details about the action.
+    """
+    content_type = ContentType.objects.get_for_model(entity.__class__)
+    get_audit_sink().emit(make_event(
+        utilisateur_id=utilisateur.pk if utilisateur else None,
+        action=action,
+        content_type_id=content_type.pk,
+        id_entite=entity.pk,
+        details=details,
+    ))
+
 def log_activity(user, action, entity, details=''):
     """
     Logs an activity in the HistoriqueActivite model.
@@ -19,13 +36,6 @@ def log_activity(user, action, entity, details=''):
             print(f"Warning: User '{user.username}' (ID: {user.id}) does not have a linked Utilisateur profile. Activity '{action}' on {entity} not logged.")
             return # Exit the function if profile is missing
 
-        content_type = ContentType.objects.get_for_model(entity)
-        HistoriqueActivite.objects.create(
-            id_utilisateur=utilisateur_profile,
-            action=action,
-            content_type=content_type,
-            id_entite=entity.pk,
-            details=details
-        )
+        record_activity(utilisateur_profile, action, entity, details)
     else:
         print(f"Warning: Attempted to log activity for unauthenticated user. Activity '{action}' on {entity} not logged.")
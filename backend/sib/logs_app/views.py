@@ -2,12 +2,17 @@ from rest_framework import viewsets
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import action
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from .models import HistoriqueActivite
+from .sinks import SegmentReader
 from .serializers import HistoriqueActiviteSerializer
 from users_app.permissions import CanViewLogs
 
 class HistoriqueActiviteViewSet(viewsets.ReadOnlyModelViewSet): # ReadOnlyModelViewSet car les logs ne sont pas modifiables via l'API
-    queryset = HistoriqueActivite.objects.all().select_related('id_utilisateur')
+    queryset = HistoriqueActivite.objects.all().select_related('id_utilisateur__user').prefetch_related(
+        'id_utilisateur__entrepots_autorises__entrepot'
+    )
     serializer_class = HistoriqueActiviteSerializer
     permission_classes = [CanViewLogs] # Seuls les admins peuvent lire les logs
 
@@ -20,3 +25,29 @@ class HistoriqueActiviteViewSet(viewsets.ReadOnlyModelViewSet): # ReadOnlyModelV
             "authenticated": request.user.is_authenticated if request.user else False,
             "total_logs": HistoriqueActivite.objects.count()
         })
+
+    @action(detail=False, methods=['get'])
+    def segments(self, request):
+        """
+        Events still waiting in audit segment files (AUDIT_SINK=file).
+        Optional ISO 8601 filters: ?debut=...&fin=...
+        """
+        debut = parse_datetime(request.query_params.get('debut', ''))
+        fin = parse_datetime(request.query_params.get('fin', ''))
+        if debut and timezone.is_naive(debut):
+            debut = timezone.make_aware(debut)
+        if fin and timezone.is_naive(fin):
+            fin = timezone.make_aware(fin)
+        try:
+            limite = min(int(request.query_params.get('limite', 1000)), 10000)
+        except ValueError:
+            limite = 0
+        if limite <= 0:
+            return Response({"error": "limite doit être un entier positif"}, status=status.HTTP_400_BAD_REQUEST)
+
+        events = []
+        for event in SegmentReader().query(debut, fin, include_open=True):
+            events.append(event)
+            if len(events) >= limite:
+                break
+        return Response({"count": len(events), "results": events})
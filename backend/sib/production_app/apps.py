@@ -5,3 +5,7 @@ class ProductionAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'production_app'
     verbose_name = "Suivi de Production"
+
+    def ready(self):
+        """Import signals when app is ready"""
+        import production_app.signals
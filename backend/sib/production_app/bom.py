@@ -0,0 +1,340 @@
+"""
+Bill of materials (BOM) engine.
+
+The whole nomenclature (NomenclatureProduits) is loaded in one query into
+an adjacency map and its reverse (where-used) index. Nodes are (type, id)
+pairs, with type 'matiere', 'semi_fini' or 'fini' as in Stock.type_article.
+Flattened BOMs (leaf quantities per unit of a product) and where-used sets
+(ancestor products with the quantity of the item per unit) are memoized on
+the loaded graph. The graph is shared by the threads of a process and
+replaced once the version bumped by production_app.signals after a
+nomenclature change is seen: each bump stores the new components of the
+changed parents in the cache, so that the other processes apply them to
+their graph, keeping the memoized results the change leaves valid, instead
+of reloading it.
+"""
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from inventory_app.models import MatierePremiere, ProduitFini, ProduitSemiFini
+
+from .models import NomenclatureProduits
+
+TYPES = {MatierePremiere: 'matiere', ProduitSemiFini: 'semi_fini', ProduitFini: 'fini'}
+MODELES = {type_article: model for model, type_article in TYPES.items()}
+CACHE_VERSION_KEY = 'sib:nomenclature:version'
+MODIFICATIONS_MAX = 100  # pending versions applied in place of a reload
+MODIFICATIONS_TIMEOUT = 3600
+
+
+def libelle(noeud):
+    return f'{noeud[0]}#{noeud[1]}'
+
+
+def types_par_content_type():
+    return {content_type.pk: TYPES[model] for model, content_type in ContentType.objects.get_for_models(*TYPES).items()}
+
+
+def cle_modifications(version):
+    return f'{CACHE_VERSION_KEY}:{version}'
+
+
+def fermeture(departs, adjacence):
+    """The nodes reachable from departs (included) in {node: [(node, quantity)]}"""
+    vus, pile = set(departs), list(departs)
+    while pile:
+        for voisin, _ in adjacence.get(pile.pop(), ()):
+            if voisin not in vus:
+                vus.add(voisin)
+                pile.append(voisin)
+    return vus
+
+
+class CycleNomenclatureError(Exception):
+    """The nomenclature below a product loops back on itself"""
+
+    def __init__(self, cycle):
+        self.cycle = cycle
+        super().__init__(f"Cycle dans la nomenclature: {' → '.join(libelle(noeud) for noeud in cycle)}")
+
+
+class Nomenclature:
+    """
+    Product structure as {parent: [(component, quantity per parent unit)]}.
+    A node without components (raw materials, items with no nomenclature)
+    is a leaf of the explosion.
+    """
+
+    def __init__(self, liens=(), version=None):
+        self.version = version
+        self.composants = defaultdict(list)
+        self.parents = defaultdict(list)
+        for parent, composant, quantite in liens:
+            self.composants[parent].append((composant, quantite))
+            self.parents[composant].append((parent, quantite))
+        self.composants.default_factory = None  # lookups must not add nodes
+        self.parents.default_factory = None
+        self._plats = {}
+        self._emplois = {}
+        self._niveaux = None
+
+    @classmethod
+    def charger(cls, version=None):
+        """The whole nomenclature in one query"""
+        return cls(liens(NomenclatureProduits.objects.all()), version)
+
+    def composants_de(self, noeud):
+        return self.composants.get(noeud, ())
+
+    def parents_de(self, noeud):
+        return self.parents.get(noeud, ())
+
+    def appliquer(self, modifications, version):
+        """
+        New graph where the parents in modifications {parent: [(component,
+        quantity)]} have these components. Memoized results stay valid except
+        the flattened BOMs of the parents and their ancestors and the where-used
+        sets of the old and new components and their descendants.
+        """
+        composants = dict(self.composants)
+        anciens_enfants = set()
+        for parent, nouveaux in modifications.items():
+            anciens_enfants.update(enfant for enfant, _ in self.composants_de(parent))
+            if nouveaux:
+                composants[parent] = list(nouveaux)
+            else:
+                composants.pop(parent, None)
+        nomenclature = Nomenclature((
+            (parent, composant, quantite) for parent, enfants in composants.items() for composant, quantite in enfants
+        ), version)
+        enfants = anciens_enfants | {enfant for nouveaux in modifications.values() for enfant, _ in nouveaux}
+        # Both graphs: the reachable sets only differ if the change made or broke a cycle
+        plats_perimes = fermeture(modifications, self.parents) | fermeture(modifications, nomenclature.parents)
+        emplois_perimes = fermeture(enfants, self.composants) | fermeture(enfants, nomenclature.composants)
+        nomenclature._plats = {noeud: plat for noeud, plat in self._plats.items() if noeud not in plats_perimes}
+        nomenclature._emplois = {noeud: emploi for noeud, emploi in self._emplois.items() if noeud not in emplois_perimes}
+        return nomenclature
+
+    def _parcourir(self, noeud, voisins, memo, combiner):
+        """
+        memo[noeud] from memo[v] of its neighbours v, memoized for every node
+        visited. Iterative depth-first walk: nomenclatures may be deeper than
+        the recursion limit. Returns the cycle met as the list of nodes walked.
+        """
+        pile = [(noeud, iter(voisins(noeud)))]
+        chemin = {noeud}
+        while pile:
+            courant, suivants = pile[-1]
+            for suivant, _ in suivants:
+                if suivant in memo:
+                    continue
+                if suivant in chemin:
+                    cycle = [n for n, _ in pile]
+                    return cycle[cycle.index(suivant):] + [suivant]
+                chemin.add(suivant)
+                pile.append((suivant, iter(voisins(suivant))))
+                break
+            else:
+                pile.pop()
+                chemin.discard(courant)
+                memo[courant] = combiner(courant)
+        return None
+
+    def aplatir(self, noeud):
+        """{leaf: quantity per unit of noeud}, memoized for every node visited"""
+        plat = self._plats.get(noeud)
+        if plat is None:
+            cycle = self._parcourir(noeud, self.composants_de, self._plats, self._combiner)
+            if cycle:
+                raise CycleNomenclatureError(cycle)
+            plat = self._plats[noeud]
+        return plat
+
+    def _combiner(self, noeud):
+        composants = self.composants_de(noeud)
+        if not composants:
+            return {noeud: Decimal(1)}
+        plat = defaultdict(Decimal)
+        for enfant, quantite in composants:
+            for feuille, quantite_feuille in self._plats[enfant].items():
+                plat[feuille] += quantite * quantite_feuille
+        return dict(plat)
+
+    def cas_emploi(self, noeud):
+        """
+        Where-used set of noeud: {ancestor product: quantity of noeud per unit
+        of it} over every level, memoized for every node visited
+        """
+        emploi = self._emplois.get(noeud)
+        if emploi is None:
+            cycle = self._parcourir(noeud, self.parents_de, self._emplois, self._cumuler)
+            if cycle:
+                raise CycleNomenclatureError(cycle[::-1])  # walked from components up to parents
+            emploi = self._emplois[noeud]
+        return emploi
+
+    def _cumuler(self, noeud):
+        emploi = defaultdict(Decimal)
+        for parent, quantite in self.parents_de(noeud):
+            emploi[parent] += quantite
+            for ancetre, quantite_parent in self._emplois[parent].items():
+                emploi[ancetre] += quantite * quantite_parent
+        return dict(emploi)
+
+    def exploser(self, besoins):
+        """Leaf totals for an iterable of (node, quantity)"""
+        totaux = defaultdict(Decimal)
+        for noeud, quantite in besoins:
+            for feuille, quantite_feuille in self.aplatir(noeud).items():
+                totaux[feuille] += quantite * quantite_feuille
+        return dict(totaux)
+
+    def atteint(self, depart, cible):
+        """Whether cible is depart or one of its components at any depth"""
+        vus, pile = {depart}, [depart]
+        while pile:
+            noeud = pile.pop()
+            if noeud == cible:
+                return True
+            for enfant, _ in self.composants_de(noeud):
+                if enfant not in vus:
+                    vus.add(enfant)
+                    pile.append(enfant)
+        return False
+
+    def niveaux(self):
+        """
+        Low-level code of every node: its deepest level below a top product
+        (0). Netting level by level in this order sees all the demand for an
+        item before exploding it.
+        """
+        if self._niveaux is None:
+            cycles = self.cycles()
+            if cycles:
+                raise CycleNomenclatureError(cycles[0])
+            entrants = defaultdict(int)
+            for composants in self.composants.values():
+                for enfant, _ in composants:
+                    entrants[enfant] += 1
+            niveaux = {noeud: 0 for noeud in self.composants if not entrants[noeud]}
+            pile = list(niveaux)
+            while pile:  # Kahn's algorithm: a node is placed once all its parents are
+                noeud = pile.pop()
+                for enfant, _ in self.composants_de(noeud):
+                    niveaux[enfant] = max(niveaux.get(enfant, 0), niveaux[noeud] + 1)
+                    entrants[enfant] -= 1
+                    if not entrants[enfant]:
+                        pile.append(enfant)
+            self._niveaux = niveaux
+        return self._niveaux
+
+    def cycles(self):
+        """The cycles of the nomenclature as lists of nodes, the first repeated at the end"""
+        cycles, vus = [], set()
+        for parent in list(self.composants):
+            try:
+                self.aplatir(parent)
+            except CycleNomenclatureError as e:
+                cle = frozenset(e.cycle)
+                if cle not in vus:
+                    vus.add(cle)
+                    cycles.append(e.cycle)
+        return cycles
+
+
+def liens(queryset):
+    """(parent, component, quantity) of the NomenclatureProduits rows, in primary key order"""
+    types = types_par_content_type()
+    rows = queryset.values_list(
+        'content_type_parent', 'id_produit_parent', 'content_type_composant', 'id_composant', 'quantite_requise'
+    ).order_by('pk')
+    return (
+        ((types[type_parent], parent_id), (types[type_composant], composant_id), quantite)
+        for type_parent, parent_id, type_composant, composant_id, quantite in rows
+        if type_parent in types and type_composant in types
+    )
+
+
+def composants_actuels(parents):
+    """{parent: [(component, quantity)]} of these parents as in the database, in one query"""
+    content_types = {type_article: pk for pk, type_article in types_par_content_type().items()}
+    filtre = Q(pk__in=[])
+    for type_article, pk in parents:
+        filtre |= Q(content_type_parent=content_types[type_article], id_produit_parent=pk)
+    composants = {parent: [] for parent in parents}
+    for parent, composant, quantite in liens(NomenclatureProduits.objects.filter(filtre)):
+        composants[parent].append((composant, quantite))
+    return composants
+
+
+def details(noeuds):
+    """{node: {'nom', 'code_reference', 'unite'}} with one query per item type"""
+    par_type = defaultdict(set)
+    for type_article, pk in noeuds:
+        par_type[type_article].add(pk)
+    resultats = {}
+    for type_article, pks in par_type.items():
+        for row in MODELES[type_article].objects.filter(pk__in=pks).values('id', 'nom', 'code_reference', 'unite'):
+            resultats[(type_article, row.pop('id'))] = row
+    return resultats
+
+
+_nomenclature = None
+_lock = threading.Lock()
+
+
+def get_nomenclature():
+    """The loaded nomenclature of this process, brought up to date after a change"""
+    global _nomenclature
+    version = cache.get(CACHE_VERSION_KEY)
+    if version is None:
+        # Start from a value no earlier graph can carry
+        cache.add(CACHE_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CACHE_VERSION_KEY)
+        if version is None:
+            return Nomenclature.charger()  # no working cache: nothing tells when a graph is stale
+    nomenclature = _nomenclature
+    if nomenclature is None or nomenclature.version != version:
+        with _lock:
+            if _nomenclature is None or _nomenclature.version != version:
+                _nomenclature = mettre_a_jour(_nomenclature, version)
+            nomenclature = _nomenclature
+    return nomenclature
+
+
+def mettre_a_jour(nomenclature, version):
+    """nomenclature with the changes up to version applied, or reloaded if one is missing"""
+    if nomenclature is not None and nomenclature.version is not None and 0 < version - nomenclature.version <= MODIFICATIONS_MAX:
+        cles = [cle_modifications(v) for v in range(nomenclature.version + 1, version + 1)]
+        trouvees = cache.get_many(cles)
+        if len(trouvees) == len(cles):
+            modifications = {}
+            for cle in cles:
+                modifications.update(trouvees[cle])
+            return nomenclature.appliquer(modifications, version)
+    return Nomenclature.charger(version)
+
+
+def invalider_nomenclature(parents=()):
+    """
+    Make the loaded nomenclatures stale once the transaction commits,
+    recording the components of the changed parents for an in-place update
+    """
+    parents = set(parents)
+
+    def bump():
+        try:
+            version = cache.incr(CACHE_VERSION_KEY)
+        except ValueError:
+            return  # no version yet: the next read starts a new one
+        if parents:
+            # Read after the bump: a concurrent change to the same parent gets a later version
+            cache.set(cle_modifications(version), composants_actuels(parents), MODIFICATIONS_TIMEOUT)
+    transaction.on_commit(bump)
@@ -0,0 +1,161 @@
+"""
+Completion of a production order with backflushing.
+
+terminer_production consumes the materials of the order (its
+MatiereProduction rows if any were recorded, else the direct components of
+the product in the nomenclature), posts the output of the finished or
+semi-finished product, and marks the order terminee. Everything happens in
+one transaction: the movements are bulk inserted, every affected Stock row
+is locked and written once with the net change of its movements instead of
+being recomputed from the whole ledger, and the audit events are emitted
+together.
+"""
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from inventory_app.models import MouvementStock, Stock
+from logs_app.sinks import get_audit_sink, make_event
+
+from . import bom
+from .models import MatiereProduction, Production
+
+STATUTS_TERMINABLES = ('planifiee', 'en_cours')
+CENTIEME = Decimal('0.01')
+
+
+class ClotureProductionError(Exception):
+    """The order cannot be completed; ``erreurs`` maps fields to messages"""
+
+    def __init__(self, erreurs):
+        self.erreurs = erreurs
+        super().__init__('; '.join(f'{champ}: {message}' for champ, message in erreurs.items()))
+
+
+def produit_de(production):
+    """Node (type, id) of the item the order produces"""
+    if production.produit_fini_id:
+        return ('fini', production.produit_fini_id)
+    return ('semi_fini', production.produit_semi_fini_id)
+
+
+def consommations(production, quantite):
+    """
+    {node: quantity} consumed by the order: its MatiereProduction rows, or
+    the direct components of the product for the produced quantity. Returns
+    the nomenclature-based raw material rows to record as well.
+    """
+    utilisees = list(production.matieres_utilisee.values_list('id_matiere', 'quantite_utilisee'))
+    if utilisees:
+        return {('matiere', matiere_id): quantite_utilisee for matiere_id, quantite_utilisee in utilisees}, []
+    besoins = defaultdict(Decimal)
+    for composant, quantite_requise in bom.get_nomenclature().composants_de(produit_de(production)):
+        besoins[composant] += quantite_requise * quantite
+    besoins = {noeud: total.quantize(CENTIEME, ROUND_HALF_UP) for noeud, total in besoins.items()}
+    lignes = [
+        MatiereProduction(id_production=production, id_matiere_id=noeud[1], quantite_utilisee=total)
+        for noeud, total in besoins.items() if noeud[0] == 'matiere' and total > 0
+    ]
+    return besoins, lignes
+
+
+def terminer_production(production, utilisateur, entrepot, quantite=None, entrepot_matieres=None):
+    """
+    Complete the order: consume its materials from entrepot_matieres (default
+    entrepot) and receive ``quantite`` (default quantite_prevue) of the product
+    into entrepot. Refused, with nothing written, when the free stock of a
+    material is short. Returns the updated order and the created movements.
+    """
+    entrepot_matieres = entrepot_matieres or entrepot
+    content_types = {
+        bom.TYPES[model]: content_type for model, content_type in ContentType.objects.get_for_models(*bom.TYPES).items()
+    }
+    with transaction.atomic():
+        production = Production.objects.select_for_update().get(pk=production.pk)
+        if production.statut not in STATUTS_TERMINABLES:
+            raise ClotureProductionError({'statut': f"Impossible de terminer un ordre {production.get_statut_display().lower()}"})
+        if not (production.produit_fini_id or production.produit_semi_fini_id):
+            raise ClotureProductionError({'produit': "L'ordre ne concerne aucun produit"})
+        quantite = production.quantite_prevue if quantite is None else quantite
+        produit = produit_de(production)
+        besoins, lignes_matieres = consommations(production, quantite)
+        besoins = {noeud: total for noeud, total in besoins.items() if total > 0}
+
+        # Net change per Stock row, locked in primary key order like sales_app.reservations
+        variations = defaultdict(Decimal)
+        for noeud, total in besoins.items():
+            variations[(noeud, entrepot_matieres.pk)] -= total
+        variations[(produit, entrepot.pk)] += quantite
+        cles = {(content_types[noeud[0]].pk, noeud[1], entrepot_id): (noeud, entrepot_id) for noeud, entrepot_id in variations}
+        stocks = {}
+        for stock in Stock.objects.filter(
+            content_type__in=[content_types[noeud[0]] for noeud, _ in variations],
+            id_article__in={noeud[1] for noeud, _ in variations},
+            entrepot_id__in={entrepot_id for _, entrepot_id in variations},
+        ).select_for_update().order_by('pk'):
+            cle = cles.get((stock.content_type_id, stock.id_article, stock.entrepot_id))
+            if cle is not None:
+                stocks[cle] = stock
+
+        manquants = {}
+        for cle, variation in variations.items():
+            stock = stocks.get(cle)
+            libre = stock.quantite - stock.quantite_reservee if stock else Decimal(0)
+            if variation < 0 and libre + variation < 0:
+                manquants[bom.libelle(cle[0])] = f"{-variation} requis, {max(libre, 0)} disponible(s)"
+        if manquants:
+            raise ClotureProductionError({'stock': manquants})
+
+        reference = f"PROD-{production.pk}"
+        mouvements = [
+            MouvementStock(
+                type_mouvement='sortie' if variation < 0 else 'entree', motif='production',
+                content_type=content_types[noeud[0]], id_article=noeud[1], quantite=abs(variation),
+                entrepot_id=entrepot_id, utilisateur=utilisateur, reference=reference,
+                commentaire=f"Clôture de l'ordre de production #{production.pk}",
+            )
+            for (noeud, entrepot_id), variation in variations.items() if variation
+        ]
+        MouvementStock.objects.bulk_create(mouvements)
+
+        maintenant = timezone.now()
+        modifies, crees = [], []
+        for (noeud, entrepot_id), variation in variations.items():
+            stock = stocks.get((noeud, entrepot_id))
+            if stock is None:
+                crees.append(Stock(
+                    type_article=noeud[0], content_type=content_types[noeud[0]], id_article=noeud[1],
+                    entrepot_id=entrepot_id, quantite=variation,
+                ))
+            elif variation:
+                stock.quantite += variation
+                stock.derniere_maj = maintenant
+                modifies.append(stock)
+        Stock.objects.bulk_update(modifies, ['quantite', 'derniere_maj'])
+        Stock.objects.bulk_create(crees)
+        MatiereProduction.objects.bulk_create(lignes_matieres)
+
+        production.statut = 'terminee'
+        production.quantite_produite = quantite
+        production.date_fin = timezone.localdate()
+        production.save(update_fields=['statut', 'quantite_produite', 'date_fin'])
+
+        type_mouvement = ContentType.objects.get_for_model(MouvementStock)
+        get_audit_sink().emit_many([
+            make_event(
+                utilisateur_id=utilisateur.pk, action="Clôture de Production",
+                content_type_id=ContentType.objects.get_for_model(Production).pk, id_entite=production.pk,
+                details=f"{quantite} produit(s), {len(besoins)} composant(s) consommé(s)",
+            ),
+            *(
+                make_event(
+                    utilisateur_id=utilisateur.pk, action="Mouvement", content_type_id=type_mouvement.pk,
+                    id_entite=mouvement.pk, details=f"Mouvement de stock: {mouvement.type_mouvement} - {mouvement.quantite} unités",
+                )
+                for mouvement in mouvements
+            ),
+        ])
+    return production, mouvements
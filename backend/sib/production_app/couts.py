@@ -0,0 +1,94 @@
+"""
+Standard cost rollup over the nomenclature.
+
+The standard cost of a semi-finished or finished product is the sum over
+its direct components of quantity x component cost, raw materials costing
+their cout_unitaire and products without a nomenclature nothing. Products
+are costed in one bottom-up pass in the order of their low-level codes
+(bom.Nomenclature.niveaux), so that every component is costed before the
+products using it. Results are stored in cout_standard for the serializers.
+After a change only the products using the changed item at some level
+(bom.Nomenclature.cas_emploi) are recomputed, from the stored costs of
+their other components.
+"""
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+
+from . import bom
+
+PRECISION = Decimal('0.0001')  # cout_standard decimal places
+PRODUITS = ('semi_fini', 'fini')
+
+
+def champ_cout(type_article):
+    return 'cout_unitaire' if type_article == 'matiere' else 'cout_standard'
+
+
+def couts_stockes(noeuds):
+    """{node: stored cost} with one query per item type"""
+    par_type = defaultdict(set)
+    for type_article, pk in noeuds:
+        par_type[type_article].add(pk)
+    couts = {}
+    for type_article, pks in par_type.items():
+        for pk, cout in bom.MODELES[type_article].objects.filter(pk__in=pks).values_list('pk', champ_cout(type_article)):
+            couts[(type_article, pk)] = cout
+    return couts
+
+
+def cumuler(nomenclature, produits, couts):
+    """Cost produits bottom-up into couts, which holds the costs of their other components"""
+    niveaux = nomenclature.niveaux()
+    for noeud in sorted(produits, key=lambda noeud: niveaux.get(noeud, 0), reverse=True):
+        couts[noeud] = sum(
+            (quantite * couts.get(composant, 0) for composant, quantite in nomenclature.composants_de(noeud)), Decimal(0)
+        ).quantize(PRECISION, ROUND_HALF_UP)  # as stored, so that partial recomputations agree
+    return couts
+
+
+def recalculer_couts(noeuds=None):
+    """
+    Recompute and store the standard costs of every product when noeuds is
+    None, else of the products among noeuds and those using one of noeuds at
+    some level. Only changed costs are written. Returns their number.
+    """
+    nomenclature = bom.get_nomenclature()
+    if noeuds is None:
+        produits = {
+            (type_article, pk) for type_article in PRODUITS
+            for pk in bom.MODELES[type_article].objects.values_list('pk', flat=True)
+        }
+        couts = {
+            ('matiere', pk): cout for pk, cout in bom.MODELES['matiere'].objects.values_list('pk', 'cout_unitaire')
+        }
+    else:
+        produits = {noeud for noeud in noeuds if noeud[0] in PRODUITS}
+        for noeud in noeuds:
+            produits.update(nomenclature.cas_emploi(noeud))
+        couts = couts_stockes({
+            composant for produit in produits for composant, _ in nomenclature.composants_de(produit)
+        } - produits)
+    anciens = couts_stockes(produits)
+    cumuler(nomenclature, produits, couts)
+
+    modifies = defaultdict(list)
+    for (type_article, pk), ancien in anciens.items():
+        if couts[(type_article, pk)] != ancien:
+            modifies[type_article].append(bom.MODELES[type_article](pk=pk, cout_standard=couts[(type_article, pk)]))
+    for type_article, objets in modifies.items():
+        bom.MODELES[type_article].objects.bulk_update(objets, ['cout_standard'], batch_size=1000)
+    return sum(len(objets) for objets in modifies.values())
+
+
+def recalculer_apres_commit(noeuds):
+    """recalculer_couts(noeuds) once the transaction commits"""
+    noeuds = set(noeuds)
+
+    def recalculer():
+        try:
+            recalculer_couts(noeuds)
+        except bom.CycleNomenclatureError:
+            pass  # costs are kept until the loop is fixed (nomenclature-produits/cycles/)
+    transaction.on_commit(recalculer)
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from production_app.bom import CycleNomenclatureError
+from production_app.mrp import calculer_besoins
+
+
+class Command(BaseCommand):
+    help = 'Material requirements of the planned production orders against the free stock (see production_app.mrp)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fin', type=str, help='Only the orders starting by this date (YYYY-MM-DD)')
+        parser.add_argument('--entrepot', type=int, action='append', help='Warehouse id to net against (repeatable, default all)')
+        parser.add_argument('--tout', action='store_true', help='List every item with a demand, not only the shortages')
+
+    def handle(self, *args, **options):
+        fin = None
+        if options['fin']:
+            try:
+                fin = parse_date(options['fin'])
+            except ValueError:
+                pass
+            if fin is None:
+                raise CommandError(f"Date invalide: {options['fin']}")
+
+        started = time.perf_counter()
+        try:
+            rapport = calculer_besoins(fin, options['entrepot'])
+        except CycleNomenclatureError as e:
+            raise CommandError(str(e))
+
+        for ligne in rapport['resultats']:
+            if not (ligne['manquant'] or options['tout']):
+                continue
+            message = (
+                f"{ligne['action']:<8} {ligne['type']}#{ligne['id']} {ligne['nom']}: besoin {ligne['besoin_brut']}, "
+                f"libre {ligne['stock_libre']}, planifié {ligne['production_planifiee']}, "
+                f"manquant {ligne['manquant']}, à commander {ligne['a_commander']} {ligne['unite'] or ''}"
+            )
+            self.stdout.write(self.style.WARNING(f"⚠️  {message}") if ligne['manquant'] else f"   {message}")
+        self.stdout.write(
+            f"✅ {rapport['articles_planifies']} articles planifiés, {rapport['articles']} articles requis, "
+            f"{rapport['en_rupture']} en rupture en {time.perf_counter() - started:.1f} s"
+        )
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from production_app.bom import CycleNomenclatureError
+from production_app.couts import recalculer_couts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the standard cost of every product from the raw material costs (see production_app.couts)'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            count = recalculer_couts()
+        except CycleNomenclatureError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f'✅ {count} coûts standard mis à jour en {time.perf_counter() - started:.1f} s')
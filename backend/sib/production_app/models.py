@@ -117,3 +117,16 @@ class NomenclatureProduits(models.Model):
 
     def __str__(self):
         return f"Pour {self.produit_parent} : {self.quantite_requise} {self.unite} de {self.composant}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the parent when loaded: it loses a component if the link moves
+        instance._parent_origine = instance.parent_origine()
+        return instance
+
+    def parent_origine(self):
+        """(parent content type id, parent id), or None when a field is deferred"""
+        if {'content_type_parent_id', 'id_produit_parent'} & self.get_deferred_fields():
+            return None
+        return self.content_type_parent_id, self.id_produit_parent
@@ -0,0 +1,141 @@
+"""
+Material requirements planning (MRP) over the planned production orders.
+
+Every item of the nomenclature gets an index into NumPy vectors. The run
+goes down the BOM by low-level code (production_app.bom.Nomenclature.niveaux):
+at each level, the demand for an item is netted against its free stock
+(Stock.quantite - Stock.quantite_reservee over the selected warehouses) and
+the planned production of that item. What is left is exploded into its
+components together with the item's own planned orders. Leaves left short
+are to be bought, intermediate items to be produced. Arithmetic is float64:
+quantities are rounded to 2 decimals in the report.
+"""
+from collections import defaultdict
+
+import numpy as np
+
+from inventory_app.models import Stock
+
+from . import bom
+from .models import Production
+
+
+def ordres_planifies(fin=None):
+    """{node: remaining quantity} of the planned production orders starting by fin (all when None)"""
+    productions = Production.objects.filter(statut='planifiee')
+    if fin:
+        productions = productions.filter(date_debut__lte=fin)
+    restes = defaultdict(float)
+    for fini_id, semi_fini_id, prevue, produite in productions.values_list(
+        'produit_fini', 'produit_semi_fini', 'quantite_prevue', 'quantite_produite'
+    ):
+        noeud = ('fini', fini_id) if fini_id else ('semi_fini', semi_fini_id) if semi_fini_id else None
+        reste = float(prevue - (produite or 0))
+        if noeud and reste > 0:
+            restes[noeud] += reste
+    return restes
+
+
+def calculer_besoins(fin=None, entrepot_ids=None):
+    """
+    MRP run over the warehouses entrepot_ids (all when None). Returns a row
+    per item with a demand, shortages first.
+    """
+    nomenclature = bom.get_nomenclature()
+    niveaux = nomenclature.niveaux()
+    ordres = ordres_planifies(fin)
+
+    noeuds = set(niveaux) | set(ordres)
+    index = {noeud: i for i, noeud in enumerate(sorted(noeuds))}
+    taille = len(index)
+    niveau = np.zeros(taille, dtype=np.int64)
+    for noeud, valeur in niveaux.items():
+        niveau[index[noeud]] = valeur
+
+    # Free stock per item and warehouse
+    types = bom.types_par_content_type()
+    stocks = Stock.objects.filter(content_type__in=types)
+    if entrepot_ids is not None:
+        stocks = stocks.filter(entrepot_id__in=entrepot_ids)
+    lignes, entrepots, libres = [], [], []
+    for content_type_id, article_id, entrepot_id, quantite, reservee in stocks.values_list(
+        'content_type', 'id_article', 'entrepot', 'quantite', 'quantite_reservee'
+    ).iterator(chunk_size=5000):
+        i = index.get((types[content_type_id], article_id))
+        if i is not None:
+            lignes.append(i)
+            entrepots.append(entrepot_id)
+            libres.append(max(float(quantite - reservee), 0))
+    entrepot_index = {entrepot_id: j for j, entrepot_id in enumerate(sorted(set(entrepots)))}
+    stock_par_entrepot = np.zeros((taille, len(entrepot_index)))
+    np.add.at(stock_par_entrepot, (np.array(lignes, dtype=np.int64), np.array([entrepot_index[e] for e in entrepots], dtype=np.int64)), libres)
+    stock_libre = stock_par_entrepot.sum(axis=1)
+
+    planifie = np.zeros(taille)
+    for noeud, quantite in ordres.items():
+        planifie[index[noeud]] = quantite
+
+    # BOM edges as parallel arrays
+    parents, enfants, quantites = [], [], []
+    for parent, composants in nomenclature.composants.items():
+        for enfant, quantite in composants:
+            parents.append(index[parent])
+            enfants.append(index[enfant])
+            quantites.append(float(quantite))
+    parents = np.array(parents, dtype=np.int64)
+    enfants = np.array(enfants, dtype=np.int64)
+    quantites = np.array(quantites)
+    a_des_composants = np.zeros(taille, dtype=bool)
+    a_des_composants[parents] = True
+
+    demande = np.zeros(taille)
+    net = np.zeros(taille)
+    for valeur in range(int(niveau.max()) + 1 if taille else 0):
+        courant = niveau == valeur
+        net[courant] = np.maximum(demande[courant] - stock_libre[courant] - planifie[courant], 0)
+        a_exploser = np.where(courant & a_des_composants, net + planifie, 0)
+        aretes = courant[parents]
+        np.add.at(demande, enfants[aretes], a_exploser[parents[aretes]] * quantites[aretes])
+
+    feuilles = ~a_des_composants
+    noeuds = sorted(index, key=index.get)
+    retenus = np.flatnonzero(demande > 0)
+    noms = bom.details([noeuds[i] for i in retenus])
+    seuils = {}
+    for type_article in {noeuds[i][0] for i in retenus}:
+        seuils.update({
+            (type_article, pk): float(seuil)
+            for pk, seuil in bom.MODELES[type_article].objects.filter(
+                pk__in=[noeuds[i][1] for i in retenus if noeuds[i][0] == type_article]
+            ).values_list('pk', 'niveau_min_stock')
+        })
+    entrepot_ids_tries = sorted(entrepot_index, key=entrepot_index.get)
+
+    resultats = []
+    for i in retenus:
+        noeud = noeuds[i]
+        seuil = seuils.get(noeud, 0.0)
+        resultats.append({
+            'type': noeud[0],
+            'id': noeud[1],
+            **noms.get(noeud, {'nom': None, 'code_reference': None, 'unite': None}),
+            'action': 'acheter' if feuilles[i] else 'produire',
+            'besoin_brut': round(float(demande[i]), 2),
+            'stock_libre': round(float(stock_libre[i]), 2),
+            'production_planifiee': round(float(planifie[i]), 2),
+            'stock_min': round(seuil, 2),
+            'manquant': round(float(net[i]), 2),
+            # Enough to cover the demand and get back to the minimum stock level
+            'a_commander': round(max(float(demande[i] + seuil - stock_libre[i] - planifie[i]), 0), 2),
+            'stock_par_entrepot': {
+                entrepot_ids_tries[j]: round(float(stock_par_entrepot[i, j]), 2)
+                for j in np.flatnonzero(stock_par_entrepot[i])
+            },
+        })
+    resultats.sort(key=lambda ligne: (-ligne['manquant'], -ligne['a_commander'], ligne['type'], ligne['id']))
+    return {
+        'articles_planifies': len(ordres),
+        'articles': len(resultats),
+        'en_rupture': sum(1 for ligne in resultats if ligne['manquant'] > 0),
+        'resultats': resultats,
+    }
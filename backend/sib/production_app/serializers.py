@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from django.contrib.contenttypes.models import ContentType
 from .models import Production, MatiereProduction, NomenclatureProduits
+from .bom import TYPES, get_nomenclature
 from users_app.serializers import UtilisateurSerializer
+from sib.fieldsets import SparseFieldsetMixin
 
 # Importez les MODÈLES eux-mêmes pour les querysets des PrimaryKeyRelatedField
 from inventory_app.models import MatierePremiere, ProduitSemiFini, ProduitFini
@@ -13,11 +15,13 @@ from inventory_app.serializers import (
     ProduitFiniSerializer as InventoryProduitFiniSerializer,
 )
 
-class ProductionSerializer(serializers.ModelSerializer):
+class ProductionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     cree_par_details = UtilisateurSerializer(source='cree_par', read_only=True)
     
     # Pour la lecture, afficher le nom du produit à produire
     produit_a_produire_nom = serializers.SerializerMethodField(read_only=True)
+    # Planned quantity at the stored standard cost of the product (production_app.couts)
+    cout_prevu = serializers.SerializerMethodField(read_only=True)
 
     # Pour l'écriture, permettre de spécifier l'ID du produit semi-fini ou fini
     produit_semi_fini = serializers.PrimaryKeyRelatedField(
@@ -32,9 +36,14 @@ class ProductionSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'produit_semi_fini', 'produit_fini', 'produit_a_produire_nom',
             'quantite_prevue', 'quantite_produite', 'date_debut', 'date_fin',
-            'statut', 'cree_par', 'cree_par_details', 'cree_le'
+            'statut', 'cree_par', 'cree_par_details', 'cree_le', 'cout_prevu'
         )
-        read_only_fields = ('id', 'cree_le', 'cree_par_details', 'produit_a_produire_nom')
+        read_only_fields = ('id', 'cree_le', 'cree_par_details', 'produit_a_produire_nom', 'cout_prevu')
+        expandable_fields = ('cree_par_details',)
+        related_lookups = {
+            'produit_a_produire_nom': ('produit_semi_fini', 'produit_fini'),
+            'cout_prevu': ('produit_semi_fini', 'produit_fini'),
+        }
 
     def get_produit_a_produire_nom(self, obj):
         if obj.produit_semi_fini:
@@ -43,6 +52,10 @@ class ProductionSerializer(serializers.ModelSerializer):
             return str(obj.produit_fini)
         return None
 
+    def get_cout_prevu(self, obj):
+        produit = obj.produit_semi_fini or obj.produit_fini
+        return float(produit.cout_standard * obj.quantite_prevue) if produit else None
+
     def validate(self, data):
         produit_semi_fini = data.get('produit_semi_fini')
         produit_fini = data.get('produit_fini')
@@ -131,6 +144,12 @@ class NomenclatureProduitsSerializer(serializers.ModelSerializer):
         elif content_type_composant.model == 'produitsemifini' and validated_data['type_composant'] != 'semi_fini':
             raise serializers.ValidationError("Le type de composant doit être 'semi_fini' pour un ProduitSemiFini.")
 
+        # A component that already needs the parent at some level would make the explosion loop
+        parent = (TYPES.get(content_type_parent.model_class()), id_produit_parent)
+        composant = (TYPES.get(content_type_composant.model_class()), id_composant)
+        if None not in (parent[0], composant[0]) and get_nomenclature().atteint(composant, parent):
+            raise serializers.ValidationError("Le composant contient déjà le produit parent: la nomenclature formerait un cycle.")
+
         return NomenclatureProduits.objects.create(
             content_type_parent=content_type_parent, id_produit_parent=id_produit_parent,
             content_type_composant=content_type_composant, id_composant=id_composant,
@@ -0,0 +1,55 @@
+"""
+Bring the loaded BOM graphs (production_app.bom) and the standard costs
+(production_app.couts) up to date when the nomenclature or a raw material
+cost changes
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from inventory_app.models import MatierePremiere
+
+from .bom import invalider_nomenclature, types_par_content_type
+from .couts import recalculer_apres_commit
+from .models import NomenclatureProduits
+
+
+def parent_du_lien(content_type_id, pk):
+    type_article = types_par_content_type().get(content_type_id)
+    return (type_article, pk) if type_article else None
+
+
+@receiver(pre_save, sender=NomenclatureProduits)
+def parent_inconnu(sender, instance, raw=False, **kwargs):
+    """
+    A link built with a primary key instead of loaded, or loaded with the
+    parent deferred, has no snapshot: read its previous parent. Loaded links
+    carry theirs from from_db.
+    """
+    if raw or instance.pk is None or getattr(instance, '_parent_origine', None) is not None:
+        return
+    instance._parent_origine = (
+        NomenclatureProduits.objects.filter(pk=instance.pk)
+        .values_list('content_type_parent', 'id_produit_parent').first()
+    )
+
+
+@receiver([post_save, post_delete], sender=NomenclatureProduits)
+def nomenclature_modifiee(sender, instance, **kwargs):
+    liens = [(instance.content_type_parent_id, instance.id_produit_parent)]
+    if getattr(instance, '_parent_origine', None):
+        liens.append(instance._parent_origine)
+    parents = {parent for parent in (parent_du_lien(*lien) for lien in liens) if parent}
+    invalider_nomenclature(parents)  # registered first: the costs are rolled up on the new graph
+    recalculer_apres_commit(parents)
+    instance._parent_origine = instance.parent_origine()
+
+
+@receiver(post_save, sender=MatierePremiere)
+def cout_matiere_modifie(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    origine = getattr(instance, '_cout_origine', None)
+    # Previous cost unknown (not loaded, or deferred): roll it up anyway
+    if not created and (origine is None or origine != instance.cout_unitaire):
+        recalculer_apres_commit({('matiere', instance.pk)})
+    instance._cout_origine = instance.cout_origine()
@@ -0,0 +1,244 @@
+import datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import Group, User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from inventory_app.models import MatierePremiere, MouvementStock, ProduitFini, ProduitSemiFini, Stock
+from users_app.models import UtilisateurEntrepot
+from warehouse.models import Entrepot
+
+from . import bom, couts, mrp
+from .models import MatiereProduction, NomenclatureProduits, Production
+
+TYPES_PARENT = {ProduitSemiFini: 'semi_fini', ProduitFini: 'fini'}
+TYPES_COMPOSANT = {MatierePremiere: 'matiere', ProduitSemiFini: 'semi_fini'}
+
+
+def lien(parent, composant, quantite):
+    return NomenclatureProduits.objects.create(
+        content_type_parent=ContentType.objects.get_for_model(parent), id_produit_parent=parent.pk,
+        type_produit_parent=TYPES_PARENT[type(parent)],
+        content_type_composant=ContentType.objects.get_for_model(composant), id_composant=composant.pk,
+        type_composant=TYPES_COMPOSANT[type(composant)],
+        quantite_requise=Decimal(quantite), unite='u',
+    )
+
+
+class BomTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Group.objects.get_or_create(name='Administrateurs')
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        cls.admin.utilisateur.acces_tous_entrepots = True
+        cls.admin.utilisateur.save()
+        cls.acier, cls.vis = (
+            MatierePremiere.objects.create(nom=nom, code_reference=nom.upper(), unite='kg') for nom in ('acier', 'vis')
+        )
+        cls.cadre, cls.roue = (
+            ProduitSemiFini.objects.create(nom=nom, code_reference=nom.upper(), unite='u') for nom in ('cadre', 'roue')
+        )
+        cls.velo = ProduitFini.objects.create(nom='vélo', code_reference='VELO', unite='u')
+        # vélo = 1 cadre + 2 roues + 4 vis; cadre = 3 acier + 6 vis; roue = 0.5 acier + 1 cadre (sub-assembly)
+        lien(cls.velo, cls.cadre, 1)
+        lien(cls.velo, cls.roue, 2)
+        lien(cls.velo, cls.vis, 4)
+        lien(cls.cadre, cls.acier, 3)
+        lien(cls.cadre, cls.vis, 6)
+        lien(cls.roue, cls.acier, '0.5')
+        lien(cls.roue, cls.cadre, 1)
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def test_explosion_sums_leaves_over_all_levels(self):
+        with self.assertNumQueries(1):
+            nomenclature = bom.Nomenclature.charger()
+        self.assertEqual(nomenclature.exploser([(('fini', self.velo.pk), 10)]), {
+            ('matiere', self.acier.pk): Decimal(100),  # 10 * (3 + 2 * (0.5 + 3))
+            ('matiere', self.vis.pk): Decimal(220),  # 10 * (4 + 6 + 2 * 6)
+        })
+
+        response = self.api.get('/api/v1/nomenclature-produits/explosion/', {'type': 'fini', 'id': self.velo.pk, 'quantite': 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row['nom'], row['quantite']) for row in response.data['composants']], [('acier', 100.0), ('vis', 220.0)])
+        self.assertEqual(self.api.get('/api/v1/nomenclature-produits/explosion/', {'type': 'fini', 'id': 0}).status_code, 404)
+
+    def test_graph_is_reloaded_after_changes_and_cycles_are_refused(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            premier = bom.get_nomenclature()
+            self.assertIs(bom.get_nomenclature(), premier)
+            lien(self.velo, self.acier, 1)
+        self.assertIsNot(bom.get_nomenclature(), premier)
+        self.assertEqual(bom.get_nomenclature().aplatir(('fini', self.velo.pk))[('matiere', self.acier.pk)], 11)
+
+        response = self.api.post('/api/v1/nomenclature-produits/', {
+            'content_type_parent': ContentType.objects.get_for_model(ProduitSemiFini).pk, 'id_produit_parent': self.cadre.pk,
+            'type_produit_parent': 'semi_fini',
+            'content_type_composant': ContentType.objects.get_for_model(ProduitSemiFini).pk, 'id_composant': self.roue.pk,
+            'type_composant': 'semi_fini', 'quantite_requise': '1', 'unite': 'u',
+        })
+        self.assertEqual(response.status_code, 400)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lien(self.cadre, self.roue, 1)  # bypasses the API check
+        with self.assertRaises(bom.CycleNomenclatureError):
+            bom.get_nomenclature().aplatir(('fini', self.velo.pk))
+        cycles = self.api.get('/api/v1/nomenclature-produits/cycles/').data['cycles']
+        self.assertEqual(len(cycles), 1)
+        self.assertEqual({(noeud['type'], noeud['id']) for noeud in cycles[0]}, {('semi_fini', self.cadre.pk), ('semi_fini', self.roue.pk)})
+
+    def test_mrp_nets_each_level_against_free_stock_and_planned_orders(self):
+        entrepots = [Entrepot.objects.create(nom=f'Entrepôt {i}') for i in range(2)]
+        for article, entrepot, quantite, reservee in (
+            (self.velo, 0, 2, 0), (self.roue, 0, 4, 1), (self.vis, 1, 100, 0),
+        ):
+            Stock.objects.create(
+                type_article=bom.TYPES[type(article)], content_type=ContentType.objects.get_for_model(article),
+                id_article=article.pk, entrepot=entrepots[entrepot], quantite=Decimal(quantite), quantite_reservee=Decimal(reservee),
+            )
+        ProduitSemiFini.objects.filter(pk=self.cadre.pk).update(niveau_min_stock=5)
+        debut = datetime.date(2026, 1, 5)
+        Production.objects.create(produit_fini=self.velo, quantite_prevue=10, date_debut=debut)
+        Production.objects.create(produit_semi_fini=self.roue, quantite_prevue=8, quantite_produite=3, date_debut=debut)
+        Production.objects.create(produit_fini=self.velo, quantite_prevue=50, date_debut=debut, statut='terminee')
+        Production.objects.create(produit_fini=self.velo, quantite_prevue=7, date_debut=debut + datetime.timedelta(days=30))
+
+        # 10 vélos → 10 cadres, 20 roues, 40 vis; roues: 20 - 3 free - 5 planned = 12 short,
+        # 12 + 5 exploded → 17 cadres, 8.5 acier; cadres: 27 short → 81 acier, 162 vis
+        rapport = mrp.calculer_besoins(fin=debut)
+        self.assertEqual(rapport['articles_planifies'], 2)
+        self.assertEqual(
+            [(ligne['nom'], ligne['action'], ligne['besoin_brut'], ligne['manquant'], ligne['a_commander']) for ligne in rapport['resultats']],
+            [
+                ('vis', 'acheter', 202.0, 102.0, 102.0),
+                ('acier', 'acheter', 89.5, 89.5, 89.5),
+                ('cadre', 'produire', 27.0, 27.0, 32.0),
+                ('roue', 'produire', 20.0, 12.0, 12.0),
+            ],
+        )
+        self.assertEqual(rapport['resultats'][0]['stock_par_entrepot'], {entrepots[1].pk: 100.0})
+
+        # Only the first warehouse and all 17 vélos: 17 * 4 + 48 cadres * 6 vis, none in stock
+        response = self.api.get('/api/v1/production/mrp/', {'entrepot': entrepots[0].pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['resultats'][0]['nom'], 'vis')
+        self.assertEqual(response.data['resultats'][0]['manquant'], 356.0)
+        self.assertEqual(self.api.get('/api/v1/production/mrp/', {'fin': 'demain'}).status_code, 400)
+
+    def test_terminer_backflushes_components_and_posts_output(self):
+        entrepot = Entrepot.objects.create(nom='Atelier')
+        for article, quantite in ((self.acier, 10), (self.vis, 100), (self.cadre, 1)):
+            Stock.objects.create(
+                type_article=bom.TYPES[type(article)], content_type=ContentType.objects.get_for_model(article),
+                id_article=article.pk, entrepot=entrepot, quantite=Decimal(quantite),
+            )
+        debut = datetime.date(2026, 1, 5)
+        cadres = Production.objects.create(produit_semi_fini=self.cadre, quantite_prevue=3, date_debut=debut)
+        velos = Production.objects.create(produit_fini=self.velo, quantite_prevue=10, date_debut=debut)
+
+        # 2 cadres = 6 acier + 12 vis
+        response = self.api.post(f'/api/v1/production/{cadres.pk}/terminer/', {'entrepot': entrepot.pk, 'quantite_produite': '2'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['production']['statut'], 'terminee')
+        self.assertEqual(
+            sorted(Stock.objects.values_list('type_article', 'quantite')),
+            [('matiere', Decimal(4)), ('matiere', Decimal(88)), ('semi_fini', Decimal(3))],
+        )
+        self.assertEqual(
+            sorted(MouvementStock.objects.filter(reference=f'PROD-{cadres.pk}').values_list('type_mouvement', 'quantite')),
+            [('entree', Decimal(2)), ('sortie', Decimal(6)), ('sortie', Decimal(12))],
+        )
+        self.assertEqual(MatiereProduction.objects.filter(id_production=cadres).count(), 2)
+        self.assertEqual(self.api.post(f'/api/v1/production/{cadres.pk}/terminer/', {'entrepot': entrepot.pk}).status_code, 400)
+
+        # 10 vélos need 20 roues that are not in stock: nothing is written
+        response = self.api.post(f'/api/v1/production/{velos.pk}/terminer/', {'entrepot': entrepot.pk})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f'semi_fini#{self.roue.pk}', response.data['stock'])
+        self.assertEqual(MouvementStock.objects.count(), 3)
+        velos.refresh_from_db()
+        self.assertEqual(velos.statut, 'planifiee')
+
+    def test_terminer_requires_write_access_to_the_warehouses(self):
+        atelier, magasin = Entrepot.objects.create(nom='Atelier'), Entrepot.objects.create(nom='Magasin')
+        ouvrier = User.objects.create_user('ouvrier', password='x')
+        ouvrier.groups.add(Group.objects.get_or_create(name='Ouvriers de production')[0])
+        UtilisateurEntrepot.objects.create(utilisateur=ouvrier.utilisateur, entrepot=atelier, peut_lire=True, peut_modifier=True)
+        UtilisateurEntrepot.objects.create(utilisateur=ouvrier.utilisateur, entrepot=magasin, peut_lire=True, peut_modifier=False)
+        production = Production.objects.create(produit_fini=self.velo, quantite_prevue=1, date_debut=datetime.date(2026, 1, 5))
+        api = APIClient()
+        api.force_authenticate(ouvrier)
+
+        for donnees in ({'entrepot': magasin.pk}, {'entrepot': atelier.pk, 'entrepot_matieres': magasin.pk}):
+            response = api.post(f'/api/v1/production/{production.pk}/terminer/', donnees)
+            self.assertEqual(response.status_code, 403, response.data)
+        self.assertFalse(MouvementStock.objects.exists())
+        production.refresh_from_db()
+        self.assertEqual(production.statut, 'planifiee')
+
+    def test_where_used_is_kept_up_to_date_without_reloading(self):
+        nomenclature = bom.get_nomenclature()
+        self.assertEqual(nomenclature.cas_emploi(('matiere', self.acier.pk)), {
+            ('semi_fini', self.cadre.pk): 3, ('semi_fini', self.roue.pk): Decimal('3.5'), ('fini', self.velo.pk): 10,
+        })
+        nomenclature.aplatir(('semi_fini', self.cadre.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            NomenclatureProduits.objects.filter(
+                type_produit_parent='semi_fini', id_produit_parent=self.roue.pk, type_composant='matiere', id_composant=self.acier.pk
+            ).get().delete()
+        with self.assertNumQueries(0):
+            mise_a_jour = bom.get_nomenclature()
+        self.assertIsNot(mise_a_jour, nomenclature)
+        self.assertIn(('semi_fini', self.cadre.pk), mise_a_jour._plats)  # unaffected by the change
+        self.assertEqual(mise_a_jour.cas_emploi(('matiere', self.acier.pk)), bom.Nomenclature.charger().cas_emploi(('matiere', self.acier.pk)))
+        self.assertEqual(mise_a_jour.aplatir(('fini', self.velo.pk))[('matiere', self.acier.pk)], 9)
+
+        response = self.api.get('/api/v1/nomenclature-produits/where-used/', {'type': 'matiere', 'id': self.vis.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(produit['nom'], produit['quantite'], produit['direct']) for produit in response.data['produits']],
+            [('vélo', 4.0 + 6 + 2 * 6, True), ('cadre', 6.0, True), ('roue', 6.0, False)],
+        )
+
+    def cout(self, produit):
+        return type(produit).objects.values_list('cout_standard', flat=True).get(pk=produit.pk)
+
+    def test_standard_costs_are_rolled_up_and_follow_changes(self):
+        MatierePremiere.objects.filter(pk=self.acier.pk).update(cout_unitaire=2)
+        MatierePremiere.objects.filter(pk=self.vis.pk).update(cout_unitaire='0.1')
+        # cadre = 3 * 2 + 6 * 0.1; roue = 0.5 * 2 + 6.6; vélo = 6.6 + 2 * 7.6 + 4 * 0.1
+        self.assertEqual(couts.recalculer_couts(), 3)
+        self.assertEqual([self.cout(self.cadre), self.cout(self.roue), self.cout(self.velo)], [Decimal('6.6'), Decimal('7.6'), Decimal('22.2')])
+        self.assertEqual(couts.recalculer_couts(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vis.cout_unitaire = Decimal('0.2')
+            self.vis.save()
+        self.assertEqual([self.cout(self.cadre), self.cout(self.roue), self.cout(self.velo)], [Decimal('7.2'), Decimal('8.2'), Decimal('24.4')])
+
+        # Only the vélo uses the removed link
+        with self.captureOnCommitCallbacks(execute=True):
+            NomenclatureProduits.objects.get(type_produit_parent='fini', type_composant='matiere', id_composant=self.vis.pk).delete()
+        self.assertEqual(self.cout(self.velo), Decimal('23.6'))
+        self.assertEqual(couts.recalculer_couts(), 0)
+
+        # Moving a loaded link recosts its old and new parents
+        lien_vis = NomenclatureProduits.objects.get(type_produit_parent='semi_fini', id_produit_parent=self.cadre.pk, id_composant=self.vis.pk)
+        self.assertEqual(lien_vis._parent_origine, (lien_vis.content_type_parent_id, self.cadre.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            lien_vis.id_produit_parent = self.roue.pk
+            lien_vis.save()
+        # cadre = 3 * 2; roue = 0.5 * 2 + 6 + 6 * 0.2; vélo = 6 + 2 * 8.2
+        self.assertEqual([self.cout(self.cadre), self.cout(self.roue), self.cout(self.velo)], [Decimal('6'), Decimal('8.2'), Decimal('22.4')])
+        self.assertEqual(couts.recalculer_couts(), 0)
+
+        production = Production.objects.create(produit_fini=self.velo, quantite_prevue=10, date_debut=datetime.date(2026, 1, 5))
+        self.assertEqual(self.api.get(f'/api/v1/production/{production.pk}/').data['cout_prevu'], 224.0)
@@ -1,24 +1,184 @@
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from django.utils.dateparse import parse_date
+from rest_framework.response import Response
+from . import bom, cloture, mrp
 from .models import Production, MatiereProduction, NomenclatureProduits
 from .serializers import ProductionSerializer, MatiereProductionSerializer, NomenclatureProduitsSerializer
-from users_app.permissions import IsProductionOrAdmin, IsAdminOrReadOnly, CanManageProduction
+from users_app.permissions import IsProductionOrAdmin, IsAdminOrReadOnly, CanManageProduction, get_permission_context, get_user_accessible_warehouse_ids
 from rest_framework.permissions import IsAuthenticated
 from logs_app.mixins import LoggingMixin
+from sib.fieldsets import SparseQuerysetMixin
+from warehouse.models import Entrepot
 
-class ProductionViewSet(LoggingMixin, viewsets.ModelViewSet):
-    queryset = Production.objects.all().select_related('produit_semi_fini', 'produit_fini', 'cree_par')
+class ProductionViewSet(SparseQuerysetMixin, LoggingMixin, viewsets.ModelViewSet):
+    queryset = Production.objects.all()  # related rows: see SparseQuerysetMixin
     serializer_class = ProductionSerializer
     permission_classes = [CanManageProduction]  # Production workers and Admin can manage
 
     def perform_create(self, serializer):
         serializer.save()
 
+    @action(detail=True, methods=['post'])
+    def terminer(self, request, pk=None):
+        """
+        Complete the order: backflush its materials from ``entrepot_matieres``
+        (default ``entrepot``) and receive ``quantite_produite`` (default the
+        planned quantity) into ``entrepot``, see production_app.cloture
+        """
+        production = self.get_object()
+        permissions = get_permission_context(request.user)
+        entrepots = {}
+        for champ in ('entrepot', 'entrepot_matieres'):
+            valeur = request.data.get(champ)
+            if valeur in (None, ''):
+                continue
+            try:
+                entrepots[champ] = Entrepot.objects.get(pk=int(valeur))
+            except (TypeError, ValueError, Entrepot.DoesNotExist):
+                raise ValidationError({champ: "Entrepôt introuvable"})
+            if not permissions.can_access_warehouse(entrepots[champ].pk, 'write'):
+                raise PermissionDenied(f"Accès refusé à l'entrepôt {entrepots[champ].nom}")
+        if 'entrepot' not in entrepots:
+            raise ValidationError({"entrepot": "Ce champ est obligatoire."})
+
+        quantite = None
+        if request.data.get('quantite_produite') not in (None, ''):
+            try:
+                quantite = Decimal(str(request.data['quantite_produite']))
+            except InvalidOperation:
+                pass
+            if quantite is None or not quantite.is_finite() or quantite <= 0 or quantite != quantite.quantize(Decimal('0.01')):
+                raise ValidationError({"quantite_produite": "doit être un nombre positif à 2 décimales au plus"})
+
+        try:
+            production, mouvements = cloture.terminer_production(
+                production, request.user.utilisateur, entrepots['entrepot'], quantite, entrepots.get('entrepot_matieres')
+            )
+        except cloture.ClotureProductionError as e:
+            raise ValidationError(e.erreurs)
+        return Response({
+            'production': self.get_serializer(production).data,
+            'mouvements': [
+                {'id': mouvement.pk, 'type_mouvement': mouvement.type_mouvement, 'content_type': mouvement.content_type_id,
+                 'id_article': mouvement.id_article, 'entrepot': mouvement.entrepot_id, 'quantite': float(mouvement.quantite)}
+                for mouvement in mouvements
+            ],
+        })
+
+    @action(detail=False, methods=['get'])
+    def mrp(self, request):
+        """
+        Material requirements of the planned orders (starting by ?fin=YYYY-MM-DD
+        if given) netted against the free stock of the user's warehouses,
+        optionally restricted to ?entrepot=<id> (repeatable)
+        """
+        fin = None
+        if request.query_params.get('fin'):
+            try:
+                fin = parse_date(request.query_params['fin'])
+            except ValueError:
+                pass
+            if fin is None:
+                raise ValidationError({"fin": "doit être une date AAAA-MM-JJ"})
+        entrepot_ids = get_user_accessible_warehouse_ids(request.user)
+        if request.query_params.getlist('entrepot'):
+            try:
+                demandes = {int(pk) for pk in request.query_params.getlist('entrepot')}
+            except ValueError:
+                raise ValidationError({"entrepot": "doit être un entier"})
+            entrepot_ids = demandes if entrepot_ids is None else demandes & set(entrepot_ids)
+        try:
+            return Response(mrp.calculer_besoins(fin, entrepot_ids))
+        except bom.CycleNomenclatureError as e:
+            raise ValidationError({"nomenclature": str(e)})
+
 class MatiereProductionViewSet(LoggingMixin, viewsets.ModelViewSet):
     queryset = MatiereProduction.objects.all().select_related('id_production', 'id_matiere')
     serializer_class = MatiereProductionSerializer
     permission_classes = [CanManageProduction]  # Production workers and Admin can manage
 
 class NomenclatureProduitsViewSet(LoggingMixin, viewsets.ModelViewSet):
-    queryset = NomenclatureProduits.objects.all()
+    queryset = NomenclatureProduits.objects.all().prefetch_related('produit_parent', 'composant')
     serializer_class = NomenclatureProduitsSerializer
     permission_classes = [IsAdminOrReadOnly]  # Only admin can modify, all can view
+
+    @action(detail=False, methods=['get'])
+    def explosion(self, request):
+        """Raw material totals for ?type=fini|semi_fini&id=<id>&quantite=<n> (default 1), all levels"""
+        type_article = request.query_params.get('type')
+        if type_article not in ('fini', 'semi_fini'):
+            raise ValidationError({"type": "doit être fini ou semi_fini"})
+        try:
+            pk = int(request.query_params.get('id', ''))
+        except ValueError:
+            raise ValidationError({"id": "doit être un entier"})
+        try:
+            quantite = Decimal(request.query_params.get('quantite', '1'))
+        except InvalidOperation:
+            quantite = None
+        if quantite is None or not quantite.is_finite() or quantite <= 0:
+            raise ValidationError({"quantite": "doit être un nombre positif"})
+
+        noeud = (type_article, pk)
+        try:
+            totaux = bom.get_nomenclature().exploser([(noeud, quantite)])
+        except bom.CycleNomenclatureError as e:
+            raise ValidationError({"nomenclature": str(e)})
+        noms = bom.details([noeud, *totaux])
+        if noeud not in noms:
+            raise NotFound("Produit introuvable")
+        composants = [
+            {'type': feuille[0], 'id': feuille[1], **noms.get(feuille, {'nom': None, 'code_reference': None, 'unite': None}),
+             'quantite': float(total)}
+            for feuille, total in totaux.items() if feuille != noeud
+        ]
+        composants.sort(key=lambda composant: (composant['type'], composant['nom'] or '', composant['id']))
+        return Response({
+            'produit': {'type': type_article, 'id': pk, **noms[noeud]},
+            'quantite': float(quantite),
+            'composants': composants,
+        })
+
+    @action(detail=False, methods=['get'], url_path='where-used')
+    def cas_emploi(self, request):
+        """Products using ?type=matiere|semi_fini&id=<id> at any level, with its quantity per product unit"""
+        type_article = request.query_params.get('type')
+        if type_article not in ('matiere', 'semi_fini'):
+            raise ValidationError({"type": "doit être matiere ou semi_fini"})
+        try:
+            pk = int(request.query_params.get('id', ''))
+        except ValueError:
+            raise ValidationError({"id": "doit être un entier"})
+
+        noeud = (type_article, pk)
+        nomenclature = bom.get_nomenclature()
+        try:
+            emploi = nomenclature.cas_emploi(noeud)
+        except bom.CycleNomenclatureError as e:
+            raise ValidationError({"nomenclature": str(e)})
+        noms = bom.details([noeud, *emploi])
+        if noeud not in noms:
+            raise NotFound("Composant introuvable")
+        directs = {parent for parent, _ in nomenclature.parents_de(noeud)}
+        produits = [
+            {'type': ancetre[0], 'id': ancetre[1], **noms.get(ancetre, {'nom': None, 'code_reference': None, 'unite': None}),
+             'quantite': float(quantite), 'direct': ancetre in directs}
+            for ancetre, quantite in emploi.items()
+        ]
+        produits.sort(key=lambda produit: (not produit['direct'], produit['type'], produit['nom'] or '', produit['id']))
+        return Response({
+            'composant': {'type': type_article, 'id': pk, **noms[noeud]},
+            'produits': produits,
+        })
+
+    @action(detail=False, methods=['get'])
+    def cycles(self, request):
+        """Loops in the existing nomenclature (a product needing itself at some level)"""
+        return Response({'cycles': [
+            [{'type': type_article, 'id': pk} for type_article, pk in cycle]
+            for cycle in bom.get_nomenclature().cycles()
+        ]})
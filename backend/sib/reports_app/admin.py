@@ -0,0 +1,23 @@
+from django.contrib import admin
+from django.utils.html import format_html
+from .models import ReportJob
+# Enhanced Django Admin styling
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'report_type', 'statut', 'nombre_pages', 'demande_par', 'cree_le', 'termine_le', 'get_fichier')
+    list_filter = ('statut', 'report_type', 'cree_le')
+    search_fields = ('report_type', 'erreur')
+    readonly_fields = ('report_type', 'filtres', 'filter_hash', 'data_version', 'statut', 'fichier', 'nombre_pages',
+                       'erreur', 'demande_par', 'cree_le', 'debute_le', 'termine_le')
+    list_per_page = 25
+    date_hierarchy = 'cree_le'
+
+    def get_fichier(self, obj):
+        if obj.statut == 'termine' and obj.fichier:
+            return format_html('<a href="{}" target="_blank">📄 PDF</a>', obj.fichier.url)
+        return 'N/A'
+    get_fichier.short_description = 'Fichier'
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class ReportsAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'reports_app'
+    verbose_name = "Rapports"
+
+    def ready(self):
+        """Import signals when app is ready"""
+        try:
+            import reports_app.signals
+        except ImportError:
+            pass
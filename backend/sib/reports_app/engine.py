@@ -0,0 +1,212 @@
+"""
+Streaming PDF report engine shared by the admin print actions.
+
+Rows are pulled from a chunked queryset iterator and drawn one page-sized
+table at a time, so memory stays roughly constant whatever the report size.
+Rows have a fixed height (cell text is kept on one line), which makes the
+page layout deterministic: the page holding any given row is known in
+advance.
+"""
+import math
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db.models.query import QuerySet
+from django.http import FileResponse
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas as pdf_canvas
+from reportlab.platypus import Table, TableStyle
+
+ITERATOR_CHUNK_SIZE = 2000
+
+MARGIN = 0.6 * inch
+TITLE_BLOCK_HEIGHT = 70
+FOOTER_HEIGHT = 30
+HEADER_ROW_HEIGHT = 24
+ROW_HEIGHT = 14
+BODY_FONT_SIZE = 8
+HEADER_FONT_SIZE = 10
+CELL_PADDING = 6
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey), ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'), ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), HEADER_FONT_SIZE), ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige), ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('FONTSIZE', (0, 1), (-1, -1), BODY_FONT_SIZE), ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('TOPPADDING', (0, 1), (-1, -1), 2), ('BOTTOMPADDING', (0, 1), (-1, -1), 2),
+])
+
+
+def format_cell(value):
+    """Render a model value the way the admin reports always have"""
+    if value is None or value == '':
+        return 'N/A'
+    if isinstance(value, bool):
+        return 'Oui' if value else 'Non'
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%d/%m/%Y %H:%M')
+    if isinstance(value, date):
+        return value.strftime('%d/%m/%Y')
+    if isinstance(value, Decimal):
+        return str(value)
+    return str(value)
+
+
+def resolve(obj, path):
+    """Follow a dotted attribute path ('id_client.nom_entreprise'), None-safe"""
+    for attr in path.split('.'):
+        if obj is None:
+            return None
+        obj = getattr(obj, attr)
+    return obj() if callable(obj) else obj
+
+
+class Column:
+    """A report column: header text, width in inches and a value accessor"""
+
+    def __init__(self, header, width, value):
+        self.header = header
+        self.width = width * inch
+        self.value = value
+
+    def render(self, obj):
+        if callable(self.value):
+            return format_cell(self.value(obj))
+        return format_cell(resolve(obj, self.value))
+
+
+class PageLayout:
+    """Fixed page geometry; every page holds the same number of rows but the first"""
+
+    def __init__(self, col_widths):
+        table_width = sum(col_widths)
+        portrait_width = A4[0] - 2 * MARGIN
+        self.pagesize = A4 if table_width <= portrait_width else landscape(A4)
+        self.width, self.height = self.pagesize
+        body = self.height - 2 * MARGIN - FOOTER_HEIGHT - HEADER_ROW_HEIGHT
+        self.rows_per_page = int(body // ROW_HEIGHT)
+        self.rows_first_page = int((body - TITLE_BLOCK_HEIGHT) // ROW_HEIGHT)
+
+    def page_count(self, row_count):
+        if row_count <= self.rows_first_page:
+            return 1
+        return 1 + math.ceil((row_count - self.rows_first_page) / self.rows_per_page)
+
+    def rows_before_page(self, page_number):
+        """Number of rows drawn on pages 1 .. page_number - 1"""
+        if page_number <= 1:
+            return 0
+        return self.rows_first_page + (page_number - 2) * self.rows_per_page
+
+
+def iterate(rows_source, chunk_size=ITERATOR_CHUNK_SIZE):
+    """Iterate a queryset in server-side chunks instead of caching it"""
+    if isinstance(rows_source, QuerySet):
+        return rows_source.iterator(chunk_size=chunk_size)
+    return iter(rows_source)
+
+
+class PDFReport:
+    """
+    Draws an iterable of rows (lists of strings) into page-sized tables.
+
+    ``first_page`` and ``total_pages`` let a caller render a slice of a larger
+    report with globally consistent page numbers.
+    """
+
+    def __init__(self, title, columns):
+        self.title = title
+        self.columns = columns
+        self.headers = [column.header for column in columns]
+        self.col_widths = [column.width for column in columns]
+        self.layout = PageLayout(self.col_widths)
+        self.max_chars = [
+            max(int((width - 2 * CELL_PADDING) / (BODY_FONT_SIZE * 0.55)), 4) for width in self.col_widths
+        ]
+        self.generated_at = timezone.localtime(timezone.now()).strftime('%d/%m/%Y %H:%M')
+
+    def rows(self, objects):
+        for obj in objects:
+            yield [column.render(obj) for column in self.columns]
+
+    def _clip(self, row):
+        # Keep every cell on one line so that rows have a constant height
+        clipped = []
+        for text, limit in zip(row, self.max_chars):
+            text = str(text).replace('\r', ' ').replace('\n', ' ')
+            if len(text) > limit:
+                text = text[:limit - 3] + '...'
+            clipped.append(text)
+        return clipped
+
+    def _draw_title(self, c):
+        top = self.layout.height - MARGIN
+        c.setFont('Helvetica-Bold', 16)
+        c.drawCentredString(self.layout.width / 2, top - 20, self.title)
+        c.setFont('Helvetica', 10)
+        c.drawCentredString(self.layout.width / 2, top - 45, f"Généré le: {self.generated_at}")
+
+    def _draw_footer(self, c, page_number, total_pages):
+        c.setFont('Helvetica', 8)
+        c.setFillColor(colors.grey)
+        pages = f"Page {page_number} / {total_pages}" if total_pages else f"Page {page_number}"
+        c.drawCentredString(self.layout.width / 2, MARGIN, f"SIB - Système d'Inventaire et de Bilan — {pages}")
+        c.setFillColor(colors.black)
+
+    def _draw_page(self, c, rows, page_number, total_pages):
+        top = self.layout.height - MARGIN
+        if page_number == 1:
+            self._draw_title(c)
+            top -= TITLE_BLOCK_HEIGHT
+        if rows:
+            table = Table(
+                [self.headers] + rows,
+                colWidths=self.col_widths,
+                rowHeights=[HEADER_ROW_HEIGHT] + [ROW_HEIGHT] * len(rows),
+            )
+            table.setStyle(TABLE_STYLE)
+            width, height = table.wrapOn(c, self.layout.width, self.layout.height)
+            table.drawOn(c, (self.layout.width - width) / 2, top - height)
+        elif page_number == 1:
+            c.setFont('Helvetica', 10)
+            c.drawCentredString(self.layout.width / 2, top - 20, "Aucun enregistrement")
+        self._draw_footer(c, page_number, total_pages)
+        c.showPage()
+
+    def render(self, rows, output, first_page=1, total_pages=None):
+        """Write rows to ``output`` (path or binary file); returns the page count"""
+        c = pdf_canvas.Canvas(output, pagesize=self.layout.pagesize, pageCompression=1)
+        c.setTitle(self.title)
+        page_number = first_page
+        capacity = self.layout.rows_first_page if page_number == 1 else self.layout.rows_per_page
+        page_rows = []
+        drawn = 0
+        for row in rows:
+            page_rows.append(self._clip(row))
+            if len(page_rows) == capacity:
+                self._draw_page(c, page_rows, page_number, total_pages)
+                drawn += 1
+                page_number += 1
+                capacity = self.layout.rows_per_page
+                page_rows = []
+        if page_rows or not drawn:
+            self._draw_page(c, page_rows, page_number, total_pages)
+            drawn += 1
+        c.save()
+        return drawn
+
+
+def pdf_response(report, rows, filename=None):
+    """Render into a temporary file and stream it back as an attachment"""
+    handle = tempfile.TemporaryFile()
+    report.render(rows, handle)
+    handle.seek(0)
+    filename = filename or f'{report.title.lower().replace(" ", "_")}.pdf'
+    return FileResponse(handle, as_attachment=True, filename=filename, content_type='application/pdf')
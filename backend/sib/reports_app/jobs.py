@@ -0,0 +1,305 @@
+"""
+Background generation of admin "print all" reports.
+
+A request creates a ReportJob keyed by (report type, filter hash, data
+version). If a finished job already exists for that key, its PDF is served
+as is; otherwise the job is rendered by a local thread pool and written to
+MEDIA_ROOT/reports/<report type>/. Large reports are split across a process
+pool by ``reports_app.parallel``.
+
+Reports are built from the ModelAdmin queryset of the requesting user, so
+jobs and their PDFs are per user: the filter hash covers the user as well.
+
+The data version combines, for the reported model and its declared
+dependencies, the row count, the highest primary key and a change counter
+kept in the cache and bumped by post_save/post_delete signals once the
+transaction commits. Without a shared cache every process starts its own
+counters, so a PDF is only reused by the process that rendered it.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.utils import prepare_lookup_value
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.http import HttpRequest
+from django.utils import timezone
+
+from .models import ReportJob
+from .parallel import render_report_parallel
+
+IGNORED_PARAMS = {'o', 'p', 'e', '_changelist_filters', '_to_field', 'job'}
+CACHE_PREFIX = 'reports:data_version'
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_inflight = set()
+
+
+def model_label(model):
+    return f"{model._meta.app_label}.{model._meta.model_name}"
+
+
+def get_report_admin(report_type):
+    """Return the ModelAdmin that defines a report type, or None"""
+    from .mixins import PDFReportAdminMixin
+    try:
+        model = apps.get_model(report_type)
+    except (LookupError, ValueError):
+        return None
+    model_admin = admin.site._registry.get(model)
+    return model_admin if isinstance(model_admin, PDFReportAdminMixin) else None
+
+
+def report_types():
+    """Labels of every model with a print-all report"""
+    from .mixins import PDFReportAdminMixin
+    return [
+        model_label(model) for model, model_admin in admin.site._registry.items()
+        if isinstance(model_admin, PDFReportAdminMixin)
+    ]
+
+
+def report_models(model_admin):
+    """Models whose changes make a cached report stale"""
+    return [model_admin.model] + [apps.get_model(label) for label in model_admin.report_dependencies]
+
+
+_tracked = None
+
+
+def tracked_models():
+    """Labels of the models whose saves bump a change counter"""
+    global _tracked
+    if _tracked is None:
+        from .mixins import PDFReportAdminMixin
+        tracked = set()
+        for model_admin in admin.site._registry.values():
+            if isinstance(model_admin, PDFReportAdminMixin):
+                for model in report_models(model_admin):
+                    if not getattr(admin.site._registry.get(model), 'report_append_only', False):
+                        tracked.add(model_label(model))
+        _tracked = tracked
+    return _tracked
+
+
+def _version_key(label):
+    return f'{CACHE_PREFIX}:{label}'
+
+
+def bump_data_version(model):
+    """Make the cached reports on model stale once the transaction commits"""
+    key = _version_key(model_label(model))
+
+    def bump():
+        try:
+            cache.incr(key)
+        except ValueError:
+            pass  # no counter yet: the next read starts a new one
+    transaction.on_commit(bump)
+
+
+def change_counter(label):
+    version = cache.get(_version_key(label))
+    if version is None:
+        # Starting from the clock keeps a lost counter from coming back to an old value
+        cache.add(_version_key(label), time.time_ns(), None)
+        version = cache.get(_version_key(label))
+    return version
+
+
+def data_version(model_admin):
+    parts = []
+    for model in report_models(model_admin):
+        stats = model._default_manager.aggregate(count=Count('pk'), max_pk=Max('pk'))
+        label = model_label(model)
+        parts.append(f"{label}:{stats['count']}:{stats['max_pk'] or 0}:{change_counter(label)}")
+    return '|'.join(parts)
+
+
+def clean_filters(model_admin, params):
+    """
+    Keep the changelist parameters a report can be filtered by: lookups on a
+    report filter path that the admin changelist itself would accept.
+    """
+    paths = model_admin.get_report_filter_fields()
+    filters = {}
+    for key, value in params.items():
+        if key in IGNORED_PARAMS or value in (None, ''):
+            continue
+        if key == 'q':
+            filters[key] = value
+            continue
+        try:
+            model_admin.model._meta.get_field(key.split('__', 1)[0])
+        except FieldDoesNotExist:
+            continue
+        if not any(key == path or key.startswith(f'{path}__') for path in paths):
+            continue
+        if model_admin.lookup_allowed(key, value):
+            filters[key] = value
+    return filters
+
+
+def filter_hash(filters, utilisateur=None):
+    return hashlib.sha256(json.dumps(
+        {'filtres': filters, 'utilisateur': getattr(utilisateur, 'pk', None)}, sort_keys=True
+    ).encode()).hexdigest()
+
+
+def report_request(utilisateur):
+    """A bare GET request as utilisateur, for ModelAdmin.get_queryset"""
+    request = HttpRequest()
+    request.method = 'GET'
+    request.user = utilisateur.user
+    return request
+
+
+def base_queryset(model_admin, utilisateur):
+    """What utilisateur sees on the changelist before filtering"""
+    return model_admin.get_queryset(report_request(utilisateur))
+
+
+def apply_filters(model_admin, queryset, filters):
+    filters = dict(filters)
+    search = filters.pop('q', None)
+    if filters:
+        # Query string values as the changelist reads them; the API may send JSON values already
+        queryset = queryset.filter(**{
+            key: prepare_lookup_value(key, value) if isinstance(value, str) else value for key, value in filters.items()
+        })
+    if search:
+        queryset, may_have_duplicates = model_admin.get_search_results(None, queryset, search)
+        if may_have_duplicates:
+            queryset = queryset.distinct()
+    return queryset
+
+
+def artifact_name(job):
+    version = hashlib.sha256(job.data_version.encode()).hexdigest()[:16]
+    return f"reports/{job.report_type}/{job.filter_hash[:16]}-{version}.pdf"
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.REPORT_JOB_WORKERS, thread_name_prefix='report-job')
+    return _executor
+
+
+def submit(job_id):
+    """Queue a job once the transaction that created it has committed"""
+    def _submit():
+        with _executor_lock:
+            if job_id in _inflight:
+                return
+            _inflight.add(job_id)
+        get_executor().submit(run_job, job_id)
+    transaction.on_commit(_submit)
+
+
+def request_report(model_admin, filters, utilisateur):
+    """
+    Return the job serving this report to utilisateur: a finished one when
+    the data has not changed since it was rendered, otherwise a pending or
+    running one.
+    """
+    report_type = model_label(model_admin.model)
+    key = {
+        'report_type': report_type,
+        'filter_hash': filter_hash(filters, utilisateur),
+        'data_version': data_version(model_admin),
+    }
+    stale_before = timezone.now() - timedelta(seconds=settings.REPORT_JOB_TIMEOUT)
+    with transaction.atomic():
+        for job in ReportJob.objects.select_for_update().filter(**key).exclude(statut__in=['echec', 'expire']):
+            if job.statut == 'termine':
+                if job.fichier and job.fichier.storage.exists(job.fichier.name):
+                    return job
+                job.statut = 'expire'
+                job.save(update_fields=['statut'])
+            elif (job.debute_le or job.cree_le) < stale_before:
+                # Left behind by a worker that died mid-render
+                job.statut = 'echec'
+                job.erreur = "Délai de génération dépassé"
+                job.save(update_fields=['statut', 'erreur'])
+            else:
+                if job.statut == 'en_attente':
+                    submit(job.id)  # the process that queued it may be gone
+                return job
+        job = ReportJob.objects.create(filtres=filters, demande_par=utilisateur, **key)
+        submit(job.id)
+    return job
+
+
+def run_job(job_id):
+    try:
+        claimed = ReportJob.objects.filter(pk=job_id, statut='en_attente').update(
+            statut='en_cours', debute_le=timezone.now()
+        )
+        if not claimed:
+            return
+        job = ReportJob.objects.select_related('demande_par__user').get(pk=job_id)
+        try:
+            model_admin = get_report_admin(job.report_type)
+            if model_admin is None:
+                raise LookupError(f"Type de rapport inconnu: {job.report_type}")
+            if job.demande_par is None:
+                raise LookupError("Utilisateur du rapport introuvable")
+            queryset = model_admin.get_report_queryset(
+                apply_filters(model_admin, base_queryset(model_admin, job.demande_par), job.filtres)
+            )
+            name = artifact_name(job)
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            partial = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+            try:
+                job.nombre_pages = render_report_parallel(
+                    model_admin, job.filtres, model_admin.report_title_all, partial, queryset,
+                    utilisateur_id=job.demande_par_id,
+                )
+                os.replace(partial, path)
+            finally:
+                if os.path.exists(partial):
+                    os.remove(partial)
+            job.fichier.name = name
+            job.statut = 'termine'
+            job.termine_le = timezone.now()
+            job.save(update_fields=['fichier', 'nombre_pages', 'statut', 'termine_le'])
+            expire_previous(job)
+        except Exception as e:
+            logger.exception("Error generating report %s #%s", job.report_type, job.id)
+            job.statut = 'echec'
+            job.erreur = str(e)
+            job.termine_le = timezone.now()
+            job.save(update_fields=['statut', 'erreur', 'termine_le'])
+    finally:
+        with _executor_lock:
+            _inflight.discard(job_id)
+        connection.close()
+
+
+def expire_previous(job):
+    """Delete the artifacts of older versions of the same report"""
+    previous = ReportJob.objects.filter(
+        report_type=job.report_type, filter_hash=job.filter_hash, statut='termine'
+    ).exclude(pk=job.pk).exclude(data_version=job.data_version)
+    for old in previous:
+        if old.fichier and old.fichier.name != job.fichier.name:
+            old.fichier.storage.delete(old.fichier.name)
+    previous.update(statut='expire')
@@ -0,0 +1,110 @@
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reports_app.engine import Column, PDFReport, iterate
+from reports_app.parallel import plan_chunks, render_chunks_parallel
+
+TITLE = "Benchmark - Rapport des Activités"
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def bench_columns():
+    return [
+        Column('Horodatage', 1.5, 'horodatage'),
+        Column('Utilisateur', 1.2, 'id_utilisateur.nom'),
+        Column('Action', 1, 'action'),
+        Column('Modèle', 1, 'content_type.model'),
+        Column('ID Entité', 0.8, 'id_entite'),
+        Column('Détails', 1.5, 'details'),
+    ]
+
+
+def synthetic_rows(start, count):
+    now = timezone.now()
+    for i in range(start, start + count):
+        yield [
+            (now - timedelta(seconds=i)).strftime('%d/%m/%Y %H:%M:%S'),
+            f'Utilisateur {i % 50}',
+            ('Création', 'Mise à jour', 'Suppression')[i % 3],
+            'stock',
+            str(i),
+            f'Mise à jour de Stock #{i}: quantité modifiée de {i % 97} à {i % 89}',
+        ]
+
+
+def render_synthetic_chunk(task, path):
+    offset, count, first_page, total_pages = task
+    report = PDFReport(TITLE, bench_columns())
+    report.render(synthetic_rows(offset, count), path, first_page=first_page, total_pages=total_pages)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the streaming PDF report engine (time and peak memory)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Number of synthetic rows to render')
+        parser.add_argument('--from-db', action='store_true', help='Render the activity log table instead of synthetic rows')
+        parser.add_argument('--workers', type=int, default=1, help='Render page-aligned chunks in this many processes')
+        parser.add_argument('--output', type=str, help='Keep the generated PDF at this path')
+        parser.add_argument('--tracemalloc', action='store_true', help='Also report the Python allocation peak (much slower)')
+
+    def handle(self, *args, **options):
+        report = PDFReport(TITLE, bench_columns())
+        workers = options['workers']
+
+        if options['from_db']:
+            from logs_app.models import HistoriqueActivite
+            queryset = HistoriqueActivite.objects.select_related('id_utilisateur', 'content_type').order_by('pk')
+            row_count = queryset.count()
+        else:
+            row_count = options['rows']
+
+        output = options['output'] or tempfile.mkstemp(suffix='.pdf')[1]
+        rss_before = peak_rss_mb()
+        if options['tracemalloc']:
+            tracemalloc.start()
+        started = time.perf_counter()
+        if options['from_db'] and workers > 1:
+            from django.contrib import admin
+            from reports_app.parallel import render_report_parallel
+            model_admin = admin.site._registry[HistoriqueActivite]
+            queryset = model_admin.get_report_queryset()
+            pages = render_report_parallel(model_admin, {}, TITLE, output, queryset, workers=workers, min_rows=0)
+        elif options['from_db']:
+            pages = report.render(report.rows(iterate(queryset)), output)
+        elif workers > 1:
+            pages = report.layout.page_count(row_count)
+            tasks = [chunk + (pages,) for chunk in plan_chunks(report.layout, row_count, workers)]
+            render_chunks_parallel(render_synthetic_chunk, tasks, output, workers, TITLE)
+        else:
+            pages = report.render(synthetic_rows(0, row_count), output)
+        elapsed = time.perf_counter() - started
+        traced_peak = None
+        if options['tracemalloc']:
+            _, traced_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        size = os.path.getsize(output)
+        if not options['output']:
+            os.remove(output)
+
+        self.stdout.write(f'📊 Lignes: {row_count} | Pages: {pages} | Processus: {workers} | Taille: {size / (1024 * 1024):.1f} Mo')
+        self.stdout.write(f'⏱️  Durée: {elapsed:.2f} s ({row_count / elapsed:.0f} lignes/s)')
+        self.stdout.write(f'💾 RSS max: {peak_rss_mb():.1f} Mo (avant rendu: {rss_before:.1f} Mo)')
+        if workers > 1:
+            self.stdout.write(f'💾 RSS max par processus de rendu: {peak_rss_mb(resource.RUSAGE_CHILDREN):.1f} Mo')
+        if traced_peak is not None:
+            self.stdout.write(f'💾 Pic alloué (tracemalloc): {traced_peak / (1024 * 1024):.1f} Mo')
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('users_app', '0006_utilisateur_statut_equipe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportDataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, unique=True, verbose_name='Modèle')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Version')),
+            ],
+            options={
+                'verbose_name': 'Version des Données',
+                'verbose_name_plural': 'Versions des Données',
+                'db_table': 'report_data_versions',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_type', models.CharField(max_length=100, verbose_name='Type de Rapport')),
+                ('filtres', models.JSONField(blank=True, default=dict, verbose_name='Filtres')),
+                ('filter_hash', models.CharField(max_length=64, verbose_name='Empreinte des Filtres')),
+                ('data_version', models.CharField(max_length=255, verbose_name='Version des Données')),
+                ('statut', models.CharField(choices=[('en_attente', 'En Attente'), ('en_cours', 'En Cours'), ('termine', 'Terminé'), ('echec', 'Échec'), ('expire', 'Expiré')], default='en_attente', max_length=20, verbose_name='Statut')),
+                ('fichier', models.FileField(blank=True, upload_to='reports/', verbose_name='Fichier')),
+                ('nombre_pages', models.PositiveIntegerField(blank=True, null=True, verbose_name='Nombre de Pages')),
+                ('erreur', models.TextField(blank=True, verbose_name='Erreur')),
+                ('cree_le', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+                ('debute_le', models.DateTimeField(blank=True, null=True, verbose_name='Débuté le')),
+                ('termine_le', models.DateTimeField(blank=True, null=True, verbose_name='Terminé le')),
+                ('demande_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rapports_demandes', to='users_app.utilisateur', verbose_name='Demandé par')),
+            ],
+            options={
+                'verbose_name': 'Génération de Rapport',
+                'verbose_name_plural': 'Générations de Rapports',
+                'db_table': 'report_jobs',
+                'ordering': ['-cree_le'],
+                'indexes': [models.Index(fields=['report_type', 'filter_hash', 'data_version'], name='report_jobs_cache_key_idx')],
+            },
+        ),
+    ]
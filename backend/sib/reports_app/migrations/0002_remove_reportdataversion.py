@@ -0,0 +1,16 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:31
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='ReportDataVersion',
+        ),
+    ]
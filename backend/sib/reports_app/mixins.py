@@ -0,0 +1,253 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from django.utils.http import urlencode
+
+from .engine import Column, PDFReport, iterate, pdf_response, resolve
+from .exports import csv_response, xlsx_response
+
+
+class PDFReportAdminMixin:
+    """
+    Print actions for a ModelAdmin: print button per row, "print selected"
+    and "print all" actions and the matching admin URLs
+    (``<app>_<model>_print`` and ``<app>_<model>_print_all``).
+
+    Subclasses declare ``report_columns`` as (header, width in inches,
+    accessor) tuples, where the accessor is a dotted attribute path or a
+    callable taking the object.
+
+    "Print all" runs as a background job (see ``reports_app.jobs``) and is
+    served from the cached PDF while the data is unchanged. Models listed in
+    ``report_dependencies`` ("app_label.Model") also invalidate the cache;
+    ``report_append_only`` skips the per-save change counter for tables that
+    are only ever inserted into.
+    """
+    report_columns = ()
+    report_title_selected = None
+    report_title_all = None
+    report_select_related = ()
+    report_prefetch_related = ()
+    print_selected_label = "🖨️ Imprimer la sélection"
+    print_all_label = "🖨️ Imprimer tout"
+    report_dependencies = ()
+    report_append_only = False
+
+    def _report_url_name(self, suffix):
+        opts = self.model._meta
+        return f'admin:{opts.app_label}_{opts.model_name}_{suffix}'
+
+    def get_report_columns(self):
+        return [Column(header, width, value) for header, width, value in self.report_columns]
+
+    def get_report_queryset(self, queryset=None):
+        queryset = self.model._default_manager.all() if queryset is None else queryset
+        if self.report_select_related:
+            queryset = queryset.select_related(*self.report_select_related)
+        if self.report_prefetch_related:
+            queryset = queryset.prefetch_related(*self.report_prefetch_related)
+        if not queryset.ordered:
+            queryset = queryset.order_by('pk')
+        return queryset
+
+    def report_rows(self, report, queryset, summary=True):
+        """Yield the table rows, then the summary rows"""
+        yield from report.rows(iterate(queryset))
+        if summary:
+            yield from self.report_summary_rows(queryset)
+
+    def report_summary_rows(self, queryset):
+        """Rows appended after the data (totals); computed in the database"""
+        return []
+
+    def report_object_title(self, obj):
+        return f"{self.model._meta.verbose_name} - {obj}"
+
+    def get_report_filter_fields(self):
+        """Field paths a background report may be filtered on (changelist filters)"""
+        paths = set()
+        for list_filter in self.list_filter:
+            if isinstance(list_filter, (list, tuple)):
+                list_filter = list_filter[0]  # (path, FieldListFilter class)
+            if isinstance(list_filter, str):
+                paths.add(list_filter)
+        if self.date_hierarchy:
+            paths.add(self.date_hierarchy)
+        return paths
+
+    def generate_pdf_report(self, queryset, title):
+        report = PDFReport(title, self.get_report_columns())
+        return pdf_response(report, self.report_rows(report, queryset))
+
+    def render_report(self, queryset, title, output):
+        """Render to a path or binary file; returns the page count"""
+        report = PDFReport(title, self.get_report_columns())
+        return report.render(self.report_rows(report, queryset), output)
+
+    def print_button(self, obj):
+        return format_html(
+            '<a class="material-icons" href="{}" target="_blank" style="color: #2196F3; text-decoration: none;" title="Imprimer">print</a>',
+            reverse(self._report_url_name('print'), args=[obj.pk])
+        )
+    print_button.short_description = '🖨️ Imprimer'
+
+    def print_selected(self, request, queryset):
+        return self.generate_pdf_report(self.get_report_queryset(queryset), self.report_title_selected)
+
+    def print_all(self, request, queryset):
+        return self.request_report_response(request)
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        for name, label in (('print_selected', self.print_selected_label), ('print_all', self.print_all_label)):
+            if name in actions:
+                actions[name] = (actions[name][0], name, label)
+        return actions
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context['show_print_all'] = True
+        extra_context['print_all_url'] = reverse(self._report_url_name('print_all'))
+        if request.GET:
+            # Print what the changelist shows
+            extra_context['print_all_url'] += f"?{request.GET.urlencode()}"
+        return super().changelist_view(request, extra_context)
+
+    def get_urls(self):
+        urls = super().get_urls()
+        opts = self.model._meta
+        custom_urls = [
+            path('<int:object_id>/print/', self.admin_site.admin_view(self.print_object_view), name=f'{opts.app_label}_{opts.model_name}_print'),
+            path('print_all/', self.admin_site.admin_view(self.print_all_view), name=f'{opts.app_label}_{opts.model_name}_print_all'),
+        ]
+        return custom_urls + urls
+
+    def print_object_view(self, request, object_id):
+        queryset = self.get_report_queryset(self.get_queryset(request)).filter(pk=object_id)
+        obj = queryset.first()
+        if obj is None:
+            return HttpResponse(f"{self.model._meta.verbose_name} non trouvé(e)", status=404)
+        return self.generate_pdf_report(queryset, self.report_object_title(obj))
+
+    def print_all_view(self, request):
+        from .models import ReportJob
+        job_id = request.GET.get('job')
+        if job_id:
+            opts = self.model._meta
+            jobs = ReportJob.objects.filter(pk=job_id, report_type=f"{opts.app_label}.{opts.model_name}")
+            if not request.user.is_superuser:
+                jobs = jobs.filter(demande_par__user=request.user)
+            job = jobs.first()
+            if job is None:
+                return HttpResponse("Rapport non trouvé", status=404)
+            return self.report_job_response(request, job)
+        return self.request_report_response(request)
+
+    def request_report_response(self, request):
+        from .jobs import clean_filters, request_report
+        utilisateur = getattr(request.user, 'utilisateur', None)
+        if utilisateur is None:
+            raise PermissionDenied
+        filters = clean_filters(self, request.GET)
+        job = request_report(self, filters, utilisateur)
+        if job.statut == 'termine':
+            return self.report_job_response(request, job)
+        return HttpResponseRedirect(f"{reverse(self._report_url_name('print_all'))}?job={job.id}")
+
+    def report_job_response(self, request, job):
+        if job.statut == 'termine':
+            filename = f'{self.report_title_all.lower().replace(" ", "_")}.pdf'
+            return FileResponse(job.fichier.open('rb'), as_attachment=True, filename=filename, content_type='application/pdf')
+        retry_url = reverse(self._report_url_name('print_all'))
+        if job.filtres:
+            retry_url += f"?{urlencode(job.filtres)}"
+        if job.statut == 'expire':
+            return HttpResponseRedirect(retry_url)
+        context = {
+            **self.admin_site.each_context(request),
+            'title': self.report_title_all,
+            'opts': self.model._meta,
+            'job': job,
+            'retry_url': retry_url,
+            'refresh_seconds': settings.REPORT_JOB_POLL_INTERVAL,
+        }
+        return TemplateResponse(request, 'admin/reports_app/report_job_status.html', context)
+
+
+class SpreadsheetExportAdminMixin:
+    """
+    "Export CSV" / "Export Excel" actions and changelist links for a ModelAdmin.
+
+    The action exports the selected rows (or all rows matching the changelist
+    when "select all" is used); the links export what the changelist shows,
+    with its filters and search applied. ``export_fields`` are (header,
+    accessor) tuples, accessors as in ``report_columns``.
+    """
+    export_fields = ()
+    export_select_related = ()
+    export_prefetch_related = ()
+
+    def _export_url_name(self, suffix):
+        opts = self.model._meta
+        return f'admin:{opts.app_label}_{opts.model_name}_{suffix}'
+
+    def get_export_fields(self):
+        return self.export_fields
+
+    def get_export_filename(self):
+        return f"{self.model._meta.model_name}_{timezone.localtime(timezone.now()).strftime('%Y%m%d_%H%M')}"
+
+    def get_export_queryset(self, queryset):
+        if self.export_select_related:
+            queryset = queryset.select_related(*self.export_select_related)
+        if self.export_prefetch_related:
+            queryset = queryset.prefetch_related(*self.export_prefetch_related)
+        if not queryset.ordered:
+            queryset = queryset.order_by('pk')
+        return queryset
+
+    def export_rows(self, queryset):
+        fields = self.get_export_fields()
+        for obj in iterate(self.get_export_queryset(queryset)):
+            yield [value(obj) if callable(value) else resolve(obj, value) for _, value in fields]
+
+    def export_response(self, queryset, file_format):
+        headers = [header for header, _ in self.get_export_fields()]
+        if file_format == 'xlsx':
+            return xlsx_response(self.get_export_filename(), str(self.model._meta.verbose_name_plural), headers, self.export_rows(queryset))
+        return csv_response(self.get_export_filename(), headers, self.export_rows(queryset))
+
+    def export_csv(self, request, queryset):
+        return self.export_response(queryset, 'csv')
+    export_csv.short_description = "📄 Exporter en CSV"
+
+    def export_xlsx(self, request, queryset):
+        return self.export_response(queryset, 'xlsx')
+    export_xlsx.short_description = "📊 Exporter en Excel (XLSX)"
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        query = f"?{request.GET.urlencode()}" if request.GET else ''
+        extra_context['export_csv_url'] = reverse(self._export_url_name('export_csv')) + query
+        extra_context['export_xlsx_url'] = reverse(self._export_url_name('export_xlsx')) + query
+        return super().changelist_view(request, extra_context)
+
+    def get_urls(self):
+        urls = super().get_urls()
+        opts = self.model._meta
+        custom_urls = [
+            path('export_csv/', self.admin_site.admin_view(self.export_changelist_view), {'file_format': 'csv'}, name=f'{opts.app_label}_{opts.model_name}_export_csv'),
+            path('export_xlsx/', self.admin_site.admin_view(self.export_changelist_view), {'file_format': 'xlsx'}, name=f'{opts.app_label}_{opts.model_name}_export_xlsx'),
+        ]
+        return custom_urls + urls
+
+    def export_changelist_view(self, request, file_format):
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        # Same queryset as the changelist: get_queryset, list filters and search
+        changelist = self.get_changelist_instance(request)
+        return self.export_response(changelist.get_queryset(request), file_format)
@@ -0,0 +1,38 @@
+from django.db import models
+from users_app.models import Utilisateur
+
+
+class ReportJob(models.Model):
+    STATUT_CHOICES = [
+        ('en_attente', 'En Attente'),
+        ('en_cours', 'En Cours'),
+        ('termine', 'Terminé'),
+        ('echec', 'Échec'),
+        ('expire', 'Expiré'),
+    ]
+
+    report_type = models.CharField(max_length=100, verbose_name="Type de Rapport")  # "<app_label>.<model_name>"
+    filtres = models.JSONField(default=dict, blank=True, verbose_name="Filtres")
+    filter_hash = models.CharField(max_length=64, verbose_name="Empreinte des Filtres")
+    data_version = models.CharField(max_length=255, verbose_name="Version des Données")
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='en_attente', verbose_name="Statut")
+    fichier = models.FileField(upload_to='reports/', blank=True, verbose_name="Fichier")
+    nombre_pages = models.PositiveIntegerField(null=True, blank=True, verbose_name="Nombre de Pages")
+    erreur = models.TextField(blank=True, verbose_name="Erreur")
+    demande_par = models.ForeignKey(Utilisateur, on_delete=models.SET_NULL, null=True, blank=True, related_name='rapports_demandes', verbose_name="Demandé par")
+    cree_le = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
+    debute_le = models.DateTimeField(null=True, blank=True, verbose_name="Débuté le")
+    termine_le = models.DateTimeField(null=True, blank=True, verbose_name="Terminé le")
+
+    class Meta:
+        verbose_name = "Génération de Rapport"
+        verbose_name_plural = "Générations de Rapports"
+        db_table = 'report_jobs'
+        ordering = ['-cree_le']
+        indexes = [
+            models.Index(fields=['report_type', 'filter_hash', 'data_version'], name='report_jobs_cache_key_idx'),
+        ]
+
+    def __str__(self):
+        return f"Rapport {self.report_type} #{self.id} ({self.get_statut_display()})"
+
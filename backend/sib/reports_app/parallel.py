@@ -0,0 +1,216 @@
+"""
+Parallel rendering of large admin reports.
+
+The report queryset is cut into keyset ranges on its ordering (plus the
+primary key as a tie-breaker), each range holding a whole number of pages.
+Worker processes render their range with the global page numbers, and the
+partial PDFs are merged in order.
+"""
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+
+from .engine import PDFReport
+
+logger = logging.getLogger(__name__)
+
+
+def plan_chunks(layout, row_count, chunks):
+    """
+    Split ``row_count`` rows into at most ``chunks`` runs that each start on
+    a page boundary. Returns (offset, count, first_page) tuples.
+    """
+    total_pages = layout.page_count(row_count)
+    pages_per_chunk = max(math.ceil(total_pages / max(chunks, 1)), 1)
+    plan = []
+    page = 1
+    while page <= total_pages:
+        offset = layout.rows_before_page(page)
+        if offset >= row_count and plan:
+            break
+        end = min(layout.rows_before_page(page + pages_per_chunk), row_count)
+        plan.append((offset, end - offset, page))
+        page += pages_per_chunk
+    return plan
+
+
+def merge_pdfs(parts, output, title=None):
+    """Concatenate partial PDFs into ``output`` (path)"""
+    from pypdf import PdfWriter
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(part)
+    if title:
+        writer.add_metadata({'/Title': title})
+    with open(output, 'wb') as handle:
+        writer.write(handle)
+    writer.close()
+
+
+def _setup_django():
+    import django
+    django.setup()
+
+
+def render_chunks_parallel(render_chunk, tasks, output, workers, title=None):
+    """
+    Render ``tasks`` with ``render_chunk(task, path)`` in a process pool and
+    merge the results, in task order, into ``output``.
+
+    Workers are spawned rather than forked: the caller is usually a thread of
+    a web worker holding database connections that must not be shared.
+    """
+    workdir = tempfile.mkdtemp(prefix='report-parts-')
+    try:
+        paths = [os.path.join(workdir, f'part-{index:05d}.pdf') for index in range(len(tasks))]
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_setup_django) as pool:
+            list(pool.map(render_chunk, tasks, paths))
+        merge_pdfs(paths, output, title)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def keyset_ordering(queryset):
+    """
+    Return the ordering of ``queryset`` as [(field, descending)], ending with
+    the primary key, or None when it cannot be used for keyset ranges
+    (expressions, related lookups or nullable columns).
+    """
+    query = queryset.query
+    ordering = list(query.order_by or (query.default_ordering and queryset.model._meta.ordering) or [])
+    fields = []
+    pk_name = queryset.model._meta.pk.name
+    for item in ordering:
+        if not isinstance(item, str) or '__' in item:
+            return None
+        descending = item.startswith('-')
+        name = item.lstrip('-')
+        if name == 'pk':
+            name = pk_name
+        try:
+            field = queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if field.null or not field.concrete:
+            return None
+        fields.append((field.attname, descending))
+        if name == pk_name:
+            return fields
+    fields.append((pk_name, False))
+    return fields
+
+
+def keyset_q(ordering, values, after, inclusive):
+    """Rows after (or before) ``values`` in the ordering, lexicographically"""
+    clauses = []
+    for index, (name, descending) in enumerate(ordering):
+        equal = {ordering[j][0]: values[j] for j in range(index)}
+        greater = after != descending
+        clauses.append(Q(**equal, **{f'{name}__{"gt" if greater else "lt"}': values[index]}))
+    if inclusive:
+        clauses.append(Q(**{name: value for (name, _), value in zip(ordering, values)}))
+    return reduce(or_, clauses)
+
+
+def keyset_boundaries(queryset, ordering, offsets):
+    """Ordering values of the rows at ``offsets`` (ascending), in one pass"""
+    wanted = iter(sorted(offsets))
+    target = next(wanted, None)
+    boundaries = []
+    names = [name for name, _ in ordering]
+    for index, values in enumerate(queryset.values_list(*names).iterator(chunk_size=10000)):
+        if index == target:
+            boundaries.append(values)
+            target = next(wanted, None)
+            if target is None:
+                break
+    return boundaries
+
+
+def range_queryset(queryset, ordering, lower, upper):
+    if lower is not None:
+        queryset = queryset.filter(keyset_q(ordering, lower, after=True, inclusive=True))
+    if upper is not None:
+        queryset = queryset.filter(keyset_q(ordering, upper, after=False, inclusive=False))
+    return queryset
+
+
+def render_range(task, path):
+    """Worker entry point: render one keyset range of an admin report"""
+    from users_app.models import Utilisateur
+    from .jobs import apply_filters, base_queryset, get_report_admin
+    model_admin = get_report_admin(task['report_type'])
+    if task['utilisateur'] is None:
+        queryset = model_admin.model._default_manager.all()
+    else:
+        queryset = base_queryset(model_admin, Utilisateur.objects.select_related('user').get(pk=task['utilisateur']))
+    queryset = model_admin.get_report_queryset(apply_filters(model_admin, queryset, task['filtres']))
+    queryset = range_queryset(queryset, task['ordering'], task['lower'], task['upper'])
+    report = PDFReport(task['title'], model_admin.get_report_columns())
+    rows = model_admin.report_rows(report, queryset, summary=False)
+    if task['summary']:
+        rows = _chain(rows, task['summary'])
+    report.render(rows, path, first_page=task['first_page'], total_pages=task['total_pages'])
+
+
+def _chain(rows, extra):
+    yield from rows
+    yield from extra
+
+
+def render_report_parallel(model_admin, filtres, title, output, queryset, workers=None, min_rows=None, utilisateur_id=None):
+    """
+    Render ``queryset`` (already filtered with ``filtres``) to ``output``,
+    in parallel when it is large enough. Returns the page count. Workers
+    rebuild the queryset as seen by ``utilisateur_id`` (unscoped when None).
+    """
+    workers = workers or settings.REPORT_RENDER_PROCESSES or os.cpu_count() or 1
+    min_rows = settings.REPORT_PARALLEL_MIN_ROWS if min_rows is None else min_rows
+    ordering = keyset_ordering(queryset)
+    if workers < 2 or ordering is None:
+        return model_admin.render_report(queryset, title, output)
+    row_count = queryset.count()
+    if row_count < min_rows:
+        return model_admin.render_report(queryset, title, output)
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        logger.warning("pypdf is not installed, rendering the report in a single process")
+        return model_admin.render_report(queryset, title, output)
+
+    report = PDFReport(title, model_admin.get_report_columns())
+    summary = [list(row) for row in model_admin.report_summary_rows(queryset)]
+    layout = report.layout
+    total_pages = layout.page_count(row_count + len(summary))
+    plan = plan_chunks(layout, row_count, workers)
+    boundaries = keyset_boundaries(queryset, ordering, [offset for offset, _, _ in plan[1:]])
+    lowers = [None] + boundaries
+    uppers = boundaries + [None]
+    tasks = [
+        {
+            'report_type': f"{model_admin.model._meta.app_label}.{model_admin.model._meta.model_name}",
+            'filtres': filtres,
+            'utilisateur': utilisateur_id,
+            'title': title,
+            'ordering': ordering,
+            'lower': lower,
+            'upper': upper,
+            'first_page': first_page,
+            'total_pages': total_pages,
+            'summary': summary if upper is None else [],
+        }
+        for (_, _, first_page), lower, upper in zip(plan, lowers, uppers)
+    ]
+    render_chunks_parallel(render_range, tasks, output, workers, title)
+    return total_pages
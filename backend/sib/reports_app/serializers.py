@@ -0,0 +1,31 @@
+from rest_framework import serializers
+from django.urls import reverse
+from .models import ReportJob
+from .jobs import get_report_admin
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    telechargement = serializers.SerializerMethodField(read_only=True)
+
+    class Meta:
+        model = ReportJob
+        fields = ('id', 'report_type', 'filtres', 'statut', 'nombre_pages', 'erreur', 'data_version',
+                  'cree_le', 'debute_le', 'termine_le', 'telechargement')
+        read_only_fields = ('id', 'statut', 'nombre_pages', 'erreur', 'data_version',
+                            'cree_le', 'debute_le', 'termine_le', 'telechargement')
+
+    def get_telechargement(self, obj):
+        if obj.statut != 'termine':
+            return None
+        url = reverse('reportjob-telecharger', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def validate_report_type(self, value):
+        if get_report_admin(value.lower()) is None:
+            raise serializers.ValidationError("Type de rapport inconnu.")
+        return value.lower()
+
+    def validate_filtres(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Les filtres doivent être un objet.")
+        return value
@@ -0,0 +1,15 @@
+"""
+Signals keeping report data versions current
+"""
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .jobs import bump_data_version, model_label, tracked_models
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_report_data_version(sender, raw=False, **kwargs):
+    """A saved or deleted row invalidates the cached reports built on its model"""
+    if raw or model_label(sender) not in tracked_models():
+        return
+    bump_data_version(sender)
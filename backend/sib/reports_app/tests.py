@@ -0,0 +1,259 @@
+import os
+import re
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from communication_app.models import Message
+from logs_app.models import HistoriqueActivite
+from production_app.models import Production
+from sales_app.models import ArticleCommande, Client, Commande
+
+from .engine import Column, PageLayout, PDFReport
+from .exports import csv_value
+from .jobs import clean_filters, data_version, request_report
+from .models import ReportJob
+from .parallel import (
+    keyset_boundaries, keyset_ordering, merge_pdfs, plan_chunks, range_queryset, render_chunks_parallel,
+    render_report_parallel,
+)
+
+
+def render_numbers(task, path):
+    """Process-pool chunk renderer for the tests: rows are their own numbers"""
+    report = PDFReport('Numéros', [Column('N°', 1, 'numero')])
+    rows = ([str(numero)] for numero in range(task['offset'], task['offset'] + task['count']))
+    report.render(rows, path, first_page=task['first_page'], total_pages=task['total_pages'])
+
+
+def render_in_process(render_chunk, tasks, output, workers, title=None):
+    """render_chunks_parallel without the pool: spawned workers cannot see the test database"""
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = [os.path.join(workdir, f'part-{index}.pdf') for index in range(len(tasks))]
+        for task, path in zip(tasks, paths):
+            render_chunk(task, path)
+        merge_pdfs(paths, output, title)
+
+
+def page_texts(path, footer=True):
+    from pypdf import PdfReader
+    texts = [re.sub(r'Généré le: .*', '', page.extract_text()) for page in PdfReader(path).pages]
+    return texts if footer else [re.sub(r' — Page .*', '', text) for text in texts]
+
+
+class ReportEngineTests(TestCase):
+
+    def setUp(self):
+        self.report = PDFReport('Numéros', [Column('N°', 1, 'numero')])
+
+    def test_page_count_matches_the_rendered_pages(self):
+        layout = self.report.layout
+        first, per_page = layout.rows_first_page, layout.rows_per_page
+        self.assertLess(first, per_page)  # the title block takes room on page 1
+        for row_count, pages in ((0, 1), (1, 1), (first, 1), (first + 1, 2), (first + per_page, 2), (first + 2 * per_page + 1, 4)):
+            self.assertEqual(layout.page_count(row_count), pages, row_count)
+            rendered = self.report.render(([str(i)] for i in range(row_count)), BytesIO())
+            self.assertEqual(rendered, pages, row_count)
+        self.assertEqual(layout.rows_before_page(3), first + per_page)
+        # wide tables switch to landscape
+        self.assertGreater(PageLayout([4 * 72] * 3).width, layout.width)
+
+    def test_empty_report_is_a_one_page_pdf(self):
+        output = BytesIO()
+        self.assertEqual(self.report.render(iter(()), output), 1)
+        self.assertTrue(output.getvalue().startswith(b'%PDF'))
+        output.seek(0)
+        [text] = page_texts(output)
+        self.assertIn('Aucun enregistrement', text)
+        self.assertIn('Page 1', text)
+
+    def test_print_object_view_uses_the_admin_queryset(self):
+        Group.objects.get_or_create(name='Administrateurs')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        client = Client.objects.create(nom_entreprise='Client')
+        visible, cachee = (Commande.objects.create(id_client=client, date_commande=date(2026, 1, 5)) for _ in range(2))
+
+        model_admin = admin.site._registry[Commande]
+        with mock.patch.object(model_admin, 'get_queryset', lambda request: Commande.objects.exclude(pk=cachee.pk)):
+            response = self.client.get(reverse('admin:sales_app_commande_print', args=[visible.pk]))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/pdf')
+            self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+            self.assertEqual(self.client.get(reverse('admin:sales_app_commande_print', args=[cachee.pk])).status_code, 404)
+
+
+class ReportFilterTests(TestCase):
+
+    def test_relation_traversal_is_rejected(self):
+        params = {
+            'id_utilisateur__user__password__startswith': 'pbkdf2',
+            'id_utilisateur__id__exact': '1',
+            'action': 'Connexion',
+        }
+        self.assertEqual(clean_filters(admin.site._registry[HistoriqueActivite], params), {
+            'id_utilisateur__id__exact': '1',
+            'action': 'Connexion',
+        })
+        self.assertEqual(clean_filters(admin.site._registry[Message], {
+            'id_expediteur__user__password__startswith': 'pbkdf2',
+            'id_destinataire__user__username': 'admin',
+        }), {})
+
+    def test_related_list_filters_are_kept(self):
+        params = {
+            'id_commande__statut__exact': 'livree',
+            'id_commande__date_commande__gte': '2026-01-01',
+            'id_commande__id_client__nom_entreprise': 'Client',
+            'quantite__gt': '1',
+        }
+        self.assertEqual(clean_filters(admin.site._registry[ArticleCommande], params), {
+            'id_commande__statut__exact': 'livree',
+            'id_commande__date_commande__gte': '2026-01-01',
+        })
+
+
+class ReportJobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Group.objects.get_or_create(name='Commerciaux')
+        cls.users = [User.objects.create_user(f'vendeur{i}', password='x') for i in range(2)]
+        permission = Permission.objects.get(codename='view_commande')
+        for user in cls.users:
+            user.user_permissions.add(permission)
+
+    def setUp(self):
+        cache.clear()
+        self.model_admin = admin.site._registry[Commande]
+
+    def test_jobs_are_per_user(self):
+        jobs = [request_report(self.model_admin, {'statut__exact': 'livree'}, user.utilisateur) for user in self.users]
+        self.assertNotEqual(jobs[0].filter_hash, jobs[1].filter_hash)
+        self.assertEqual(request_report(self.model_admin, {'statut__exact': 'livree'}, self.users[0].utilisateur), jobs[0])
+
+        api = APIClient()
+        api.force_authenticate(self.users[1])
+        response = api.get('/api/v1/report-jobs/')
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual([job['id'] for job in results], [jobs[1].id])
+        self.assertEqual(api.get(f'/api/v1/report-jobs/{jobs[0].id}/').status_code, 404)
+        self.assertEqual(ReportJob.objects.count(), 2)
+
+    def test_data_version_changes_once_committed(self):
+        client = Client.objects.create(nom_entreprise='Client')
+        commande = Commande.objects.create(id_client=client, date_commande=date(2026, 1, 5))
+        version = data_version(self.model_admin)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            commande.statut = 'livree'
+            commande.save()
+            self.assertEqual(data_version(self.model_admin), version)
+        self.assertTrue(callbacks)
+        self.assertNotEqual(data_version(self.model_admin), version)
+
+
+class SpreadsheetExportTests(TestCase):
+
+    def test_csv_cells_cannot_start_a_formula(self):
+        for value in ('=1+1', '+33 6 12 34 56 78', '-2', '@SUM(A1)', '\tx', '\rx'):
+            self.assertEqual(csv_value(value), f"'{value}")
+        self.assertEqual(csv_value('Client A'), 'Client A')
+        self.assertEqual(csv_value(Decimal('-2.50')), '-2.50')
+        self.assertEqual(csv_value(-3), '-3')
+
+    def test_changelists_link_to_exports(self):
+        Group.objects.get_or_create(name='Administrateurs')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        for opts in (Production._meta, HistoriqueActivite._meta, Commande._meta):
+            response = self.client.get(reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist'), {'q': 'x'})
+            self.assertContains(response, f"{reverse(f'admin:{opts.app_label}_{opts.model_name}_export_csv')}?q=x")
+            self.assertContains(response, reverse(f'admin:{opts.app_label}_{opts.model_name}_export_xlsx'))
+
+
+class ParallelReportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        client = Client.objects.create(nom_entreprise='Client')
+        debut = date(2026, 1, 1)
+        cls.commandes = Commande.objects.bulk_create(
+            Commande(id_client=client, date_commande=debut + timedelta(days=i % 7), total=Decimal(i)) for i in range(260)
+        )
+
+    def setUp(self):
+        self.model_admin = admin.site._registry[Commande]
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+
+    def test_keyset_ordering(self):
+        self.assertEqual(keyset_ordering(Commande.objects.all()), [('id', False)])
+        self.assertEqual(keyset_ordering(Commande.objects.order_by('-date_commande')), [('date_commande', True), ('id', False)])
+        self.assertEqual(keyset_ordering(Commande.objects.order_by('id_client', '-pk', 'statut')), [('id_client_id', False), ('id', True)])
+        for ordering in ('id_client__nom_entreprise', 'date_livraison', 'cree_par'):
+            self.assertIsNone(keyset_ordering(Commande.objects.order_by(ordering)), ordering)
+
+    def test_keyset_ranges_split_the_rows_at_the_boundaries(self):
+        queryset = Commande.objects.order_by('-date_commande', 'pk')
+        ordering = keyset_ordering(queryset)
+        pks = list(queryset.values_list('pk', flat=True))
+        boundaries = keyset_boundaries(queryset, ordering, [200, 50, 120])
+        self.assertEqual(boundaries, [tuple(queryset.values_list('date_commande', 'pk')[offset]) for offset in (50, 120, 200)])
+
+        ranges = list(zip([None] + boundaries, boundaries + [None]))
+        chunks = [list(range_queryset(queryset, ordering, lower, upper).values_list('pk', flat=True)) for lower, upper in ranges]
+        self.assertEqual([len(chunk) for chunk in chunks], [50, 70, 80, 60])
+        self.assertEqual(sum(chunks, []), pks)
+
+    def test_plan_chunks_start_on_page_boundaries(self):
+        layout = PDFReport('Numéros', [Column('N°', 1, 'numero')]).layout
+        row_count = layout.rows_first_page + 5 * layout.rows_per_page + 3
+        plan = plan_chunks(layout, row_count, 3)
+        self.assertEqual([first_page for _, _, first_page in plan], [1, 4, 7])  # 7 pages, 3 per chunk
+        self.assertEqual([offset for offset, _, _ in plan], [layout.rows_before_page(page) for _, _, page in plan])
+        self.assertEqual(sum(count for _, count, _ in plan), row_count)
+        for (offset, count, _), (next_offset, _, _) in zip(plan, plan[1:]):
+            self.assertEqual(offset + count, next_offset)
+        self.assertEqual(plan_chunks(layout, 0, 4), [(0, 0, 1)])
+
+    def test_render_chunks_parallel_merges_the_parts_in_order(self):
+        layout = PDFReport('Numéros', [Column('N°', 1, 'numero')]).layout
+        row_count = layout.rows_first_page + 4 * layout.rows_per_page
+        total_pages = layout.page_count(row_count)
+        tasks = [
+            {'offset': offset, 'count': count, 'first_page': first_page, 'total_pages': total_pages}
+            for offset, count, first_page in plan_chunks(layout, row_count, 3)
+        ]
+        output = os.path.join(self.workdir.name, 'numeros.pdf')
+        render_chunks_parallel(render_numbers, tasks, output, 2, 'Numéros')
+
+        texts = page_texts(output)
+        self.assertEqual(len(texts), total_pages)
+        for page, text in enumerate(texts, 1):
+            self.assertIn(f'Page {page} / {total_pages}', text)
+            self.assertIn(f'\n{layout.rows_before_page(page)}\n', f'\n{text}\n')
+
+    def test_parallel_report_matches_the_serial_one(self):
+        queryset = self.model_admin.get_report_queryset()
+        serial = os.path.join(self.workdir.name, 'serie.pdf')
+        parallel = os.path.join(self.workdir.name, 'parallele.pdf')
+        serial_pages = self.model_admin.render_report(queryset, 'Commandes', serial)
+        with mock.patch('reports_app.parallel.render_chunks_parallel', render_in_process):
+            pages = render_report_parallel(self.model_admin, {}, 'Commandes', parallel, queryset, workers=3, min_rows=0)
+
+        self.assertGreater(serial_pages, 3)
+        self.assertEqual(pages, serial_pages)
+        texts = page_texts(parallel)
+        self.assertEqual(len(texts), serial_pages)
+        for page, text in enumerate(texts, 1):
+            self.assertIn(f'Page {page} / {serial_pages}', text)
+        self.assertIn('Total général', texts[-1])
+        # same rows on the same pages; the serial footer has no page total
+        self.assertEqual(page_texts(parallel, footer=False), page_texts(serial, footer=False))
@@ -0,0 +1,7 @@
+from rest_framework.routers import DefaultRouter
+from .views import ReportJobViewSet
+
+router = DefaultRouter()
+router.register(r'report-jobs', ReportJobViewSet)
+
+urlpatterns = router.urls
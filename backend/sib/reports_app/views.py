@@ -0,0 +1,60 @@
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.response import Response
+from django.http import FileResponse
+from .models import ReportJob
+from .serializers import ReportJobSerializer
+from .jobs import clean_filters, get_report_admin, report_types, request_report
+
+def can_view_report(user, report_type):
+    app_label, model_name = report_type.split('.', 1)
+    return user.is_superuser or user.has_perm(f'{app_label}.view_{model_name}')
+
+class ReportJobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Background report generation.
+    POST {"report_type": "sales_app.commande", "filtres": {"statut": "livree"}} returns the job;
+    when the data has not changed since the last run the job is already 'termine'.
+    """
+    queryset = ReportJob.objects.all()
+    serializer_class = ReportJobSerializer
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_superuser:
+            return ReportJob.objects.all()
+        # Reports hold what their requester sees: jobs are private
+        return ReportJob.objects.filter(
+            demande_par__user=user,
+            report_type__in=[label for label in report_types() if can_view_report(user, label)],
+        )
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        report_type = serializer.validated_data['report_type']
+        if not can_view_report(request.user, report_type):
+            raise PermissionDenied("Vous n'avez pas accès à ce rapport.")
+        utilisateur = getattr(request.user, 'utilisateur', None)
+        if utilisateur is None:
+            raise PermissionDenied("Aucun profil utilisateur associé.")
+        model_admin = get_report_admin(report_type)
+        filters = clean_filters(model_admin, serializer.validated_data.get('filtres', {}))
+        job = request_report(model_admin, filters, utilisateur)
+        return Response(
+            self.get_serializer(job).data,
+            status=status.HTTP_200_OK if job.statut == 'termine' else status.HTTP_202_ACCEPTED
+        )
+
+    @action(detail=True, methods=['get'])
+    def telecharger(self, request, pk=None):
+        """Download the PDF of a finished job"""
+        job = self.get_object()
+        if job.statut != 'termine' or not job.fichier:
+            return Response({"error": "Le rapport n'est pas encore disponible", "statut": job.statut},
+                            status=status.HTTP_409_CONFLICT)
+        model_admin = get_report_admin(job.report_type)
+        title = model_admin.report_title_all if model_admin else job.report_type
+        return FileResponse(job.fichier.open('rb'), as_attachment=True,
+                            filename=f'{title.lower().replace(" ", "_")}.pdf', content_type='application/pdf')
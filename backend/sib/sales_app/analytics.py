@@ -0,0 +1,166 @@
+"""
+Sales analytics.
+
+VenteJournaliere holds the order lines summed per (day, client, product),
+cancelled orders excluded. The signals in sales_app.signals recompute the
+(day, client) slices an order or line change touches; the
+rebuild_sales_rollups command rebuilds a date range after bulk writes.
+The aggregates served at /api/v1/sales/analytics/ are read from the rollups
+and cached until the next rollup change.
+"""
+import hashlib
+import json
+import time
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import ArticleCommande, Commande, VenteJournaliere
+
+STATUTS_EXCLUS = ('annulee',)
+CACHE_PREFIX = 'sib:sales_analytics'
+
+# name -> (grouping values, ordering)
+DIMENSIONS = {
+    'clients': (('id_client', 'id_client__nom_entreprise'), ('-ca', 'id_client')),
+    'produits': (('id_produit', 'id_produit__nom', 'id_produit__code_reference'), ('-ca', 'id_produit')),
+    'mois': (('mois',), ('mois',)),
+}
+
+
+def agreger_lignes(lignes):
+    """Rows of VenteJournaliere fields for an ArticleCommande queryset"""
+    montant = ExpressionWrapper(
+        F('quantite') * F('prix_unitaire'), output_field=DecimalField(max_digits=18, decimal_places=4)
+    )
+    return (
+        lignes.exclude(id_commande__statut__in=STATUTS_EXCLUS)
+        .values('id_produit', jour=F('id_commande__date_commande'), client=F('id_commande__id_client'))
+        .annotate(quantite_totale=Sum('quantite'), chiffre_affaires=Sum(montant), nombre_lignes=Count('pk'))
+        .order_by()
+    )
+
+
+def _rollup(row):
+    return VenteJournaliere(
+        jour=row['jour'], id_client_id=row['client'], id_produit_id=row['id_produit'],
+        quantite=row['quantite_totale'], chiffre_affaires=row['chiffre_affaires'], nombre_lignes=row['nombre_lignes'],
+    )
+
+
+def cles_ventes(commande_ids):
+    """(day, client id) slices of these orders"""
+    commande_ids = {pk for pk in commande_ids if pk is not None}
+    if not commande_ids:
+        return set()
+    return set(Commande.objects.filter(pk__in=commande_ids).values_list('date_commande', 'id_client'))
+
+
+def recalculer_ventes(cles):
+    """Recompute the rollups of these (day, client) slices from the order lines"""
+    cles = {cle for cle in cles if None not in cle}
+    if not cles:
+        return
+    with transaction.atomic():
+        VenteJournaliere.objects.filter(reduce(or_, (Q(jour=jour, id_client=client) for jour, client in cles))).delete()
+        lignes = ArticleCommande.objects.filter(reduce(or_, (
+            Q(id_commande__date_commande=jour, id_commande__id_client=client) for jour, client in cles
+        )))
+        VenteJournaliere.objects.bulk_create(_rollup(row) for row in agreger_lignes(lignes))
+    invalider_cache()
+
+
+def reconstruire_ventes(debut=None, fin=None, batch_size=1000):
+    """Rebuild the rollups of a date range (everything by default); returns the row count"""
+    rollups = VenteJournaliere.objects.all()
+    lignes = ArticleCommande.objects.all()
+    if debut:
+        rollups = rollups.filter(jour__gte=debut)
+        lignes = lignes.filter(id_commande__date_commande__gte=debut)
+    if fin:
+        rollups = rollups.filter(jour__lte=fin)
+        lignes = lignes.filter(id_commande__date_commande__lte=fin)
+    count = 0
+    with transaction.atomic():
+        rollups.delete()
+        batch = []
+        for row in agreger_lignes(lignes).iterator(chunk_size=batch_size):
+            batch.append(_rollup(row))
+            if len(batch) >= batch_size:
+                VenteJournaliere.objects.bulk_create(batch)
+                count += len(batch)
+                batch = []
+        VenteJournaliere.objects.bulk_create(batch)
+        count += len(batch)
+    invalider_cache()
+    return count
+
+
+def _version_key():
+    return f'{CACHE_PREFIX}:version'
+
+
+def invalider_cache():
+    """Make the cached aggregates stale once the transaction commits"""
+    def bump():
+        try:
+            cache.incr(_version_key())
+        except ValueError:
+            pass  # no version yet: the next read starts a new one
+    transaction.on_commit(bump)
+
+
+def ventes(dimension, debut=None, fin=None, client=None, produit=None, limite=None):
+    """Revenue grouped by clients, produits or mois, cached until the rollups change"""
+    if limite is not None and limite < 1:
+        raise ValueError("limite doit être un entier positif")
+    params = {'debut': debut, 'fin': fin, 'client': client, 'produit': produit, 'limite': limite}
+    timeout = settings.SALES_ANALYTICS_CACHE_TIMEOUT
+    if not timeout:
+        return _calculer_ventes(dimension, **params)
+
+    version = cache.get(_version_key())
+    if version is None:
+        # Start from a value no earlier entry can carry
+        cache.add(_version_key(), time.time_ns(), None)
+        version = cache.get(_version_key())
+    digest = hashlib.md5(json.dumps(params, default=str, sort_keys=True).encode()).hexdigest()
+    key = f'{CACHE_PREFIX}:{version}:{dimension}:{digest}'
+    data = cache.get(key)
+    if data is None:
+        data = _calculer_ventes(dimension, **params)
+        cache.set(key, data, timeout)
+    return data
+
+
+def _calculer_ventes(dimension, debut, fin, client, produit, limite):
+    valeurs, ordering = DIMENSIONS[dimension]
+    rollups = VenteJournaliere.objects.all()
+    if debut:
+        rollups = rollups.filter(jour__gte=debut)
+    if fin:
+        rollups = rollups.filter(jour__lte=fin)
+    if client:
+        rollups = rollups.filter(id_client=client)
+    if produit:
+        rollups = rollups.filter(id_produit=produit)
+    if dimension == 'mois':
+        rollups = rollups.annotate(mois=TruncMonth('jour'))
+    rows = (
+        rollups.values(*valeurs)
+        .annotate(ca=Sum('chiffre_affaires'), qte=Sum('quantite'), lignes=Sum('nombre_lignes'))
+        .order_by(*ordering)
+    )
+    if limite is not None:
+        rows = rows[:limite]
+    results = [
+        {**{name: row[name] for name in valeurs},
+         'chiffre_affaires': round(float(row['ca']), 2), 'quantite': float(row['qte']), 'nombre_lignes': row['lignes']}
+        for row in rows
+    ]
+    return {'count': len(results), 'results': results}
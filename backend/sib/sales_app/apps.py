@@ -5,3 +5,7 @@ class SalesAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sales_app'
     verbose_name = "Gestion des Ventes"
+
+    def ready(self):
+        """Import signals when app is ready"""
+        import sales_app.signals
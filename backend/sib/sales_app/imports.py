@@ -0,0 +1,230 @@
+"""
+Bulk order import from CSV.
+
+One row per order line, with a header (';' or ',' separated, UTF-8):
+
+    reference;client;date_commande;date_livraison;produit;quantite;prix_unitaire
+    PO-1001;Acme;2024-03-01;;PF-001;10;12,50
+    PO-1001;Acme;2024-03-01;;PF-002;4;3.20
+
+Consecutive rows with the same reference form one order; client is a client
+id or its exact company name, produit a ProduitFini code_reference and
+date_livraison is optional. The file is read as a stream: orders are
+validated and inserted with bulk_create in chunks, one transaction per chunk.
+An order with an invalid row is skipped and its errors are reported per row;
+the other orders are imported. Totals and daily sales rollups are computed
+here since bulk_create bypasses sales_app.signals. Imported lines hold no
+stock reservation (see the reserver action).
+"""
+import csv
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from inventory_app.models import ProduitFini
+from logs_app.sinks import get_audit_sink, make_event
+
+from . import analytics
+from .models import ArticleCommande, Client, Commande
+
+COLONNES = ('reference', 'client', 'date_commande', 'date_livraison', 'produit', 'quantite', 'prix_unitaire')
+COLONNES_REQUISES = ('reference', 'client', 'date_commande', 'produit', 'quantite', 'prix_unitaire')
+TAILLE_LOT = 1000  # rows per transaction, rounded up to whole orders
+MAXIMUM = Decimal(10) ** 8  # quantite and prix_unitaire are DecimalField(10, 2)
+
+
+class ImportCommandesError(Exception):
+    """The file cannot be read at all (missing header or columns)"""
+
+
+def lire_csv(fichier):
+    """DictReader over a text stream, with the delimiter detected from the header"""
+    try:
+        entete = fichier.readline()
+    except UnicodeDecodeError:
+        raise ImportCommandesError("Fichier illisible: encodage UTF-8 attendu")
+    delimiteur = ';' if entete.count(';') >= entete.count(',') else ','
+    colonnes = [nom.strip().lower() for nom in next(csv.reader([entete], delimiter=delimiteur), [])]
+    manquantes = [nom for nom in COLONNES_REQUISES if nom not in colonnes]
+    if manquantes:
+        raise ImportCommandesError(f"Colonnes manquantes: {', '.join(manquantes)}")
+    return csv.DictReader(fichier, fieldnames=colonnes, delimiter=delimiteur)
+
+
+def _decimal(valeur):
+    """'12,5' or '12.5' -> Decimal('12.50'); None when not a number"""
+    try:
+        nombre = Decimal(valeur.replace(' ', '').replace(',', '.'))
+        return nombre.quantize(Decimal('0.01')) if nombre.is_finite() else None
+    except InvalidOperation:
+        return None  # also raised by quantize for huge values
+
+
+def _date(valeur):
+    try:
+        return parse_date(valeur)
+    except ValueError:
+        return None
+
+
+class ImportCommandes:
+    """
+    Streams rows into orders. The client and product lookup maps are loaded
+    once per import; ``importer`` returns a report with the counts and the
+    errors of the rejected rows (their line number in the file).
+    """
+
+    def __init__(self, utilisateur=None, taille_lot=TAILLE_LOT, dry_run=False):
+        self.utilisateur = utilisateur
+        self.taille_lot = taille_lot
+        self.dry_run = dry_run
+        self.clients = {}
+        self.clients_par_nom = {}
+        for pk, nom in Client.objects.values_list('pk', 'nom_entreprise'):
+            self.clients[str(pk)] = pk
+            self.clients_par_nom.setdefault(nom.strip().lower(), []).append(pk)
+        self.produits = {
+            code: (pk, est_archive)
+            for pk, code, est_archive in ProduitFini.objects.values_list('pk', 'code_reference', 'est_archive')
+        }
+        self.content_type = ContentType.objects.get_for_model(Commande)
+        self.rapport = {'commandes': 0, 'lignes': 0, 'commandes_rejetees': 0, 'erreurs': []}
+
+    def importer(self, fichier):
+        lignes = lire_csv(fichier)
+        lot, taille = [], 0
+        try:
+            for commande in self.commandes(lignes):
+                lot.append(commande)
+                taille += len(commande['lignes'])
+                if taille >= self.taille_lot:
+                    self.enregistrer(lot)
+                    lot, taille = [], 0
+        except (UnicodeDecodeError, csv.Error) as e:
+            # The chunks already written stay imported
+            self.rapport['erreurs'].append({
+                'ligne': lignes.line_num + 2, 'reference': None,
+                'erreurs': {'fichier': f"Lecture interrompue, lignes suivantes ignorées: {e}"},
+            })
+            return self.rapport
+        self.enregistrer(lot)
+        return self.rapport
+
+    def commandes(self, lignes):
+        """Group consecutive rows by reference; yields the valid orders"""
+        courante = None
+        for ligne in lignes:
+            numero = lignes.line_num + 1  # the header was read before the reader
+            ligne = {nom: (ligne.get(nom) or '').strip() for nom in COLONNES}
+            if not any(ligne.values()):
+                continue
+            if courante is None or ligne['reference'] != courante['reference']:
+                if courante is not None and self.valider(courante):
+                    yield courante
+                courante = {'reference': ligne['reference'], 'lignes': []}
+            courante['lignes'].append((numero, ligne))
+        if courante is not None and self.valider(courante):
+            yield courante
+
+    def valider(self, commande):
+        """Resolve and check the rows of an order; reports the errors and returns False when invalid"""
+        erreurs, articles, produits_vus = {}, [], set()
+        _, premiere = commande['lignes'][0]
+        entete = {
+            'client': self.resoudre_client(premiere['client']),
+            'date_commande': _date(premiere['date_commande']),
+            'date_livraison': _date(premiere['date_livraison']) if premiere['date_livraison'] else None,
+        }
+        for numero, ligne in commande['lignes']:
+            messages = {}
+            if not ligne['reference']:
+                messages['reference'] = "Référence de commande requise"
+            if isinstance(entete['client'], str):
+                messages['client'] = entete['client']
+            elif any(ligne[nom] != premiere[nom] for nom in ('client', 'date_commande', 'date_livraison')):
+                messages['commande'] = "Client et dates doivent être identiques sur toutes les lignes de la commande"
+            if entete['date_commande'] is None:
+                messages['date_commande'] = "Date invalide (AAAA-MM-JJ attendu)"
+            if premiere['date_livraison'] and entete['date_livraison'] is None:
+                messages['date_livraison'] = "Date invalide (AAAA-MM-JJ attendu)"
+
+            produit = self.produits.get(ligne['produit'])
+            if produit is None:
+                messages['produit'] = f"Produit inconnu: {ligne['produit']}" if ligne['produit'] else "Produit requis"
+            elif produit[1]:
+                messages['produit'] = f"Produit archivé: {ligne['produit']}"
+            elif produit[0] in produits_vus:
+                messages['produit'] = "Produit déjà présent dans la commande"
+            quantite, prix = _decimal(ligne['quantite']), _decimal(ligne['prix_unitaire'])
+            if quantite is None or not 0 < quantite < MAXIMUM:
+                messages['quantite'] = "Doit être un nombre positif inférieur à 100 000 000"
+            if prix is None or not 0 <= prix < MAXIMUM:
+                messages['prix_unitaire'] = "Doit être un nombre positif ou nul inférieur à 100 000 000"
+            if messages:
+                erreurs[numero] = messages
+            else:
+                produits_vus.add(produit[0])
+                articles.append(ArticleCommande(
+                    id_produit_id=produit[0], quantite=quantite, prix_unitaire=prix,
+                ))
+
+        if erreurs:
+            self.rapport['commandes_rejetees'] += 1
+            for numero, _ in commande['lignes']:
+                self.rapport['erreurs'].append({
+                    'ligne': numero,
+                    'reference': commande['reference'],
+                    'erreurs': erreurs.get(numero) or {'commande': "Commande rejetée: une autre ligne est invalide"},
+                })
+            return False
+        commande['objet'] = Commande(
+            id_client_id=entete['client'], date_commande=entete['date_commande'],
+            date_livraison=entete['date_livraison'], cree_par=self.utilisateur,
+            total=sum((article.montant for article in articles), Decimal(0)), nombre_articles=len(articles),
+        )
+        commande['lignes'] = articles
+        return True
+
+    def resoudre_client(self, valeur):
+        """Client id, or an error message"""
+        if not valeur:
+            return "Client requis"
+        if valeur in self.clients:
+            return self.clients[valeur]
+        correspondances = self.clients_par_nom.get(valeur.lower(), [])
+        if len(correspondances) == 1:
+            return correspondances[0]
+        if correspondances:
+            return f"Plusieurs clients portent le nom {valeur}: utilisez l'identifiant"
+        return f"Client inconnu: {valeur}"
+
+    def enregistrer(self, lot):
+        if not lot:
+            return
+        if not self.dry_run:
+            with transaction.atomic():
+                commandes = Commande.objects.bulk_create([commande['objet'] for commande in lot])
+                articles = []
+                for commande, objet in zip(lot, commandes):
+                    for article in commande['lignes']:
+                        article.id_commande = objet
+                        articles.append(article)
+                ArticleCommande.objects.bulk_create(articles)
+                analytics.recalculer_ventes({(objet.date_commande, objet.id_client_id) for objet in commandes})
+                utilisateur_id = self.utilisateur.pk if self.utilisateur else None
+                get_audit_sink().emit_many([
+                    make_event(
+                        utilisateur_id=utilisateur_id, action="Import de Commande", content_type_id=self.content_type.pk,
+                        id_entite=objet.pk, details=f"Référence {commande['reference']}: {objet.nombre_articles} ligne(s)",
+                    )
+                    for commande, objet in zip(lot, commandes)
+                ])
+        self.rapport['commandes'] += len(lot)
+        self.rapport['lignes'] += sum(len(commande['lignes']) for commande in lot)
+
+
+def importer_commandes(fichier, utilisateur=None, taille_lot=TAILLE_LOT, dry_run=False):
+    """Import the orders of a CSV text stream; see ImportCommandes"""
+    return ImportCommandes(utilisateur, taille_lot, dry_run).importer(fichier)
@@ -0,0 +1,42 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from sales_app.imports import TAILLE_LOT, ImportCommandesError, importer_commandes
+
+
+class Command(BaseCommand):
+    help = 'Import orders from a CSV file of order lines (see sales_app.imports for the columns)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', type=str, help='CSV file, UTF-8, ; or , separated')
+        parser.add_argument('--user', type=str, help='Username recorded as the creator of the orders')
+        parser.add_argument('--batch-size', type=int, default=TAILLE_LOT, help='Rows per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, write nothing')
+
+    def handle(self, *args, **options):
+        utilisateur = None
+        if options['user']:
+            try:
+                utilisateur = User.objects.get(username=options['user']).utilisateur
+            except User.DoesNotExist:
+                raise CommandError(f"Utilisateur {options['user']} introuvable")
+
+        started = time.perf_counter()
+        try:
+            with open(options['fichier'], encoding='utf-8-sig', newline='') as fichier:
+                rapport = importer_commandes(fichier, utilisateur, options['batch_size'], options['dry_run'])
+        except OSError as e:
+            raise CommandError(f"Lecture impossible: {e}")
+        except ImportCommandesError as e:
+            raise CommandError(str(e))
+
+        for erreur in rapport['erreurs']:
+            messages = '; '.join(f"{champ}: {message}" for champ, message in erreur['erreurs'].items())
+            self.stdout.write(self.style.WARNING(f"⚠️  Ligne {erreur['ligne']} ({erreur['reference']}): {messages}"))
+        verbe = 'validées' if options['dry_run'] else 'importées'
+        self.stdout.write(
+            f"✅ {rapport['commandes']} commandes ({rapport['lignes']} lignes) {verbe}, "
+            f"{rapport['commandes_rejetees']} rejetées en {time.perf_counter() - started:.1f} s"
+        )
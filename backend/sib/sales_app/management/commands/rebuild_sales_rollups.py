@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from sales_app.analytics import reconstruire_ventes
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales rollups (ventes_journalieres) from the order lines, after bulk imports or updates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--debut', type=str, help='First day to rebuild (YYYY-MM-DD), default: the beginning')
+        parser.add_argument('--fin', type=str, help='Last day to rebuild (YYYY-MM-DD), default: the end')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        bornes = {}
+        for name in ('debut', 'fin'):
+            if options[name]:
+                try:
+                    bornes[name] = parse_date(options[name])
+                except ValueError:
+                    bornes[name] = None
+                if bornes[name] is None:
+                    raise CommandError(f"--{name}: date invalide (AAAA-MM-JJ attendu)")
+        started = time.perf_counter()
+        count = reconstruire_ventes(batch_size=options['batch_size'], **bornes)
+        self.stdout.write(f'✅ {count} ventes journalières reconstruites en {time.perf_counter() - started:.1f} s')
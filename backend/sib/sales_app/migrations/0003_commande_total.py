@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:49
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_totaux(apps, schema_editor):
+    # Same UPDATE as sales_app.models.recalculer_totaux_commandes, on the historical models
+    Commande = apps.get_model('sales_app', 'Commande')
+    ArticleCommande = apps.get_model('sales_app', 'ArticleCommande')
+    montant = models.DecimalField(max_digits=18, decimal_places=4)
+    lignes = ArticleCommande.objects.filter(id_commande=OuterRef('pk')).order_by().values('id_commande')
+    total = lignes.annotate(s=Sum(ExpressionWrapper(F('quantite') * F('prix_unitaire'), output_field=montant))).values('s')
+    Commande.objects.update(
+        total=Coalesce(Subquery(total), Value(Decimal(0)), output_field=montant),
+        nombre_articles=Coalesce(Subquery(lignes.annotate(n=Count('pk')).values('n')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales_app', '0002_fournisseur'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commande',
+            name='nombre_articles',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name="Nombre d'Articles"),
+        ),
+        migrations.AddField(
+            model_name='commande',
+            name='total',
+            field=models.DecimalField(db_index=True, decimal_places=4, default=0, editable=False, max_digits=18, verbose_name='Total'),
+        ),
+        migrations.RunPython(backfill_totaux, migrations.RunPython.noop),
+    ]
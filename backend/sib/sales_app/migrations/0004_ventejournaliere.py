@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:56
+
+from django.db import migrations, models
+from django.db.models import Count, ExpressionWrapper, F, Sum
+import django.db.models.deletion
+
+
+def backfill_ventes(apps, schema_editor):
+    # Same aggregation as sales_app.analytics.reconstruire_ventes, on the historical models
+    ArticleCommande = apps.get_model('sales_app', 'ArticleCommande')
+    VenteJournaliere = apps.get_model('sales_app', 'VenteJournaliere')
+    montant = ExpressionWrapper(F('quantite') * F('prix_unitaire'), output_field=models.DecimalField(max_digits=18, decimal_places=4))
+    rows = (
+        ArticleCommande.objects.exclude(id_commande__statut='annulee')
+        .values('id_produit', jour=F('id_commande__date_commande'), client=F('id_commande__id_client'))
+        .annotate(quantite_totale=Sum('quantite'), chiffre_affaires=Sum(montant), nombre_lignes=Count('pk'))
+        .order_by()
+    )
+    VenteJournaliere.objects.bulk_create((
+        VenteJournaliere(
+            jour=row['jour'], id_client_id=row['client'], id_produit_id=row['id_produit'], quantite=row['quantite_totale'],
+            chiffre_affaires=row['chiffre_affaires'], nombre_lignes=row['nombre_lignes'],
+        )
+        for row in rows.iterator(chunk_size=1000)
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0007_mouvementstock_entrepot_destination_fk_and_more'),
+        ('sales_app', '0003_commande_total'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VenteJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField(verbose_name='Jour')),
+                ('quantite', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='Quantité')),
+                ('chiffre_affaires', models.DecimalField(decimal_places=4, default=0, max_digits=18, verbose_name="Chiffre d'Affaires")),
+                ('nombre_lignes', models.PositiveIntegerField(default=0, verbose_name='Nombre de Lignes')),
+                ('id_client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventes_journalieres', to='sales_app.client', verbose_name='Client')),
+                ('id_produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventes_journalieres', to='inventory_app.produitfini', verbose_name='Produit Fini')),
+            ],
+            options={
+                'verbose_name': 'Vente Journalière',
+                'verbose_name_plural': 'Ventes Journalières',
+                'db_table': 'ventes_journalieres',
+                'indexes': [models.Index(fields=['id_client', 'jour'], name='ventes_client_jour_idx'), models.Index(fields=['id_produit', 'jour'], name='ventes_produit_jour_idx')],
+                'unique_together': {('jour', 'id_client', 'id_produit')},
+            },
+        ),
+        migrations.RunPython(backfill_ventes, migrations.RunPython.noop),
+    ]
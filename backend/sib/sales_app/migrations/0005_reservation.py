@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0001_initial'),
+        ('inventory_app', '0008_stock_quantite_reservee'),
+        ('sales_app', '0004_ventejournaliere'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantite', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Quantité')),
+                ('statut', models.CharField(choices=[('active', 'Active'), ('consommee', 'Consommée'), ('liberee', 'Libérée')], default='active', max_length=20, verbose_name='Statut')),
+                ('cree_le', models.DateTimeField(auto_now_add=True, verbose_name='Créée le')),
+                ('maj_le', models.DateTimeField(auto_now=True, verbose_name='Mise à jour le')),
+                ('entrepot', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='reservations', to='warehouse.entrepot', verbose_name='Entrepôt')),
+                ('id_article_commande', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='sales_app.articlecommande', verbose_name='Article de Commande')),
+                ('id_produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='inventory_app.produitfini', verbose_name='Produit Fini')),
+            ],
+            options={
+                'verbose_name': 'Réservation',
+                'verbose_name_plural': 'Réservations',
+                'db_table': 'reservations',
+                'indexes': [models.Index(fields=['id_produit', 'entrepot', 'statut'], name='reservations_stock_idx')],
+                'unique_together': {('id_article_commande', 'entrepot')},
+            },
+        ),
+    ]
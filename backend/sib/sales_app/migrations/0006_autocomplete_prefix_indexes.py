@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:06
+
+from django.db import migrations
+import sib.indexes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales_app', '0005_reservation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=sib.indexes.PrefixIndex('nom_entreprise', name='clients_nom_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=sib.indexes.PrefixIndex('email', name='clients_email_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=sib.indexes.PrefixIndex('telephone', name='clients_tel_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fournisseur',
+            index=sib.indexes.PrefixIndex('nom_entreprise', name='fournisseurs_nom_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fournisseur',
+            index=sib.indexes.PrefixIndex('code_fournisseur', name='fournisseurs_code_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fournisseur',
+            index=sib.indexes.PrefixIndex('email', name='fournisseurs_email_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fournisseur',
+            index=sib.indexes.PrefixIndex('telephone', name='fournisseurs_tel_prefix_idx'),
+        ),
+    ]
@@ -1,6 +1,12 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from sib.indexes import PrefixIndex
 from users_app.models import Utilisateur
 from inventory_app.models import ProduitFini
+from warehouse.models import Entrepot
 
 class Fournisseur(models.Model):
     nom_entreprise = models.CharField(max_length=255, verbose_name="Nom de l'Entreprise")
@@ -16,6 +22,13 @@ class Fournisseur(models.Model):
         verbose_name = "Fournisseur"
         verbose_name_plural = "Fournisseurs"
         db_table = 'fournisseurs'
+        # Autocomplete (FournisseurViewSet.autocomplete) matches these by prefix
+        indexes = [
+            PrefixIndex('nom_entreprise', name='fournisseurs_nom_prefix_idx'),
+            PrefixIndex('code_fournisseur', name='fournisseurs_code_prefix_idx'),
+            PrefixIndex('email', name='fournisseurs_email_prefix_idx'),
+            PrefixIndex('telephone', name='fournisseurs_tel_prefix_idx'),
+        ]
 
     def __str__(self):
         return f"{self.code_fournisseur} - {self.nom_entreprise}"
@@ -32,6 +45,12 @@ class Client(models.Model):
         verbose_name = "Client"
         verbose_name_plural = "Clients"
         db_table = 'clients'
+        # Autocomplete (ClientViewSet.autocomplete) matches these by prefix
+        indexes = [
+            PrefixIndex('nom_entreprise', name='clients_nom_prefix_idx'),
+            PrefixIndex('email', name='clients_email_prefix_idx'),
+            PrefixIndex('telephone', name='clients_tel_prefix_idx'),
+        ]
 
     def __str__(self):
         return self.nom_entreprise
@@ -51,6 +70,9 @@ class Commande(models.Model):
     date_livraison = models.DateField(blank=True, null=True, verbose_name="Date de Livraison Prévue")
     cree_par = models.ForeignKey(Utilisateur, on_delete=models.SET_NULL, null=True, related_name='commandes_creees', verbose_name="Créée par")
     cree_le = models.DateTimeField(auto_now_add=True, verbose_name="Créée le")
+    # Denormalized from the lines by sales_app.signals; see recalculer_totaux_commandes
+    total = models.DecimalField(max_digits=18, decimal_places=4, default=0, editable=False, db_index=True, verbose_name="Total")
+    nombre_articles = models.PositiveIntegerField(default=0, editable=False, verbose_name="Nombre d'Articles")
 
     class Meta:
         verbose_name = "Commande"
@@ -60,6 +82,19 @@ class Commande(models.Model):
     def __str__(self):
         return f"Commande #{self.id} - {self.id_client.nom_entreprise}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember which daily sales rollup the order counted in when loaded
+        instance._ventes_origine = instance.ventes_origine()
+        return instance
+
+    def ventes_origine(self):
+        """(date, client id, status), or None when a field is deferred"""
+        if {'date_commande', 'id_client_id', 'statut'} & self.get_deferred_fields():
+            return None
+        return self.date_commande, self.id_client_id, self.statut
+
 class ArticleCommande(models.Model):
     id_commande = models.ForeignKey(Commande, on_delete=models.CASCADE, related_name='articles', verbose_name="Commande")
     id_produit = models.ForeignKey(ProduitFini, on_delete=models.CASCADE, related_name='articles_commandes', verbose_name="Produit Fini")
@@ -74,3 +109,99 @@ class ArticleCommande(models.Model):
 
     def __str__(self):
         return f"{self.quantite} x {self.id_produit.nom} pour Commande #{self.id_commande.id}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this line contributed to its order's total when loaded
+        instance._totaux_origine = instance.totaux_origine()
+        return instance
+
+    @property
+    def montant(self):
+        return (self.quantite or 0) * (self.prix_unitaire or 0)
+
+    def totaux_origine(self):
+        """(order id, amount), or None when a field is deferred"""
+        if {'id_commande_id', 'quantite', 'prix_unitaire'} & self.get_deferred_fields():
+            return None
+        return self.id_commande_id, self.montant
+
+
+class VenteJournaliere(models.Model):
+    """Order lines summed per day, client and product (see sales_app.analytics)"""
+    jour = models.DateField(verbose_name="Jour")
+    id_client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='ventes_journalieres', verbose_name="Client")
+    id_produit = models.ForeignKey(ProduitFini, on_delete=models.CASCADE, related_name='ventes_journalieres', verbose_name="Produit Fini")
+    quantite = models.DecimalField(max_digits=18, decimal_places=2, default=0, verbose_name="Quantité")
+    chiffre_affaires = models.DecimalField(max_digits=18, decimal_places=4, default=0, verbose_name="Chiffre d'Affaires")
+    nombre_lignes = models.PositiveIntegerField(default=0, verbose_name="Nombre de Lignes")
+
+    class Meta:
+        verbose_name = "Vente Journalière"
+        verbose_name_plural = "Ventes Journalières"
+        db_table = 'ventes_journalieres'
+        unique_together = ('jour', 'id_client', 'id_produit')
+        indexes = [
+            models.Index(fields=['id_client', 'jour'], name='ventes_client_jour_idx'),
+            models.Index(fields=['id_produit', 'jour'], name='ventes_produit_jour_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.jour} - Client #{self.id_client_id} - Produit #{self.id_produit_id}: {self.chiffre_affaires}"
+
+
+class Reservation(models.Model):
+    """Stock of a finished product held in one warehouse for one order line (see sales_app.reservations)"""
+    STATUT_CHOICES = [
+        ('active', 'Active'),
+        ('consommee', 'Consommée'),
+        ('liberee', 'Libérée'),
+    ]
+
+    id_article_commande = models.ForeignKey(ArticleCommande, on_delete=models.CASCADE, related_name='reservations', verbose_name="Article de Commande")
+    id_produit = models.ForeignKey(ProduitFini, on_delete=models.CASCADE, related_name='reservations', verbose_name="Produit Fini")
+    entrepot = models.ForeignKey(Entrepot, on_delete=models.PROTECT, related_name='reservations', verbose_name="Entrepôt")
+    quantite = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Quantité")
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='active', verbose_name="Statut")
+    cree_le = models.DateTimeField(auto_now_add=True, verbose_name="Créée le")
+    maj_le = models.DateTimeField(auto_now=True, verbose_name="Mise à jour le")
+
+    class Meta:
+        verbose_name = "Réservation"
+        verbose_name_plural = "Réservations"
+        db_table = 'reservations'
+        unique_together = ('id_article_commande', 'entrepot')
+        indexes = [models.Index(fields=['id_produit', 'entrepot', 'statut'], name='reservations_stock_idx')]
+
+    def __str__(self):
+        return f"{self.quantite} x Produit #{self.id_produit_id} à l'entrepôt #{self.entrepot_id} ({self.get_statut_display()})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this reservation held when loaded
+        instance._stock_origine = instance.stock_reserve()
+        return instance
+
+    def stock_reserve(self):
+        """(product id, warehouse id, quantity held), or None when a field is deferred"""
+        if {'id_produit_id', 'entrepot_id', 'quantite', 'statut'} & self.get_deferred_fields():
+            return None
+        return self.id_produit_id, self.entrepot_id, self.quantite if self.statut == 'active' else Decimal(0)
+
+
+def recalculer_totaux_commandes(commandes=None):
+    """
+    Recompute total and nombre_articles from the lines in one UPDATE.
+    For writes that skip the signals (bulk_create, QuerySet.update, raw SQL).
+    """
+    if commandes is None:
+        commandes = Commande.objects.all()
+    lignes = ArticleCommande.objects.filter(id_commande=OuterRef('pk')).order_by().values('id_commande')
+    montant = DecimalField(max_digits=18, decimal_places=4)
+    total = lignes.annotate(s=Sum(ExpressionWrapper(F('quantite') * F('prix_unitaire'), output_field=montant))).values('s')
+    return commandes.update(
+        total=Coalesce(Subquery(total), Value(Decimal(0)), output_field=montant),
+        nombre_articles=Coalesce(Subquery(lignes.annotate(n=Count('pk')).values('n')), Value(0)),
+    )
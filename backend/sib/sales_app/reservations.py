@@ -0,0 +1,182 @@
+"""
+Stock reservations and availability-to-promise (ATP) for orders.
+
+An active Reservation holds part of a finished product's stock in one
+warehouse for one order line. The signals in sales_app.signals keep
+Stock.quantite_reservee equal to the active reservations with F() updates,
+so the free stock of a warehouse is Stock.quantite - Stock.quantite_reservee.
+Reservations are released when the order is cancelled and consumed when it
+ships.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from inventory_app.models import ProduitFini, Stock
+
+from .models import ArticleCommande, Reservation
+
+STATUTS_LIBERANT = ('annulee',)
+STATUTS_CONSOMMANT = ('expediee', 'livree')
+
+
+def stock_produits(produit_ids, entrepot_ids=None):
+    """Stock rows of these finished products, limited to entrepot_ids unless None"""
+    stocks = Stock.objects.filter(content_type=ContentType.objects.get_for_model(ProduitFini), id_article__in=produit_ids)
+    if entrepot_ids is not None:
+        stocks = stocks.filter(entrepot_id__in=entrepot_ids)
+    return stocks
+
+
+def lignes_avec_reservations(lignes):
+    """Annotate order lines with the quantity their active reservations hold (``reservee``)"""
+    reservee = (
+        Reservation.objects.filter(id_article_commande=OuterRef('pk'), statut='active')
+        .order_by().values('id_article_commande').annotate(total=Sum('quantite')).values('total')
+    )
+    return lignes.annotate(reservee=Coalesce(
+        Subquery(reservee), Value(Decimal(0)), output_field=DecimalField(max_digits=10, decimal_places=2)
+    ))
+
+
+def disponibilite(commande, entrepot_ids=None):
+    """
+    ATP of every line of the order over the given warehouses (all when None):
+    the stock of all the lines is read in one query.
+    """
+    lignes = list(lignes_avec_reservations(commande.articles.select_related('id_produit')).order_by('pk'))
+    par_produit = defaultdict(list)
+    for stock in stock_produits([ligne.id_produit_id for ligne in lignes], entrepot_ids).values(
+        'id_article', 'entrepot', 'entrepot__nom', 'quantite', 'quantite_reservee'
+    ).order_by('entrepot'):
+        par_produit[stock['id_article']].append(stock)
+
+    resultats = []
+    for ligne in lignes:
+        entrepots = [
+            {
+                'entrepot': stock['entrepot'],
+                'entrepot_nom': stock['entrepot__nom'],
+                'quantite': float(stock['quantite']),
+                'reservee': float(stock['quantite_reservee']),
+                'libre': float(max(stock['quantite'] - stock['quantite_reservee'], 0)),
+            }
+            for stock in par_produit[ligne.id_produit_id]
+        ]
+        a_reserver = max(ligne.quantite - ligne.reservee, 0)
+        libre = sum((max(stock['quantite'] - stock['quantite_reservee'], 0) for stock in par_produit[ligne.id_produit_id]), Decimal(0))
+        resultats.append({
+            'id': ligne.pk,
+            'id_produit': ligne.id_produit_id,
+            'produit': ligne.id_produit.nom,
+            'quantite': float(ligne.quantite),
+            'reservee': float(ligne.reservee),
+            'a_reserver': float(a_reserver),
+            'libre': float(libre),
+            'manquant': float(max(a_reserver - libre, 0)),
+            'entrepots': entrepots,
+        })
+    return {
+        'commande': commande.pk,
+        'promettable': all(ligne['manquant'] == 0 for ligne in resultats),
+        'lignes': resultats,
+    }
+
+
+def reserver(lignes, entrepot_ids=None):
+    """
+    Reserve the unreserved quantity of these order lines from the free stock of
+    the given warehouses (all when None), largest free stock first. Partial
+    reservations are kept. Returns {line id: quantity still missing}.
+    """
+    with transaction.atomic():
+        lignes = list(lignes_avec_reservations(
+            ArticleCommande.objects.filter(pk__in=[ligne.pk for ligne in lignes])
+        ).order_by('pk'))
+        # Locked in primary key order so concurrent reservations queue instead of deadlocking
+        stocks = defaultdict(list)
+        for stock in stock_produits({ligne.id_produit_id for ligne in lignes}, entrepot_ids).select_for_update().order_by('pk'):
+            stocks[stock.id_article].append(stock)
+        existantes = {
+            (reservation.id_article_commande_id, reservation.entrepot_id): reservation
+            for reservation in Reservation.objects.select_for_update().filter(id_article_commande__in=lignes)
+        }
+
+        manquants = {}
+        for ligne in lignes:
+            reste = ligne.quantite - ligne.reservee
+            for stock in sorted(stocks[ligne.id_produit_id], key=lambda stock: stock.quantite - stock.quantite_reservee, reverse=True):
+                libre = stock.quantite - stock.quantite_reservee
+                if reste <= 0:
+                    break
+                if libre <= 0:
+                    continue
+                part = min(reste, libre)
+                reservation = existantes.get((ligne.pk, stock.entrepot_id))
+                if reservation is None:
+                    reservation = Reservation(
+                        id_article_commande=ligne, id_produit_id=ligne.id_produit_id, entrepot_id=stock.entrepot_id, quantite=part
+                    )
+                elif reservation.statut == 'active':
+                    reservation.quantite += part
+                else:
+                    reservation.statut, reservation.quantite = 'active', part
+                reservation.save()
+                stock.quantite_reservee += part
+                reste -= part
+            manquants[ligne.pk] = max(reste, 0)
+        return manquants
+
+
+def cloturer(reservations, statut):
+    """Release ('liberee') or consume ('consommee') the active reservations of a queryset"""
+    count = 0
+    with transaction.atomic():
+        for reservation in reservations.filter(statut='active').select_for_update():
+            reservation.statut = statut
+            reservation.save(update_fields=['statut', 'maj_le'])
+            count += 1
+    return count
+
+
+def ajuster_ligne(ligne):
+    """Release what an order line no longer needs after its product or quantity changed"""
+    excedent = -ligne.quantite
+    actives = []
+    for reservation in ligne.reservations.filter(statut='active').order_by('-pk'):
+        if reservation.id_produit_id != ligne.id_produit_id:
+            reservation.statut = 'liberee'
+            reservation.save()
+        else:
+            actives.append(reservation)
+            excedent += reservation.quantite
+    for reservation in actives:  # newest first
+        if excedent <= 0:
+            break
+        if reservation.quantite <= excedent:
+            excedent -= reservation.quantite
+            reservation.statut = 'liberee'
+        else:
+            reservation.quantite -= excedent
+            excedent = 0
+        reservation.save()
+
+
+def recalculer_stock_reserve(stocks=None):
+    """
+    Recompute Stock.quantite_reservee from the active reservations in one UPDATE.
+    For writes that skip the signals (bulk_create, QuerySet.update, raw SQL).
+    """
+    if stocks is None:
+        stocks = Stock.objects.filter(content_type=ContentType.objects.get_for_model(ProduitFini))
+    reservee = (
+        Reservation.objects.filter(id_produit=OuterRef('id_article'), entrepot=OuterRef('entrepot'), statut='active')
+        .order_by().values('id_produit').annotate(total=Sum('quantite')).values('total')
+    )
+    return stocks.update(quantite_reservee=Coalesce(
+        Subquery(reservee), Value(Decimal(0)), output_field=DecimalField(max_digits=10, decimal_places=2)
+    ))
@@ -1,8 +1,8 @@
 from rest_framework import serializers
 from .models import Client, Commande, ArticleCommande, Fournisseur
-from decimal import Decimal
 from users_app.serializers import UtilisateurSerializer # Pour afficher les détails de l'utilisateur créateur
 from inventory_app.serializers import ProduitFiniSerializer # Pour afficher les détails du produit fini
+from sib.fieldsets import SparseFieldsetMixin
 
 class FournisseurSerializer(serializers.ModelSerializer):
     class Meta:
@@ -16,14 +16,17 @@ class ClientSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ('id', 'cree_le')
 
-class ArticleCommandeSerializer(serializers.ModelSerializer):
+class ArticleCommandeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     id_produit_details = ProduitFiniSerializer(source='id_produit', read_only=True) # Détails du produit
     id_commande_details = serializers.SerializerMethodField() # Détails de la commande
+    cout_standard = serializers.FloatField(source='id_produit.cout_standard', read_only=True)  # see production_app.couts
     
     class Meta:
         model = ArticleCommande
-        fields = ('id', 'id_commande', 'id_commande_details', 'id_produit', 'id_produit_details', 'quantite', 'prix_unitaire')
-        read_only_fields = ('id', 'id_commande_details', 'id_produit_details')
+        fields = ('id', 'id_commande', 'id_commande_details', 'id_produit', 'id_produit_details', 'quantite', 'prix_unitaire', 'cout_standard')
+        read_only_fields = ('id', 'id_commande_details', 'id_produit_details', 'cout_standard')
+        expandable_fields = ('id_commande_details', 'id_produit_details')
+        related_lookups = {'id_commande_details': ('id_commande__id_client',)}
 
     def get_id_commande_details(self, obj):
         if obj.id_commande:
@@ -34,28 +37,24 @@ class ArticleCommandeSerializer(serializers.ModelSerializer):
             }
         return None
 
-class CommandeSerializer(serializers.ModelSerializer):
+class CommandeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     articles = ArticleCommandeSerializer(many=True, read_only=True) # Affiche les articles de la commande
     cree_par_details = UtilisateurSerializer(source='cree_par', read_only=True) # Détails de l'utilisateur créateur
     id_client_details = ClientSerializer(source='id_client', read_only=True) # Détails du client
     # Computed fields for frontend convenience
-    total = serializers.SerializerMethodField()
+    total = serializers.FloatField(read_only=True)  # stored on the order, see sales_app.signals
     reference = serializers.SerializerMethodField()
     client = serializers.SerializerMethodField()
 
     class Meta:
         model = Commande
         fields = (
-            'id', 'id_client', 'id_client_details', 'client', 'reference', 'total',
+            'id', 'id_client', 'id_client_details', 'client', 'reference', 'total', 'nombre_articles',
             'statut', 'date_commande', 'date_livraison', 'cree_par', 'cree_par_details', 'cree_le', 'articles'
         )
-        read_only_fields = ('id', 'cree_le', 'cree_par_details', 'id_client_details', 'client', 'reference', 'total', 'articles')
-
-    def get_total(self, obj: Commande):
-        total = Decimal('0')
-        for art in obj.articles.all():
-            total += (art.quantite * art.prix_unitaire)
-        return float(total)
+        read_only_fields = ('id', 'cree_le', 'cree_par_details', 'id_client_details', 'client', 'reference', 'total', 'nombre_articles', 'articles')
+        expandable_fields = ('articles', 'cree_par_details', 'id_client_details')
+        related_lookups = {'client': ('id_client',)}
 
     def get_reference(self, obj: Commande):
         return f"CMD-{obj.id}"
@@ -0,0 +1,138 @@
+"""
+Keep Commande.total, Commande.nombre_articles, the daily sales rollups
+(sales_app.analytics) and the reserved stock (sales_app.reservations) in step
+with the orders, their lines and their reservations; drop the cached
+client and supplier autocomplete results when those change
+"""
+
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from sib.autocomplete import invalider_autocomplete
+
+from . import reservations
+from .analytics import cles_ventes, recalculer_ventes
+from .models import ArticleCommande, Client, Commande, Fournisseur, Reservation, recalculer_totaux_commandes
+
+
+def est_suppression_de_commande(origin):
+    return isinstance(origin, Commande) or (isinstance(origin, QuerySet) and origin.model is Commande)
+
+
+def ajuster_totaux(commande_id, montant, lignes):
+    """Apply a delta with F() so concurrent line changes don't overwrite each other"""
+    if commande_id is None or (not montant and not lignes):
+        return
+    Commande.objects.filter(pk=commande_id).update(
+        total=F('total') + montant, nombre_articles=F('nombre_articles') + lignes
+    )
+
+
+@receiver(pre_save, sender=ArticleCommande)
+def article_commande_origine_inconnue(sender, instance, raw=False, **kwargs):
+    """
+    A line built with a primary key instead of loaded, or loaded with deferred
+    fields, has no snapshot: read what the row held, so that the order it
+    leaves is counted down too. Loaded lines carry theirs from from_db.
+    """
+    if raw or instance.pk is None or getattr(instance, '_totaux_origine', None) is not None:
+        return
+    ancienne = ArticleCommande.objects.filter(pk=instance.pk).values_list('id_commande', 'quantite', 'prix_unitaire').first()
+    instance._totaux_origine = (ancienne[0], ancienne[1] * ancienne[2]) if ancienne else None
+
+
+@receiver(post_save, sender=ArticleCommande)
+def article_commande_enregistre(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return  # loaddata: the fixture carries the totals
+    origine = None if created else getattr(instance, '_totaux_origine', None)
+    if update_fields is not None and not {'id_commande', 'quantite', 'prix_unitaire'} & set(update_fields):
+        return
+    if created:
+        ajuster_totaux(instance.id_commande_id, instance.montant, 1)
+    elif origine is None or update_fields is not None:
+        # Previous amount unknown, or only part of the line written: recount from the database
+        commandes = {instance.id_commande_id, origine[0] if origine else None} - {None}
+        recalculer_totaux_commandes(Commande.objects.filter(pk__in=commandes))
+    else:
+        commande_id, montant = origine
+        if commande_id == instance.id_commande_id:
+            ajuster_totaux(commande_id, instance.montant - montant, 0)
+        else:
+            ajuster_totaux(commande_id, -montant, -1)
+            ajuster_totaux(instance.id_commande_id, instance.montant, 1)
+    recalculer_ventes(cles_ventes({instance.id_commande_id, origine[0] if origine else None}))
+    if not created:
+        reservations.ajuster_ligne(instance)
+    instance._totaux_origine = instance.totaux_origine()
+
+
+@receiver(post_delete, sender=ArticleCommande)
+def article_commande_supprime(sender, instance, origin=None, **kwargs):
+    if est_suppression_de_commande(origin):
+        return  # the order itself is being deleted, see commande_supprimee
+    origine = getattr(instance, '_totaux_origine', None) or instance.totaux_origine()
+    if origine is None:
+        recalculer_totaux_commandes(Commande.objects.filter(pk=instance.id_commande_id))
+    else:
+        ajuster_totaux(origine[0], -origine[1], -1)
+    recalculer_ventes(cles_ventes({instance.id_commande_id}))
+
+
+@receiver(post_save, sender=Commande)
+def commande_enregistree(sender, instance, created, raw=False, **kwargs):
+    origine = getattr(instance, '_ventes_origine', None)
+    if not raw and not created and origine != instance.ventes_origine():
+        # Date, client or status changed: the lines move to another rollup slice
+        cles = {(instance.date_commande, instance.id_client_id)}
+        if origine is not None:
+            cles.add(origine[:2])
+        recalculer_ventes(cles)
+    if not raw and not created and (origine is None or origine[2] != instance.statut):
+        if instance.statut in reservations.STATUTS_LIBERANT:
+            reservations.cloturer(Reservation.objects.filter(id_article_commande__id_commande=instance), 'liberee')
+        elif instance.statut in reservations.STATUTS_CONSOMMANT:
+            reservations.cloturer(Reservation.objects.filter(id_article_commande__id_commande=instance), 'consommee')
+    instance._ventes_origine = instance.ventes_origine()
+
+
+@receiver(post_delete, sender=Commande)
+def commande_supprimee(sender, instance, **kwargs):
+    # The lines are already gone: this empties the order's slice of its amounts
+    recalculer_ventes({(instance.date_commande, instance.id_client_id)})
+
+
+def ajuster_stock_reserve(stock, signe):
+    """Add (signe=1) or remove (signe=-1) a (product, warehouse, quantity) hold on Stock.quantite_reservee"""
+    produit_id, entrepot_id, quantite = stock
+    if quantite:
+        reservations.stock_produits([produit_id], [entrepot_id]).update(
+            quantite_reservee=F('quantite_reservee') + signe * quantite
+        )
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_enregistree(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    origine = None if created else getattr(instance, '_stock_origine', None)
+    if not created and origine is None:
+        # Previous hold unknown: recount this stock line from the ledger
+        reservations.recalculer_stock_reserve(reservations.stock_produits([instance.id_produit_id], [instance.entrepot_id]))
+    elif origine != instance.stock_reserve():
+        if origine is not None:
+            ajuster_stock_reserve(origine, -1)
+        ajuster_stock_reserve(instance.stock_reserve(), 1)
+    instance._stock_origine = instance.stock_reserve()
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_supprimee(sender, instance, **kwargs):
+    ajuster_stock_reserve(getattr(instance, '_stock_origine', None) or instance.stock_reserve(), -1)
+
+
+@receiver([post_save, post_delete], sender=Client)
+@receiver([post_save, post_delete], sender=Fournisseur)
+def annuaire_modifie(sender, **kwargs):
+    invalider_autocomplete(sender)
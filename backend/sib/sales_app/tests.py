@@ -0,0 +1,379 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from inventory_app.models import ProduitFini
+
+from .analytics import reconstruire_ventes
+from .models import ArticleCommande, Client, Commande, Reservation, VenteJournaliere, recalculer_totaux_commandes
+
+
+def rollups():
+    return sorted(VenteJournaliere.objects.values_list(
+        'jour', 'id_client', 'id_produit', 'quantite', 'chiffre_affaires', 'nombre_lignes'
+    ))
+
+
+class SalesRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clients = [Client.objects.create(nom_entreprise=f'Client {i}') for i in range(2)]
+        cls.produits = [
+            ProduitFini.objects.create(nom=f'Produit {i}', code_reference=f'PF{i}', unite='u') for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def commande(self, client, jour, *lignes):
+        commande = Commande.objects.create(id_client=client, date_commande=jour)
+        for produit, quantite, prix in lignes:
+            ArticleCommande.objects.create(
+                id_commande=commande, id_produit=produit, quantite=Decimal(quantite), prix_unitaire=Decimal(prix)
+            )
+        return commande
+
+    def assertRollupsMatchRebuild(self):
+        maintained = rollups()
+        reconstruire_ventes()
+        self.assertEqual(maintained, rollups())
+
+    def test_rollups_follow_order_and_line_changes(self):
+        premier, second = self.clients
+        a, b, c = self.produits
+        commande = self.commande(premier, date(2024, 1, 10), (a, 2, '10.00'), (b, 1, '5.50'))
+        autre = self.commande(premier, date(2024, 1, 10), (a, 1, '10.00'))
+        self.commande(second, date(2024, 2, 1), (c, 3, '1.00'))
+        self.assertEqual(
+            VenteJournaliere.objects.get(jour=date(2024, 1, 10), id_client=premier, id_produit=a).chiffre_affaires, 30
+        )
+        self.assertRollupsMatchRebuild()
+
+        ligne = ArticleCommande.objects.get(id_commande=commande, id_produit=b)
+        ligne.quantite = Decimal(4)
+        ligne.save()
+        self.assertRollupsMatchRebuild()
+
+        ligne = ArticleCommande.objects.get(pk=ligne.pk)
+        ligne.id_commande = autre
+        ligne.save()
+        self.assertRollupsMatchRebuild()
+
+        commande = Commande.objects.get(pk=commande.pk)
+        commande.id_client = second
+        commande.date_commande = date(2024, 3, 1)
+        commande.save()
+        self.assertRollupsMatchRebuild()
+
+        autre = Commande.objects.get(pk=autre.pk)
+        autre.statut = 'annulee'
+        autre.save()
+        self.assertFalse(VenteJournaliere.objects.filter(jour=date(2024, 1, 10)).exists())
+        self.assertRollupsMatchRebuild()
+
+        ArticleCommande.objects.filter(id_commande=commande).delete()
+        Commande.objects.filter(id_client=second).delete()
+        self.assertEqual(rollups(), [])
+
+    def test_analytics_endpoints_are_cached_until_rollups_change(self):
+        Group.objects.get_or_create(name='Administrateurs')
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        api = APIClient()
+        api.force_authenticate(admin)
+        premier, second = self.clients
+        a, b, _ = self.produits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.commande(premier, date(2024, 1, 10), (a, 2, '10.00'))
+            self.commande(second, date(2024, 2, 10), (b, 1, '50.00'))
+
+        response = api.get('/api/v1/sales/analytics/clients/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['id_client'], row['chiffre_affaires']) for row in response.data['results']],
+            [(second.pk, 50.0), (premier.pk, 20.0)],
+        )
+        with self.assertNumQueries(0):
+            api.get('/api/v1/sales/analytics/clients/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.commande(premier, date(2024, 2, 11), (b, 10, '10.00'))
+        response = api.get('/api/v1/sales/analytics/mois/', {'client': premier.pk})
+        self.assertEqual([row['chiffre_affaires'] for row in response.data['results']], [20.0, 100.0])
+        response = api.get('/api/v1/sales/analytics/produits/', {'debut': '2024-02-01', 'limite': 1})
+        self.assertEqual([(row['id_produit'], row['quantite']) for row in response.data['results']], [(b.pk, 11.0)])
+        self.assertEqual(api.get('/api/v1/sales/analytics/mois/', {'fin': '2024-02-30'}).status_code, 400)
+        for limite in ('-1', '0', 'x'):
+            self.assertEqual(api.get('/api/v1/sales/analytics/produits/', {'limite': limite}).status_code, 400)
+
+
+class OrderTotalsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_commande = Client.objects.create(nom_entreprise='Client')
+        cls.produits = [
+            ProduitFini.objects.create(nom=f'Produit {i}', code_reference=f'PF{i}', unite='u') for i in range(2)
+        ]
+
+    def commande(self):
+        return Commande.objects.create(id_client=self.client_commande, date_commande=date(2024, 1, 10))
+
+    def ligne(self, commande, quantite, prix, produit=0):
+        return ArticleCommande.objects.create(
+            id_commande=commande, id_produit=self.produits[produit], quantite=Decimal(quantite), prix_unitaire=Decimal(prix)
+        )
+
+    def assertTotalsMatchLines(self):
+        montant = ExpressionWrapper(F('quantite') * F('prix_unitaire'), output_field=DecimalField(max_digits=18, decimal_places=4))
+        attendus = {
+            row['id_commande']: (row['total'], row['nombre'])
+            for row in ArticleCommande.objects.values('id_commande').annotate(total=Sum(montant), nombre=Count('pk'))
+        }
+        for pk, total, nombre_articles in Commande.objects.values_list('pk', 'total', 'nombre_articles'):
+            self.assertEqual((total, nombre_articles), attendus.get(pk, (0, 0)), f"Commande #{pk}")
+
+    def test_totals_follow_line_changes(self):
+        commande, autre = self.commande(), self.commande()
+        ligne = self.ligne(commande, 2, '10.00')
+        self.ligne(commande, 1, '5.50', produit=1)
+        self.ligne(autre, 3, '1.25', produit=1)
+        self.assertEqual(Commande.objects.get(pk=commande.pk).total, Decimal('25.50'))
+        self.assertTotalsMatchLines()
+
+        ligne.quantite = Decimal(4)
+        ligne.save()
+        self.assertTotalsMatchLines()
+
+        ligne = ArticleCommande.objects.get(pk=ligne.pk)
+        ligne.prix_unitaire = Decimal('12.00')
+        ligne.save(update_fields=['prix_unitaire'])
+        self.assertTotalsMatchLines()
+
+        ligne = ArticleCommande.objects.get(pk=ligne.pk)
+        ligne.id_commande = autre
+        ligne.save()
+        self.assertEqual(Commande.objects.get(pk=autre.pk).nombre_articles, 2)
+        self.assertTotalsMatchLines()
+
+        # Built without loading: the previous amount is unknown
+        ArticleCommande(
+            pk=ligne.pk, id_commande=commande, id_produit=self.produits[0], quantite=Decimal(1), prix_unitaire=Decimal('3.00')
+        ).save()
+        self.assertTotalsMatchLines()
+
+        ArticleCommande.objects.get(pk=ligne.pk).delete()
+        self.assertTotalsMatchLines()
+        ArticleCommande.objects.filter(id_commande=autre).delete()
+        self.assertEqual(Commande.objects.filter(pk=autre.pk).values_list('total', 'nombre_articles').get(), (0, 0))
+        self.assertTotalsMatchLines()
+
+        commande.delete()
+        self.assertFalse(ArticleCommande.objects.exists())
+
+    def test_recalculer_totaux_commandes_after_bulk_writes(self):
+        commande, autre = self.commande(), self.commande()
+        ArticleCommande.objects.bulk_create([
+            ArticleCommande(id_commande=commande, id_produit=self.produits[0], quantite=Decimal(2), prix_unitaire=Decimal('7.00')),
+            ArticleCommande(id_commande=autre, id_produit=self.produits[1], quantite=Decimal(1), prix_unitaire=Decimal('4.00')),
+        ])
+        self.assertEqual(recalculer_totaux_commandes(Commande.objects.filter(pk=commande.pk)), 1)
+        self.assertEqual(Commande.objects.get(pk=commande.pk).total, Decimal('14.00'))
+        self.assertEqual(Commande.objects.get(pk=autre.pk).total, 0)
+
+        ArticleCommande.objects.filter(id_commande=commande).update(quantite=Decimal(3))
+        recalculer_totaux_commandes()
+        self.assertTotalsMatchLines()
+
+
+class ReservationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.contenttypes.models import ContentType
+        from inventory_app.models import Stock
+        from warehouse.models import Entrepot
+
+        Group.objects.get_or_create(name='Administrateurs')
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        cls.admin.utilisateur.acces_tous_entrepots = True
+        cls.admin.utilisateur.save()
+        cls.client_ = Client.objects.create(nom_entreprise='Client')
+        cls.produits = [
+            ProduitFini.objects.create(nom=f'Produit {i}', code_reference=f'PF{i}', unite='u') for i in range(2)
+        ]
+        cls.entrepots = [Entrepot.objects.create(nom=f'Entrepôt {i}') for i in range(2)]
+        content_type = ContentType.objects.get_for_model(ProduitFini)
+        # Produit 0: 5 + 3 in stock, produit 1: 2
+        for produit, entrepot, quantite in ((0, 0, 5), (0, 1, 3), (1, 0, 2)):
+            Stock.objects.create(
+                type_article='fini', content_type=content_type, id_article=cls.produits[produit].pk,
+                entrepot=cls.entrepots[entrepot], quantite=Decimal(quantite),
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def stock_reserve(self):
+        from inventory_app.models import Stock
+        return sorted(Stock.objects.values_list('id_article', 'entrepot', 'quantite_reservee'))
+
+    def assertStockMatchesLedger(self):
+        from .reservations import recalculer_stock_reserve
+        maintained = self.stock_reserve()
+        recalculer_stock_reserve()
+        self.assertEqual(maintained, self.stock_reserve())
+
+    def test_lines_created_through_the_api_reserve_stock(self):
+        commande = Commande.objects.create(id_client=self.client_, date_commande=date(2024, 1, 1))
+        for produit, quantite in ((0, 7), (1, 4)):
+            response = self.api.post('/api/v1/articles-commande/', {
+                'id_commande': commande.pk, 'id_produit': self.produits[produit].pk,
+                'quantite': quantite, 'prix_unitaire': '1.00',
+            })
+            self.assertEqual(response.status_code, 201, response.data)
+        self.assertStockMatchesLedger()
+
+        response = self.api.get(f'/api/v1/commandes/{commande.pk}/disponibilite/')
+        self.assertFalse(response.data['promettable'])
+        lignes = {ligne['id_produit']: ligne for ligne in response.data['lignes']}
+        self.assertEqual(lignes[self.produits[0].pk]['reservee'], 7.0)
+        self.assertEqual(lignes[self.produits[0].pk]['libre'], 1.0)
+        self.assertEqual((lignes[self.produits[1].pk]['reservee'], lignes[self.produits[1].pk]['manquant']), (2.0, 2.0))
+
+        ligne = ArticleCommande.objects.get(id_commande=commande, id_produit=self.produits[0])
+        ligne.quantite = Decimal(4)
+        ligne.save()
+        self.assertEqual(Reservation.objects.filter(id_article_commande=ligne, statut='active').aggregate(
+            total=Sum('quantite'))['total'], 4)
+        self.assertStockMatchesLedger()
+
+        commande = Commande.objects.get(pk=commande.pk)
+        commande.statut = 'annulee'
+        commande.save()
+        self.assertFalse(Reservation.objects.filter(statut='active').exists())
+        self.assertEqual({reserve for _, _, reserve in self.stock_reserve()}, {0})
+
+    def test_reserver_and_liberer_actions(self):
+        commande = Commande.objects.create(id_client=self.client_, date_commande=date(2024, 1, 1))
+        ArticleCommande.objects.create(id_commande=commande, id_produit=self.produits[0], quantite=6, prix_unitaire=1)
+        response = self.api.post(f'/api/v1/commandes/{commande.pk}/reserver/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['promettable'])
+        self.assertEqual(Reservation.objects.filter(statut='active').count(), 2)  # 5 + 1 over two warehouses
+        self.assertStockMatchesLedger()
+
+        autre = Commande.objects.create(id_client=self.client_, date_commande=date(2024, 1, 1))
+        ArticleCommande.objects.create(id_commande=autre, id_produit=self.produits[0], quantite=3, prix_unitaire=1)
+        response = self.api.post(f'/api/v1/commandes/{autre.pk}/reserver/')
+        self.assertEqual(response.data['lignes'][0]['manquant'], 1.0)
+
+        response = self.api.post(f'/api/v1/commandes/{commande.pk}/liberer/')
+        self.assertEqual(response.data['liberees'], 2)
+        response = self.api.post(f'/api/v1/commandes/{autre.pk}/reserver/')
+        self.assertTrue(response.data['promettable'])
+        ArticleCommande.objects.filter(id_commande=autre).delete()
+        self.assertEqual({reserve for _, _, reserve in self.stock_reserve()}, {0})
+
+    def test_reservations_only_use_writable_warehouses(self):
+        from users_app.models import UtilisateurEntrepot
+
+        commercial = User.objects.create_user('commercial', password='x')
+        commercial.groups.add(Group.objects.get_or_create(name='Commerciaux')[0])
+        UtilisateurEntrepot.objects.create(utilisateur=commercial.utilisateur, entrepot=self.entrepots[0], peut_modifier=True)
+        UtilisateurEntrepot.objects.create(utilisateur=commercial.utilisateur, entrepot=self.entrepots[1], peut_modifier=False)
+        self.api.force_authenticate(commercial)
+
+        commande = Commande.objects.create(id_client=self.client_, date_commande=date(2024, 1, 1))
+        ArticleCommande.objects.create(id_commande=commande, id_produit=self.produits[0], quantite=6, prix_unitaire=1)
+        response = self.api.post(f'/api/v1/commandes/{commande.pk}/reserver/')
+        self.assertEqual(response.status_code, 200)
+        # the read-only warehouse still counts as available, but holds no reservation
+        self.assertEqual((response.data['lignes'][0]['reservee'], response.data['lignes'][0]['libre']), (5.0, 3.0))
+        self.assertEqual(
+            list(Reservation.objects.filter(statut='active').values_list('entrepot', 'quantite')), [(self.entrepots[0].pk, 5)]
+        )
+
+        response = self.api.post('/api/v1/articles-commande/', {
+            'id_commande': commande.pk, 'id_produit': self.produits[1].pk, 'quantite': 1, 'prix_unitaire': '1.00',
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(set(Reservation.objects.values_list('entrepot', flat=True)), {self.entrepots[0].pk})
+        self.assertStockMatchesLedger()
+
+
+class OrderImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Group.objects.get_or_create(name='Administrateurs')
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        cls.client_ = Client.objects.create(nom_entreprise='Acme')
+        for code in ('PF-1', 'PF-2'):
+            ProduitFini.objects.create(nom=code, code_reference=code, unite='u')
+
+    def test_import_skips_invalid_orders_and_reports_rows(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from logs_app.models import HistoriqueActivite
+
+        contenu = '\n'.join([
+            'reference;client;date_commande;produit;quantite;prix_unitaire',
+            'A;acme;2024-03-01;PF-1;2;12,50',
+            'A;acme;2024-03-01;PF-2;1;5',
+            f'B;{self.client_.pk};2024-03-02;PF-1;1;1',
+            f'B;{self.client_.pk};2024-03-02;PF-9;1;1',
+            'C;Inconnu;2024-03-02;PF-1;1;1',
+            f'D;{self.client_.pk};2024-03-02;PF-2;4;2',
+        ])
+        api = APIClient()
+        api.force_authenticate(self.admin)
+        response = api.post('/api/v1/commandes/importer/', {
+            'fichier': SimpleUploadedFile('commandes.csv', contenu.encode('utf-8-sig')),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.data['commandes'], response.data['lignes'], response.data['commandes_rejetees']), (2, 3, 2)
+        )
+        self.assertEqual([(erreur['ligne'], list(erreur['erreurs'])) for erreur in response.data['erreurs']], [
+            (4, ['commande']), (5, ['produit']), (6, ['client']),
+        ])
+        self.assertEqual(
+            sorted(Commande.objects.values_list('nombre_articles', 'total', 'cree_par')),
+            [(1, 8, self.admin.utilisateur.pk), (2, 30, self.admin.utilisateur.pk)],
+        )
+        self.assertEqual(VenteJournaliere.objects.filter(jour=date(2024, 3, 1)).count(), 2)
+        self.assertEqual(HistoriqueActivite.objects.filter(action='Import de Commande').count(), 2)
+
+
+class AutocompleteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Group.objects.get_or_create(name='Administrateurs')
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        Client.objects.create(nom_entreprise='Acme', email='achats@acme.fr')
+        Client.objects.create(nom_entreprise='Beta', telephone='0612345678')
+        Client.objects.create(nom_entreprise='Zeta', email='acier@zeta.fr')
+
+    def test_prefix_matches_are_cached_until_a_client_changes(self):
+        api = APIClient()
+        api.force_authenticate(self.admin)
+        url = '/api/v1/clients/autocomplete/'
+        response = api.get(url, {'q': 'ac'})
+        self.assertEqual([row['nom_entreprise'] for row in response.data['results']], ['Acme', 'Zeta'])
+        self.assertEqual(api.get(url, {'q': '0612'}).data['results'][0]['nom_entreprise'], 'Beta')
+        self.assertEqual(api.get(url, {'q': 'a'}).data['results'], [])
+        with self.assertNumQueries(0):
+            api.get(url, {'q': 'AC'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Client.objects.create(nom_entreprise='Acier Plus')
+        response = api.get(url, {'q': 'ac', 'limite': 2})
+        self.assertEqual([row['nom_entreprise'] for row in response.data['results']], ['Acier Plus', 'Acme'])
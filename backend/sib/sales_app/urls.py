@@ -1,5 +1,6 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import ClientViewSet, CommandeViewSet, ArticleCommandeViewSet, FournisseurViewSet
+from .views import ClientViewSet, CommandeViewSet, ArticleCommandeViewSet, FournisseurViewSet, VentesAnalyticsView
 
 router = DefaultRouter()
 router.register(r'clients', ClientViewSet)
@@ -7,4 +8,8 @@ router.register(r'fournisseurs', FournisseurViewSet)
 router.register(r'commandes', CommandeViewSet)
 router.register(r'articles-commande', ArticleCommandeViewSet)
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path('analytics/clients/', VentesAnalyticsView.as_view(dimension='clients'), name='ventes-par-client'),
+    path('analytics/produits/', VentesAnalyticsView.as_view(dimension='produits'), name='ventes-par-produit'),
+    path('analytics/mois/', VentesAnalyticsView.as_view(dimension='mois'), name='ventes-par-mois'),
+]
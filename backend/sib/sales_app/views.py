@@ -1,43 +1,141 @@
-from rest_framework import viewsets
-from .models import Client, Commande, ArticleCommande, Fournisseur
+import io
+from decimal import Decimal, InvalidOperation
+
+from django.utils.dateparse import parse_date
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .models import Client, Commande, ArticleCommande, Fournisseur, Reservation
+from . import analytics, imports, reservations
 from .serializers import ClientSerializer, CommandeSerializer, ArticleCommandeSerializer, FournisseurSerializer
-from users_app.permissions import IsCommercialOrAdmin, IsAdminOrReadOnly, CanManageOrders, CanViewOrders, CanManageClients
+from users_app.permissions import IsCommercialOrAdmin, IsAdminOrReadOnly, CanManageOrders, CanViewOrders, CanManageClients, get_permission_context, get_user_accessible_warehouse_ids
 from rest_framework.permissions import IsAuthenticated
 from logs_app.mixins import LoggingMixin
+from logs_app.utils import log_activity
+from sib.autocomplete import AutocompleteMixin
+from sib.fieldsets import SparseQuerysetMixin
 
-class FournisseurViewSet(LoggingMixin, viewsets.ModelViewSet):
+class FournisseurViewSet(AutocompleteMixin, LoggingMixin, viewsets.ModelViewSet):
     queryset = Fournisseur.objects.filter(est_actif=True)
     serializer_class = FournisseurSerializer
     permission_classes = [IsCommercialOrAdmin]  # Commerciaux et admins peuvent gérer
+    autocomplete_fields = ('nom_entreprise', 'code_fournisseur', 'email', 'telephone')
+    autocomplete_values = ('id', 'code_fournisseur', 'nom_entreprise', 'email', 'telephone')
+    autocomplete_ordering = ('nom_entreprise', 'id')
 
     def perform_destroy(self, instance):
         # Soft delete - mark as inactive instead of deleting
         instance.est_actif = False
         instance.save()
 
-class ClientViewSet(LoggingMixin, viewsets.ModelViewSet):
+class ClientViewSet(AutocompleteMixin, LoggingMixin, viewsets.ModelViewSet):
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
     permission_classes = [CanManageClients]  # Commerciaux et admins peuvent gérer les clients
+    autocomplete_fields = ('nom_entreprise', 'email', 'telephone')
+    autocomplete_values = ('id', 'nom_entreprise', 'personne_contact', 'email', 'telephone')
+    autocomplete_ordering = ('nom_entreprise', 'id')
 
     def perform_create(self, serializer):
         serializer.save()
 
-class CommandeViewSet(LoggingMixin, viewsets.ModelViewSet):
-    queryset = Commande.objects.all().select_related('id_client', 'cree_par')
+class CommandeViewSet(SparseQuerysetMixin, LoggingMixin, viewsets.ModelViewSet):
+    queryset = Commande.objects.all()  # related rows: see SparseQuerysetMixin
     serializer_class = CommandeSerializer
     permission_classes = [CanManageOrders]  # Commerciaux et admins peuvent gérer les commandes
+    # total and nombre_articles are stored on the order: sorting and filtering on them need no join
+    filter_backends = [OrderingFilter]
+    ordering_fields = ['total', 'nombre_articles', 'date_commande', 'cree_le', 'id']
+    ordering = ['id']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        for param, lookup in (('total_min', 'total__gte'), ('total_max', 'total__lte')):
+            value = self.request.query_params.get(param)
+            if value:
+                try:
+                    value = Decimal(value)
+                except InvalidOperation:
+                    value = None
+                if value is None or not value.is_finite():
+                    raise ValidationError({param: "doit être un nombre"})
+                queryset = queryset.filter(**{lookup: value})
+        return queryset
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             return [CanViewOrders()]  # Magasiniers et Production peuvent voir les commandes
+        if self.action == 'disponibilite':
+            return [(CanManageOrders | CanViewOrders)()]
         return [CanManageOrders()]  # Commerciaux et admins peuvent gérer
 
     def perform_create(self, serializer):
         serializer.save(cree_par=self.request.user.utilisateur)
 
-class ArticleCommandeViewSet(LoggingMixin, viewsets.ModelViewSet):
-    queryset = ArticleCommande.objects.all().select_related('id_commande', 'id_produit')
+    @action(detail=True, methods=['get'])
+    def disponibilite(self, request, pk=None):
+        """Availability-to-promise of every line over the user's warehouses"""
+        commande = self.get_object()
+        return Response(reservations.disponibilite(commande, get_user_accessible_warehouse_ids(request.user)))
+
+    @action(detail=True, methods=['post'])
+    def reserver(self, request, pk=None):
+        """
+        Reserve the free stock of the warehouses the user may write to for the
+        unreserved quantity of every line; the availability returned covers
+        every warehouse the user can read
+        """
+        commande = self.get_object()
+        if commande.statut in reservations.STATUTS_LIBERANT + reservations.STATUTS_CONSOMMANT:
+            raise ValidationError({"statut": f"Impossible de réserver pour une commande {commande.get_statut_display().lower()}"})
+        manquants = reservations.reserver(
+            commande.articles.all(), get_permission_context(request.user).warehouse_ids_with('write')
+        )
+        log_activity(
+            user=request.user,
+            action="Réservation de stock",
+            entity=commande,
+            details=f"Lignes incomplètes: {sum(1 for reste in manquants.values() if reste)} / {len(manquants)}"
+        )
+        return Response(reservations.disponibilite(commande, get_user_accessible_warehouse_ids(request.user)))
+
+    @action(detail=True, methods=['post'])
+    def liberer(self, request, pk=None):
+        """Release the active reservations of the order"""
+        commande = self.get_object()
+        count = reservations.cloturer(Reservation.objects.filter(id_article_commande__id_commande=commande), 'liberee')
+        log_activity(
+            user=request.user,
+            action="Libération de stock",
+            entity=commande,
+            details=f"{count} réservation(s) libérée(s)"
+        )
+        return Response({"liberees": count})
+
+    @action(detail=False, methods=['post'])
+    def importer(self, request):
+        """
+        Bulk import of a CSV file of order lines (multipart field ``fichier``),
+        see sales_app.imports. ?dry_run=1 only validates.
+        """
+        fichier = request.FILES.get('fichier')
+        if fichier is None:
+            return Response({"error": "Fichier CSV requis (champ fichier)"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            rapport = imports.importer_commandes(
+                io.TextIOWrapper(fichier, encoding='utf-8-sig', newline=''),
+                utilisateur=request.user.utilisateur,
+                dry_run=request.query_params.get('dry_run') in ('1', 'true'),
+            )
+        except imports.ImportCommandesError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(rapport)
+
+class ArticleCommandeViewSet(SparseQuerysetMixin, LoggingMixin, viewsets.ModelViewSet):
+    queryset = ArticleCommande.objects.all()
     serializer_class = ArticleCommandeSerializer
     permission_classes = [CanManageOrders]  # Commerciaux et admins peuvent gérer les articles de commande
 
@@ -45,3 +143,40 @@ class ArticleCommandeViewSet(LoggingMixin, viewsets.ModelViewSet):
         if self.action in ['list', 'retrieve']:
             return [CanViewOrders()]  # Magasiniers et Production peuvent voir les articles de commande
         return [CanManageOrders()]  # Commerciaux et admins peuvent gérer
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        # New lines hold what the warehouses the user may write to can supply; the rest shows up in disponibilite
+        if serializer.instance.id_commande.statut not in reservations.STATUTS_LIBERANT + reservations.STATUTS_CONSOMMANT:
+            reservations.reserver([serializer.instance], get_permission_context(self.request.user).warehouse_ids_with('write'))
+
+
+class VentesAnalyticsView(APIView):
+    """
+    Revenue from the daily rollups, grouped by ``dimension`` (clients, produits or mois).
+    Optional filters: ?debut=YYYY-MM-DD&fin=YYYY-MM-DD&client=<id>&produit=<id>&limite=<n>
+    """
+    permission_classes = [IsCommercialOrAdmin]
+    dimension = None
+
+    def get(self, request):
+        params = {}
+        for name in ('debut', 'fin'):
+            value = request.query_params.get(name)
+            if value:
+                try:
+                    params[name] = parse_date(value)
+                except ValueError:
+                    params[name] = None
+                if params[name] is None:
+                    raise ValidationError({name: "doit être une date AAAA-MM-JJ"})
+        for name in ('client', 'produit', 'limite'):
+            value = request.query_params.get(name)
+            if value:
+                try:
+                    params[name] = int(value)
+                except ValueError:
+                    raise ValidationError({name: "doit être un entier"})
+        if params.get('limite') is not None and params['limite'] < 1:
+            raise ValidationError({'limite': "doit être un entier positif"})
+        return Response(analytics.ventes(self.dimension, **params))
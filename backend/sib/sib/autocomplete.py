@@ -0,0 +1,124 @@
+"""
+Prefix autocomplete for list endpoints (``GET <list>/autocomplete/?q=ac``).
+
+Matches are case-insensitive prefixes of the viewset's ``autocomplete_fields``
+(each covered by a sib.indexes.PrefixIndex) and are kept in an in-process
+LRU cache of recent prefixes, shared by all users: the viewset queryset must
+not depend on the user. The cache of a model is cleared when one of
+its rows is saved or deleted in this process (see invalider_autocomplete);
+entries also expire after AUTOCOMPLETE_CACHE_TIMEOUT seconds so that other
+processes pick up the change.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+LONGUEUR_MIN = 2
+LIMITE_DEFAUT = 10
+LIMITE_MAX = 50
+
+
+class PrefixCache:
+    """Thread-safe LRU of autocomplete results, one generation per model"""
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, label, key):
+        with self._lock:
+            entry = self._entries.get((label, key))
+            if entry is None or entry[0] != self._generations.get(label, 0) or entry[1] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end((label, key))
+            self.hits += 1
+            return entry[2]
+
+    def set(self, label, key, value, generation):
+        with self._lock:
+            if generation != self._generations.get(label, 0):
+                return  # the model changed while the value was computed
+            self._entries[(label, key)] = (generation, time.monotonic() + self.timeout, value)
+            self._entries.move_to_end((label, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def generation(self, label):
+        with self._lock:
+            return self._generations.get(label, 0)
+
+    def invalidate(self, label):
+        with self._lock:
+            self._generations[label] = self._generations.get(label, 0) + 1
+            for key in [key for key in self._entries if key[0] == label]:
+                del self._entries[key]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_prefix_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PrefixCache(settings.AUTOCOMPLETE_CACHE_SIZE, settings.AUTOCOMPLETE_CACHE_TIMEOUT)
+    return _cache
+
+
+def invalider_autocomplete(model):
+    """Drop the cached results of a model now and once the transaction commits"""
+    label = model._meta.label_lower
+    get_prefix_cache().invalidate(label)
+    transaction.on_commit(lambda: get_prefix_cache().invalidate(label))
+
+
+class AutocompleteMixin:
+    """
+    For ModelViewSet: ``autocomplete`` list action. ``autocomplete_fields``
+    are the fields matched by prefix, ``autocomplete_values`` the fields
+    returned; results are ordered by ``autocomplete_ordering``.
+    ?q= needs LONGUEUR_MIN characters, ?limite= is capped at LIMITE_MAX.
+    """
+    autocomplete_fields = ()
+    autocomplete_values = ('id',)
+    autocomplete_ordering = ('id',)
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        prefix = request.query_params.get('q', '').strip()
+        try:
+            limite = min(max(int(request.query_params.get('limite', LIMITE_DEFAUT)), 1), LIMITE_MAX)
+        except ValueError:
+            limite = LIMITE_DEFAUT
+        if len(prefix) < LONGUEUR_MIN:
+            return Response({'results': []})
+
+        queryset = self.get_queryset()
+        label = queryset.model._meta.label_lower
+        cache = get_prefix_cache() if settings.AUTOCOMPLETE_CACHE_TIMEOUT else None
+        key = (prefix.upper(), limite)
+        results = cache.get(label, key) if cache else None
+        if results is None:
+            generation = cache.generation(label) if cache else None
+            matches = reduce(or_, (Q(**{f'{field}__istartswith': prefix}) for field in self.autocomplete_fields))
+            results = list(
+                queryset.filter(matches).order_by(*self.autocomplete_ordering).values(*self.autocomplete_values)[:limite]
+            )
+            if cache:
+                cache.set(label, key, results, generation)
+        return Response({'results': results})
@@ -0,0 +1,125 @@
+"""
+Sparse fieldsets (?fields=) and opt-in expansion (?expand=) for read requests.
+
+    ?fields=id,total,statut          only these fields
+    ?expand=                         no nested objects (Meta.expandable_fields)
+    ?expand=articles,cree_par_details.user
+                                     only these nested objects, at any depth
+
+Without either parameter the representation is unchanged. SparseQuerysetMixin
+derives select_related/prefetch_related from the fields actually rendered.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_fieldset(value):
+    """'id,articles.quantite' -> {'id': {}, 'articles': {'quantite': {}}}"""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(name, {})
+    return tree
+
+
+class SparseFieldsetMixin:
+    """
+    For ModelSerializer: drops the fields not asked for by ?fields= / ?expand=.
+    Meta.expandable_fields lists the nested representations ?expand= controls;
+    Meta.related_lookups maps method fields to the relations they read
+    (e.g. {'client': ('id_client',)}) for SparseQuerysetMixin.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return fields  # writes always see every field
+        only = parse_fieldset(request.query_params['fields']) if request.query_params.get('fields') else None
+        expand = parse_fieldset(request.query_params['expand']) if 'expand' in request.query_params else None
+        for name in self.fieldset_path():
+            only = only.get(name) or None if only is not None else None
+            expand = expand.get(name, {}) if expand is not None else None
+
+        expandable = set(getattr(self.Meta, 'expandable_fields', ()))
+        if expand is not None and set(expand) - expandable:
+            raise serializers.ValidationError({
+                'expand': f"Champs non extensibles: {', '.join(sorted(set(expand) - expandable))}"
+            })
+        if only is not None:
+            unknown = set(only) - set(fields)
+            if unknown:
+                raise serializers.ValidationError({'fields': f"Champs inconnus: {', '.join(sorted(unknown))}"})
+            fields = {name: field for name, field in fields.items() if name in only or name in (expand or ())}
+        elif expand is not None:
+            fields = {name: field for name, field in fields.items() if name not in expandable or name in expand}
+        return fields
+
+    def fieldset_path(self):
+        """Field names from the root serializer down to this one"""
+        path = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                path.append(node.field_name)
+            node = node.parent
+        return reversed(path)
+
+
+def related_lookups(serializer, model, prefix='', many=False, lookups=None):
+    """(select_related, prefetch_related) lookups for the readable fields of serializer"""
+    if lookups is None:
+        lookups = (set(), set())
+    hints = getattr(getattr(serializer, 'Meta', None), 'related_lookups', {})
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if field.field_name in hints:
+            paths = [path.split('__') for path in hints[field.field_name]]
+        elif field.source == '*':
+            continue
+        elif isinstance(field, serializers.PrimaryKeyRelatedField):
+            paths = [field.source_attrs[:-1]]  # the id is read from the foreign key column
+        else:
+            paths = [field.source_attrs]
+        for path in paths:
+            relation, related_model, crosses_many = _relation_path(model, path)
+            if not relation:
+                continue
+            lookup = prefix + '__'.join(relation)
+            lookups[1 if many or crosses_many else 0].add(lookup)
+            if isinstance(nested, serializers.ModelSerializer) and len(relation) == len(path):
+                related_lookups(nested, related_model, lookup + '__', many or crosses_many, lookups)
+    return lookups
+
+
+def _relation_path(model, path):
+    """Longest prefix of path made of relations, its model, and whether it crosses a to-many relation"""
+    relation, crosses_many = [], False
+    for name in path:
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            break
+        if not field.is_relation or field.related_model is None:
+            break
+        relation.append(name)
+        crosses_many = crosses_many or field.many_to_many or field.one_to_many
+        model = field.related_model
+    return relation, model, crosses_many
+
+
+class SparseQuerysetMixin:
+    """For ModelViewSet: joins and prefetches only what the serializer will render"""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        select, prefetch = related_lookups(self.get_serializer(), queryset.model)
+        if select:
+            queryset = queryset.select_related(*sorted(select))
+        if prefetch:
+            queryset = queryset.prefetch_related(*sorted(prefetch))
+        return queryset
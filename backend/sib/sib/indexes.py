@@ -0,0 +1,31 @@
+from django.db import models
+from django.db.backends.ddl_references import Statement, Table
+from django.db.models.functions import Upper
+
+
+class PrefixIndex(models.Index):
+    """
+    Index for case-insensitive prefix searches (``field__istartswith``) on a
+    text field: an index on UPPER(field), which is what Django compares. On
+    PostgreSQL it uses text_pattern_ops so that LIKE 'ABC%' can use it
+    whatever the database collation.
+    """
+
+    def __init__(self, field, name):
+        self.prefix_field = field
+        super().__init__(Upper(field), name=name)
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().create_sql(model, schema_editor, using=using, **kwargs)
+        # Written out: OpClass() only renders inside an index with django.contrib.postgres installed
+        return Statement(
+            'CREATE INDEX %(name)s ON %(table)s ((UPPER(%(column)s)) text_pattern_ops)',
+            name=schema_editor.quote_name(self.name),
+            table=Table(model._meta.db_table, schema_editor.quote_name),
+            column=schema_editor.quote_name(model._meta.get_field(self.prefix_field).column),
+        )
+
+    def deconstruct(self):
+        path = f'{self.__class__.__module__}.{self.__class__.__name__}'
+        return path, (self.prefix_field,), {'name': self.name}
@@ -0,0 +1,168 @@
+import math
+import queue
+import random
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+from inventory_app.models import MouvementStock, ProduitFini, Stock
+from sales_app.models import Commande
+from users_app.permissions import filter_queryset_by_warehouse_access
+
+# (name, weight, URL); {stock}, {mouvement}, {commande}, {content_type} and {article} are
+# replaced by ids the benchmark user can see
+ENDPOINT_MIX = (
+    ('stock.list', 15, '/api/v1/stock/'),
+    ('stock.retrieve', 10, '/api/v1/stock/{stock}/'),
+    ('mouvementstock.list', 15, '/api/v1/mouvements-stock/'),
+    ('mouvementstock.retrieve', 5, '/api/v1/mouvements-stock/{mouvement}/'),
+    ('mouvementstock.par_article', 10, '/api/v1/mouvements-stock/par_article/?content_type={content_type}&id_article={article}'),
+    ('commande.list', 10, '/api/v1/commandes/'),
+    ('commande.retrieve', 5, '/api/v1/commandes/{commande}/'),
+    ('produitfini.list', 5, '/api/v1/produits-finis/'),
+    ('matierepremiere.list', 5, '/api/v1/matieres-premieres/'),
+    ('production.list', 5, '/api/v1/production/'),
+    ('message.list', 5, '/api/v1/messages/'),
+    ('entrepot.list', 3, '/api/v1/entrepots/'),
+    ('historiqueactivite.list', 2, '/api/v1/historique-activites/'),
+)
+SAMPLE_IDS = 200
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay a weighted mix of read API endpoints with the Django test client from several threads '
+        'and report latency percentiles per endpoint (in-process: no network, shares the GIL)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=str, help='Username to call the API as (default: the first bench_ administrator)')
+        parser.add_argument('--requests', type=int, default=2000, help='Total number of requests')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--page-size', type=int, default=None, help='?page_size= sent to list endpoints')
+        parser.add_argument('--warmup', type=int, default=50, help='Unmeasured requests sent first')
+        parser.add_argument('--endpoint', action='append', dest='endpoints', help='Only these endpoints (repeatable), e.g. stock.list')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        token, _ = Token.objects.get_or_create(user=user)
+        mix = [entry for entry in ENDPOINT_MIX if not options['endpoints'] or entry[0] in options['endpoints']]
+        if not mix:
+            raise CommandError(f"Aucun endpoint ne correspond. Disponibles: {', '.join(name for name, _, _ in ENDPOINT_MIX)}")
+        ids = self.sample_ids(user)
+        rng = random.Random(options['seed'])
+        plan = [self.build_request(rng.choices(mix, [weight for _, weight, _ in mix])[0], ids, rng, options['page_size'])
+                for _ in range(options['warmup'] + options['requests'])]
+        warmup, measured = plan[:options['warmup']], plan[options['warmup']:]
+
+        self.stdout.write(f"🚀 {len(measured)} requêtes, {options['threads']} threads, utilisateur {user.username}")
+        host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*', '') and not host.startswith('.')), 'localhost')
+        results = defaultdict(list)
+        errors = defaultdict(int)
+        lock = threading.Lock()
+
+        def worker(pending, record):
+            client = Client(HTTP_HOST=host, HTTP_AUTHORIZATION=f'Token {token.key}')
+            try:
+                while True:
+                    try:
+                        name, url = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    elapsed = time.perf_counter() - started
+                    if record:
+                        with lock:
+                            results[name].append(elapsed)
+                            if response.status_code >= 400:
+                                errors[name] += 1
+            finally:
+                # Each worker thread opened its own database connection
+                connection.close()
+
+        def run(requests, record):
+            pending = queue.SimpleQueue()
+            for request in requests:
+                pending.put(request)
+            threads = [threading.Thread(target=worker, args=(pending, record)) for _ in range(options['threads'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        run(warmup, record=False)
+        started = time.perf_counter()
+        run(measured, record=True)
+        elapsed = time.perf_counter() - started
+        self.report(results, errors, elapsed)
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"Utilisateur {username} introuvable")
+        user = User.objects.filter(username__startswith='bench_', groups__name='Administrateurs').order_by('pk').first()
+        if user is None:
+            raise CommandError("Aucun utilisateur bench_ : lancez d'abord seed_benchmark_data ou passez --user")
+        return user
+
+    def sample_ids(self, user):
+        """Ids for the detail URLs, limited to the rows the user can see"""
+        stock = filter_queryset_by_warehouse_access(Stock.objects.order_by('?'), user)
+        mouvements = filter_queryset_by_warehouse_access(MouvementStock.objects.order_by('?'), user)
+        articles = list(mouvements.values_list('content_type_id', 'id_article')[:SAMPLE_IDS])
+        return {
+            'stock': list(stock.values_list('pk', flat=True)[:SAMPLE_IDS]),
+            'mouvement': list(mouvements.values_list('pk', flat=True)[:SAMPLE_IDS]),
+            'commande': list(Commande.objects.order_by('?').values_list('pk', flat=True)[:SAMPLE_IDS]),
+            'article': articles or [(ContentType.objects.get_for_model(ProduitFini).pk, 0)],
+        }
+
+    def build_request(self, endpoint, ids, rng, page_size):
+        name, _, url = endpoint
+        content_type, article = rng.choice(ids['article'])
+        values = {'content_type': content_type, 'article': article}
+        for key in ('stock', 'mouvement', 'commande'):
+            if f'{{{key}}}' in url:
+                if not ids[key]:
+                    raise CommandError(f"Aucune ligne visible pour {name}")
+                values[key] = rng.choice(ids[key])
+        url = url.format(**values)
+        if page_size and not name.endswith('.retrieve'):
+            url += f"{'&' if '?' in url else '?'}page_size={page_size}"
+        return name, url
+
+    def report(self, results, errors, elapsed):
+        total = sum(len(timings) for timings in results.values())
+        self.stdout.write(f"{'Endpoint':<28} {'N':>6} {'Err':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for name in sorted(results, key=lambda name: -percentile(sorted(results[name]), 0.95)):
+            timings = sorted(results[name])
+            self.stdout.write(
+                f"{name:<28} {len(timings):>6} {errors[name]:>5} "
+                + ' '.join(f"{percentile(timings, fraction) * 1000:>8.1f}" for fraction in (0.50, 0.95, 0.99))
+                + f" {timings[-1] * 1000:>8.1f}"
+            )
+        all_timings = sorted(timing for timings in results.values() for timing in timings)
+        self.stdout.write(
+            f"⏱️  Total: {total} requêtes en {elapsed:.2f} s ({total / elapsed:.0f} req/s) | "
+            f"p50 {percentile(all_timings, 0.50) * 1000:.1f} ms | p95 {percentile(all_timings, 0.95) * 1000:.1f} ms | "
+            f"p99 {percentile(all_timings, 0.99) * 1000:.1f} ms"
+        )
+        if sum(errors.values()):
+            self.stdout.write(self.style.WARNING(f"⚠️  {sum(errors.values())} réponses en erreur (4xx/5xx)"))
@@ -0,0 +1,324 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from communication_app.models import Message
+from inventory_app.models import MatierePremiere, MouvementStock, ProduitFini, ProduitSemiFini, Stock
+from logs_app.models import HistoriqueActivite
+from production_app.bom import invalider_nomenclature
+from production_app.couts import recalculer_couts
+from production_app.models import MatiereProduction, NomenclatureProduits, Production
+from sales_app.analytics import reconstruire_ventes
+from sales_app.models import ArticleCommande, Client, Commande, Fournisseur
+from users_app.models import Utilisateur, UtilisateurEntrepot
+from warehouse.models import Entrepot
+
+GROUPS = ('Administrateurs', 'Magasiniers', 'Commerciaux', 'Ouvriers de production')
+BENCH_PASSWORD = 'bench'
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def next_pk(model):
+    return (model.objects.aggregate(max_pk=Max('pk'))['max_pk'] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = 'Generate benchmark volumes of every table with bulk inserts (explicit primary keys)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiply every volume below')
+        parser.add_argument('--entrepots', type=int, default=20)
+        parser.add_argument('--utilisateurs', type=int, default=200)
+        parser.add_argument('--produits', type=int, default=2000, help='Items per catalog (raw materials, semi-finished, finished)')
+        parser.add_argument('--clients', type=int, default=5000, help='Clients, and as many suppliers')
+        parser.add_argument('--mouvements', type=int, default=1000000)
+        parser.add_argument('--commandes', type=int, default=50000, help='Orders, 1 to 5 lines each')
+        parser.add_argument('--productions', type=int, default=10000, help='Production orders, 1 to 4 materials each')
+        parser.add_argument('--messages', type=int, default=50000)
+        parser.add_argument('--logs', type=int, default=200000, help='Activity log entries')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, for reproducible data')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        scale = options['scale']
+        volume = {name: max(1, int(options[name] * scale)) for name in (
+            'entrepots', 'utilisateurs', 'produits', 'clients', 'mouvements', 'commandes', 'productions', 'messages', 'logs'
+        )}
+        self.seeded = []
+        started = time.perf_counter()
+
+        entrepots = self.seed_entrepots(volume['entrepots'])
+        utilisateurs = self.seed_utilisateurs(volume['utilisateurs'], entrepots)
+        catalogs = self.seed_catalogs(volume['produits'])
+        clients, fournisseurs = self.seed_partners(volume['clients'])
+        stock_keys = self.seed_stock(catalogs, entrepots)
+        self.seed_mouvements(volume['mouvements'], stock_keys, entrepots, utilisateurs, clients, fournisseurs)
+        commandes = self.seed_commandes(volume['commandes'], clients, catalogs['fini'], utilisateurs)
+        productions = self.seed_productions(volume['productions'], catalogs, utilisateurs)
+        self.seed_nomenclatures(catalogs)
+        self.seed_messages(volume['messages'], utilisateurs)
+        self.seed_logs(volume['logs'], utilisateurs, {Commande: commandes, Client: clients, Production: productions})
+
+        # Explicit primary keys do not advance the sequences (PostgreSQL)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), self.seeded):
+                cursor.execute(sql)
+        self.rebuild_derived_data()
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Données de benchmark générées en {time.perf_counter() - started:.1f} s'))
+        self.stdout.write(f"🔑 Utilisateurs: bench_<n>, mot de passe '{BENCH_PASSWORD}' (voir bench_api)")
+
+    def rebuild_derived_data(self):
+        """bulk_create skips the signals that keep the nomenclature cache, standard costs and sales rollups current"""
+        started = time.perf_counter()
+        invalider_nomenclature()
+        count = recalculer_couts()
+        self.stdout.write(f'🧮 Coûts standard: {count} produits recalculés en {time.perf_counter() - started:.1f} s')
+        started = time.perf_counter()
+        count = reconstruire_ventes(batch_size=self.batch_size)
+        self.stdout.write(f'📦 Ventes journalières: {count} lignes reconstruites en {time.perf_counter() - started:.1f} s')
+
+    def insert(self, model, objects, total):
+        """bulk_create ``objects`` (a generator of ``total`` rows) in batches"""
+        started = time.perf_counter()
+        with transaction.atomic():
+            for chunk in chunked(objects, self.batch_size):
+                model.objects.bulk_create(chunk, batch_size=self.batch_size)
+        self.seeded.append(model)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'📦 {model._meta.verbose_name_plural}: {total} lignes en {elapsed:.1f} s ({total / max(elapsed, 1e-6):.0f}/s)')
+
+    def pks(self, model, count):
+        start = next_pk(model)
+        return range(start, start + count)
+
+    def seed_entrepots(self, count):
+        ids = self.pks(Entrepot, count)
+        self.insert(Entrepot, (Entrepot(pk=pk, nom=f'Entrepôt Bench {pk}', adresse=f'Zone {pk % 7}') for pk in ids), count)
+        return list(ids)
+
+    def seed_utilisateurs(self, count, entrepots):
+        groups = [Group.objects.get_or_create(name=name)[0] for name in GROUPS]
+        password = make_password(BENCH_PASSWORD)  # hashed once for every user
+        user_ids = self.pks(User, count)
+        self.insert(User, (User(pk=pk, username=f'bench_{pk}', password=password) for pk in user_ids), count)
+        self.insert(User.groups.through, (
+            User.groups.through(user_id=pk, group_id=groups[index % len(groups)].pk) for index, pk in enumerate(user_ids)
+        ), count)
+
+        profile_ids = self.pks(Utilisateur, count)
+        self.insert(Utilisateur, (
+            # Administrators see every warehouse, the others get a few grants
+            Utilisateur(pk=pk, user_id=user_id, nom=f'Bench {user_id}', acces_tous_entrepots=index % len(groups) == 0)
+            for index, (pk, user_id) in enumerate(zip(profile_ids, user_ids))
+        ), count)
+        grants = [
+            (pk, entrepot_id)
+            for index, pk in enumerate(profile_ids) if index % len(groups)
+            for entrepot_id in self.rng.sample(entrepots, min(3, len(entrepots)))
+        ]
+        self.insert(UtilisateurEntrepot, (
+            UtilisateurEntrepot(utilisateur_id=pk, entrepot_id=entrepot_id, peut_modifier=bool(pk % 2), peut_supprimer=not pk % 5)
+            for pk, entrepot_id in grants
+        ), len(grants))
+        return list(profile_ids)
+
+    def seed_catalogs(self, count):
+        catalogs = {}
+        for key, model, prefix, unite in (
+            ('matiere', MatierePremiere, 'MP', 'kg'),
+            ('semi_fini', ProduitSemiFini, 'SF', 'u'),
+            ('fini', ProduitFini, 'PF', 'u'),
+        ):
+            ids = self.pks(model, count)
+
+            def articles():
+                for pk in ids:
+                    article = model(pk=pk, nom=f'{model._meta.verbose_name} Bench {pk}', code_reference=f'BENCH-{prefix}-{pk}',
+                                    unite=unite, niveau_min_stock=Decimal(pk % 50))
+                    if model is MatierePremiere:
+                        # Raw material costs feed the standard cost rollup
+                        article.cout_unitaire = Decimal(self.rng.randint(50, 5000)) / 100
+                    yield article
+
+            self.insert(model, articles(), count)
+            catalogs[key] = (ContentType.objects.get_for_model(model).pk, list(ids))
+        return catalogs
+
+    def seed_partners(self, count):
+        client_ids = self.pks(Client, count)
+        self.insert(Client, (
+            Client(pk=pk, nom_entreprise=f'Client Bench {pk}', email=f'client{pk}@example.com') for pk in client_ids
+        ), count)
+        fournisseur_ids = self.pks(Fournisseur, count)
+        self.insert(Fournisseur, (
+            Fournisseur(pk=pk, nom_entreprise=f'Fournisseur Bench {pk}', code_fournisseur=f'BENCH-F{pk}')
+            for pk in fournisseur_ids
+        ), count)
+        return list(client_ids), list(fournisseur_ids)
+
+    def seed_stock(self, catalogs, entrepots):
+        """Each item is stocked in up to 3 warehouses; returns the (type, content type, item, warehouse) keys"""
+        keys = [
+            (type_article, content_type_id, article_id, entrepot_id)
+            for type_article, (content_type_id, ids) in catalogs.items()
+            for article_id in ids
+            for entrepot_id in self.rng.sample(entrepots, min(3, len(entrepots)))
+        ]
+        self.insert(Stock, (
+            Stock(type_article=type_article, content_type_id=content_type_id, id_article=article_id,
+                  entrepot_id=entrepot_id, quantite=Decimal(self.rng.randint(0, 500)))
+            for type_article, content_type_id, article_id, entrepot_id in keys
+        ), len(keys))
+        return keys
+
+    def seed_mouvements(self, count, stock_keys, entrepots, utilisateurs, clients, fournisseurs):
+        rng = self.rng
+
+        def mouvements():
+            for pk in self.pks(MouvementStock, count):
+                _, content_type_id, article_id, entrepot_id = rng.choice(stock_keys)
+                type_mouvement = rng.choices(('entree', 'sortie', 'ajustement', 'transfert'), (40, 40, 5, 15))[0]
+                mouvement = MouvementStock(
+                    pk=pk, type_mouvement=type_mouvement, content_type_id=content_type_id, id_article=article_id,
+                    entrepot_id=entrepot_id, utilisateur_id=rng.choice(utilisateurs),
+                    quantite=Decimal(rng.randint(1, 100)), reference=f'BENCH-{pk}',
+                )
+                if type_mouvement == 'entree':
+                    mouvement.motif = 'reception'
+                    mouvement.source_type, mouvement.fournisseur_source_id = 'fournisseur', rng.choice(fournisseurs)
+                elif type_mouvement == 'sortie':
+                    mouvement.motif = 'vente'
+                    mouvement.destination_type, mouvement.client_destination_id = 'client', rng.choice(clients)
+                elif type_mouvement == 'transfert':
+                    mouvement.motif = 'transfert'
+                    source = rng.choice(entrepots)
+                    mouvement.entrepot_source_id = mouvement.entrepot_source_fk_id = source
+                    mouvement.source_type, mouvement.destination_type = 'entrepot', 'entrepot'
+                    mouvement.entrepot_destination_fk_id = entrepot_id
+                else:
+                    mouvement.motif = 'ajustement'
+                yield mouvement
+
+        self.insert(MouvementStock, mouvements(), count)
+
+    def seed_commandes(self, count, clients, produits_finis, utilisateurs):
+        rng = self.rng
+        statuts = [value for value, _ in Commande.STATUT_CHOICES]
+        ids = self.pks(Commande, count)
+        today = date.today()
+        commandes = [
+            Commande(pk=pk, id_client_id=rng.choice(clients), statut=rng.choice(statuts),
+                     date_commande=today - timedelta(days=rng.randint(0, 730)), cree_par_id=rng.choice(utilisateurs))
+            for pk in ids
+        ]
+        _, produit_ids = produits_finis
+        lines = [
+            (commande, produit_id)
+            for commande in commandes
+            for produit_id in rng.sample(produit_ids, min(rng.randint(1, 5), len(produit_ids)))
+        ]
+        articles = []
+        for commande, produit_id in lines:
+            # bulk_create skips the signals that maintain the stored totals
+            article = ArticleCommande(id_commande_id=commande.pk, id_produit_id=produit_id,
+                                      quantite=Decimal(rng.randint(1, 50)), prix_unitaire=Decimal(rng.randint(100, 10000)) / 100)
+            commande.total += article.montant
+            commande.nombre_articles += 1
+            articles.append(article)
+        self.insert(Commande, commandes, count)
+        self.insert(ArticleCommande, articles, len(articles))
+        return list(ids)
+
+    def seed_productions(self, count, catalogs, utilisateurs):
+        rng = self.rng
+        statuts = [value for value, _ in Production.STATUT_CHOICES]
+        ids = self.pks(Production, count)
+        _, semi_finis = catalogs['semi_fini']
+        _, finis = catalogs['fini']
+        _, matieres = catalogs['matiere']
+        today = date.today()
+        self.insert(Production, (
+            Production(
+                pk=pk, produit_semi_fini_id=rng.choice(semi_finis) if pk % 2 else None,
+                produit_fini_id=None if pk % 2 else rng.choice(finis), quantite_prevue=Decimal(rng.randint(10, 1000)),
+                date_debut=today - timedelta(days=rng.randint(0, 365)), statut=rng.choice(statuts),
+                cree_par_id=rng.choice(utilisateurs),
+            )
+            for pk in ids
+        ), count)
+        used = [
+            (production_id, matiere_id)
+            for production_id in ids
+            for matiere_id in rng.sample(matieres, min(rng.randint(1, 4), len(matieres)))
+        ]
+        self.insert(MatiereProduction, (
+            MatiereProduction(id_production_id=production_id, id_matiere_id=matiere_id, quantite_utilisee=Decimal(rng.randint(1, 100)))
+            for production_id, matiere_id in used
+        ), len(used))
+        return list(ids)
+
+    def seed_nomenclatures(self, catalogs):
+        """Semi-finished items use 3 raw materials; finished items 2 semi-finished items and 2 raw materials"""
+        rng = self.rng
+        matiere_type, matieres = catalogs['matiere']
+        semi_type, semi_finis = catalogs['semi_fini']
+        fini_type, finis = catalogs['fini']
+        rows = []
+        for parent_id in semi_finis:
+            rows += [(semi_type, parent_id, 'semi_fini', matiere_type, composant_id, 'matiere')
+                     for composant_id in rng.sample(matieres, min(3, len(matieres)))]
+        for parent_id in finis:
+            rows += [(fini_type, parent_id, 'fini', semi_type, composant_id, 'semi_fini')
+                     for composant_id in rng.sample(semi_finis, min(2, len(semi_finis)))]
+            rows += [(fini_type, parent_id, 'fini', matiere_type, composant_id, 'matiere')
+                     for composant_id in rng.sample(matieres, min(2, len(matieres)))]
+        self.insert(NomenclatureProduits, (
+            NomenclatureProduits(
+                content_type_parent_id=parent_type, id_produit_parent=parent_id, type_produit_parent=type_parent,
+                content_type_composant_id=composant_type, id_composant=composant_id, type_composant=type_composant,
+                quantite_requise=Decimal(rng.randint(1, 20)), unite='u',
+            )
+            for parent_type, parent_id, type_parent, composant_type, composant_id, type_composant in rows
+        ), len(rows))
+
+    def seed_messages(self, count, utilisateurs):
+        rng = self.rng
+        self.insert(Message, (
+            Message(pk=pk, id_expediteur_id=rng.choice(utilisateurs), id_destinataire_id=rng.choice(utilisateurs),
+                    message=f'Message de benchmark {pk}', statut_lu=rng.random() < 0.7)
+            for pk in self.pks(Message, count)
+        ), count)
+
+    def seed_logs(self, count, utilisateurs, entities):
+        rng = self.rng
+        targets = [(ContentType.objects.get_for_model(model).pk, ids) for model, ids in entities.items()]
+        actions = ('Création', 'Mise à jour', 'Suppression')
+
+        def logs():
+            for pk in self.pks(HistoriqueActivite, count):
+                content_type_id, ids = rng.choice(targets)
+                entite_id = rng.choice(ids)
+                yield HistoriqueActivite(
+                    pk=pk, id_utilisateur_id=rng.choice(utilisateurs), action=rng.choice(actions),
+                    content_type_id=content_type_id, id_entite=entite_id, details=f'Benchmark #{entite_id}',
+                )
+
+        self.insert(HistoriqueActivite, logs(), count)
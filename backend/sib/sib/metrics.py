@@ -0,0 +1,116 @@
+"""
+In-process request metrics, filled by sib.middleware.RequestMetricsMiddleware
+and served in the Prometheus text format at /api/v1/metrics.
+
+Each worker process keeps its own histograms; they start empty when the
+process starts.
+"""
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.views import APIView
+
+from users_app.permissions import IsAdmin
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)  # bytes
+
+HISTOGRAMS = (
+    # (name, help, buckets)
+    ('sib_request_duration_seconds', 'Wall time of the request', DURATION_BUCKETS),
+    ('sib_request_db_duration_seconds', 'Time spent executing SQL during the request', DURATION_BUCKETS),
+    ('sib_request_queries', 'SQL queries executed during the request', QUERY_BUCKETS),
+    ('sib_response_size_bytes', 'Size of the response body', SIZE_BUCKETS),
+)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestMetrics:
+    """Histograms per (view, method) and request counters per (view, method, status)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._requests = {}
+
+    def record(self, view, method, status, duration, db_duration, queries, size):
+        key = (view, method)
+        with self._lock:
+            histograms = self._histograms.get(key)
+            if histograms is None:
+                histograms = self._histograms[key] = [Histogram(buckets) for _, _, buckets in HISTOGRAMS]
+            histograms[0].observe(duration)
+            histograms[1].observe(db_duration)
+            histograms[2].observe(queries)
+            if size is not None:
+                histograms[3].observe(size)
+            counter = (view, method, status)
+            self._requests[counter] = self._requests.get(counter, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._requests.clear()
+
+    def render(self):
+        """Prometheus text exposition format"""
+        with self._lock:
+            histograms = {key: [(list(h.counts), h.sum, h.count) for h in values] for key, values in self._histograms.items()}
+            requests = dict(self._requests)
+
+        lines = [
+            '# HELP sib_requests_total Requests handled, by view, method and status code',
+            '# TYPE sib_requests_total counter',
+        ]
+        for (view, method, status), count in sorted(requests.items()):
+            lines.append(f'sib_requests_total{{view="{_escape(view)}",method="{method}",status="{status}"}} {count}')
+
+        for index, (name, help_text, buckets) in enumerate(HISTOGRAMS):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for (view, method), values in sorted(histograms.items()):
+                counts, total, count = values[index]
+                if not count:
+                    continue
+                labels = f'view="{_escape(view)}",method="{method}"'
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{labels}}} {total}')
+                lines.append(f'{name}_count{{{labels}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+request_metrics = RequestMetrics()
+
+
+class MetricsView(APIView):
+    """Per-view request metrics for Prometheus (REQUEST_METRICS must be enabled)"""
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        if not settings.REQUEST_METRICS:
+            return HttpResponse("Les métriques sont désactivées (REQUEST_METRICS=False)", status=404, content_type='text/plain')
+        return HttpResponse(request_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,5 +1,16 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth import get_user
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import request_metrics
+from .query_inspector import inspect_queries
+
+METRIC_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
 
 class AllowAllUsersAdminMiddleware:
     """
@@ -23,3 +34,86 @@ class AllowAllUsersAdminMiddleware:
         response = self.get_response(request)
         return response
 
+
+class QueryTimer:
+    """Database execute wrapper counting queries and their time"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+def view_label(request, view_func):
+    """"<basename>.<action>" for router views, the URL name otherwise"""
+    initkwargs = getattr(view_func, 'initkwargs', None) or {}
+    actions = getattr(view_func, 'actions', None)
+    if actions and initkwargs.get('basename'):
+        method = request.method.lower()
+        return f"{initkwargs['basename']}.{actions.get(method, method)}"
+    match = request.resolver_match
+    return match.view_name if match else 'unmatched'
+
+
+class RequestMetricsMiddleware:
+    """
+    Records wall time, DB time, query count and response size per view into
+    the histograms served at /api/v1/metrics. Enabled by REQUEST_METRICS;
+    when off it removes itself from the middleware chain.
+
+    Streaming responses are timed until their first byte and have no size.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        if response.has_header('Content-Length'):
+            size = int(response['Content-Length'])
+        elif not response.streaming:
+            size = len(response.content)
+        else:
+            size = None
+        request_metrics.record(
+            getattr(request, 'metrics_view', 'unmatched'),
+            request.method if request.method in METRIC_METHODS else 'OTHER',
+            response.status_code, duration, timer.duration, timer.count, size,
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = view_label(request, view_func)
+
+
+class QueryInspectorMiddleware:
+    """
+    Development aid (QUERY_INSPECTOR): reports repeated SQL shapes (N+1) per
+    request and logs slow queries, see sib.query_inspector. Removed from the
+    middleware chain when off.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSPECTOR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with inspect_queries(f"{request.method} {request.get_full_path()}"):
+            return self.get_response(request)
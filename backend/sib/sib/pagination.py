@@ -0,0 +1,7 @@
+from rest_framework.pagination import PageNumberPagination
+
+
+class StandardPagination(PageNumberPagination):
+    """PAGE_SIZE rows per page; clients may ask for up to max_page_size with ?page_size="""
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,116 @@
+"""
+Development query inspector (QUERY_INSPECTOR).
+
+Wraps database execution for a request (or any block, see inspect_queries),
+groups the queries by SQL shape and reports the shapes run more than
+QUERY_REPEAT_THRESHOLD times, usually an N+1, with the serializer field and
+the project code that issued them. Queries slower than SLOW_QUERY_MS go to
+the rotating slow-query log.
+"""
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.fields import Field
+from rest_framework.views import APIView
+
+logger = logging.getLogger('sib.queries')
+slow_logger = logging.getLogger('sib.slow_queries')
+
+IN_LIST = re.compile(r'\((?:%s|\?)(?:, (?:%s|\?))+\)')
+NOT_AN_ORIGIN = ('manage.py', 'wsgi.py', 'asgi.py', 'middleware.py', os.path.basename(__file__))
+
+
+def sql_shape(sql):
+    """SQL with variable-length IN lists collapsed; parameters are already placeholders"""
+    return IN_LIST.sub('(...)', sql)
+
+
+def _is_project_code(filename):
+    return (
+        filename.startswith(str(settings.BASE_DIR))
+        and 'site-packages' not in filename
+        and os.path.basename(filename) not in NOT_AN_ORIGIN
+    )
+
+
+def query_origin():
+    """Innermost serializer field and project frame, and the API view, of the current query"""
+    field = code = view = None
+    frame = sys._getframe(1)
+    while frame is not None and view is None:
+        obj = frame.f_locals.get('self')
+        if isinstance(obj, APIView):
+            view = f"{type(obj).__name__}.{frame.f_code.co_name}"
+        elif field is None and isinstance(obj, Field) and obj.field_name:
+            field = f"{type(obj.parent).__name__}.{obj.field_name}"
+        if code is None and _is_project_code(frame.f_code.co_filename):
+            name = getattr(frame.f_code, 'co_qualname', frame.f_code.co_name)
+            path = os.path.relpath(frame.f_code.co_filename, settings.BASE_DIR)
+            code = f"{path}:{frame.f_lineno} in {name}"
+        frame = frame.f_back
+    return ' / '.join(part for part in (field, code, view) if part) or '?'
+
+
+class QueryInspector:
+    """Database execute wrapper collecting queries by shape"""
+
+    def __init__(self, label, repeat_threshold=None, slow_ms=None):
+        self.label = label
+        self.repeat_threshold = settings.QUERY_REPEAT_THRESHOLD if repeat_threshold is None else repeat_threshold
+        self.slow_ms = settings.SLOW_QUERY_MS if slow_ms is None else slow_ms
+        self.shapes = {}  # shape -> [count, seconds, origin of the first one]
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            shape = sql_shape(sql)
+            entry = self.shapes.get(shape)
+            if entry is None:
+                # The stack is only walked for the first query of each shape
+                entry = self.shapes[shape] = [0, 0.0, query_origin()]
+            entry[0] += 1
+            entry[1] += duration
+            if self.slow_ms and duration * 1000 >= self.slow_ms:
+                slow_logger.warning(
+                    '%.1f ms | %s | %s\n    %s\n    params=%r',
+                    duration * 1000, self.label, query_origin(), sql, params,
+                )
+
+    @property
+    def query_count(self):
+        return sum(count for count, _, _ in self.shapes.values())
+
+    def repeated(self):
+        """(count, seconds, origin, shape) of the shapes over the threshold, most frequent first"""
+        return sorted(
+            ((count, seconds, origin, shape) for shape, (count, seconds, origin) in self.shapes.items()
+             if count > self.repeat_threshold),
+            key=lambda item: item[0], reverse=True,
+        )
+
+    def report(self):
+        for count, seconds, origin, shape in self.repeated():
+            logger.warning(
+                'N+1 probable | %s | %d× (%.1f ms) | %s\n    %s',
+                self.label, count, seconds * 1000, origin, shape[:1000],
+            )
+
+
+@contextmanager
+def inspect_queries(label, **kwargs):
+    """Inspect the queries run in the block, then report the repeated shapes"""
+    inspector = QueryInspector(label, **kwargs)
+    with ExitStack() as stack:
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(inspector))
+        yield inspector
+    inspector.report()
@@ -37,10 +37,14 @@ INSTALLED_APPS = [
     'communication_app',
     'logs_app',
     'warehouse',
+    'reports_app',
+    'sib',  # Project-wide management commands (seed_benchmark_data, bench_api)
 ]
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # Must be first
+    'sib.middleware.RequestMetricsMiddleware',  # Per-view histograms at /api/v1/metrics (REQUEST_METRICS)
+    'sib.middleware.QueryInspectorMiddleware',  # N+1 and slow-query reports (QUERY_INSPECTOR)
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -110,6 +114,83 @@ MEDIA_ROOT = BASE_DIR / config('MEDIA_ROOT', default='media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache: local memory by default. Set REDIS_URL (requires the redis package) to
+# share it between worker processes, so that invalidations reach all of them.
+REDIS_URL = config('REDIS_URL', default='')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sib-default',
+    }
+}
+
+# Per-user permission snapshots (groups and warehouse grants), invalidated by signals
+# Off without REDIS_URL: a local-memory entry would outlive invalidations made by other workers
+PERMISSION_CACHE_TIMEOUT = config('PERMISSION_CACHE_TIMEOUT', default=300 if REDIS_URL else 0, cast=int)  # seconds, 0 disables the cache
+
+# API token -> user lookups, dropped when the token, user or profile changes
+TOKEN_CACHE_TIMEOUT = config('TOKEN_CACHE_TIMEOUT', default=300 if REDIS_URL else 0, cast=int)  # seconds, 0 disables the cache; off without REDIS_URL
+
+# Sales analytics responses (/api/v1/sales/analytics/), dropped when the daily rollups change
+SALES_ANALYTICS_CACHE_TIMEOUT = config('SALES_ANALYTICS_CACHE_TIMEOUT', default=300, cast=int)  # seconds, 0 disables the cache
+
+# In-process LRU of client/supplier autocomplete results (sib.autocomplete), cleared on save
+AUTOCOMPLETE_CACHE_SIZE = config('AUTOCOMPLETE_CACHE_SIZE', default=2048, cast=int)  # prefixes kept per process
+AUTOCOMPLETE_CACHE_TIMEOUT = config('AUTOCOMPLETE_CACHE_TIMEOUT', default=30, cast=int)  # seconds, 0 disables the cache
+
+# Audit trail sink: 'db' writes HistoriqueActivite rows directly, 'file' appends
+# events to rotating JSONL segments loaded later by `import_audit_segments`
+AUDIT_SINK = config('AUDIT_SINK', default='db')
+AUDIT_SINK_DIR = BASE_DIR / config('AUDIT_SINK_DIR', default='audit_segments')
+AUDIT_SINK_SEGMENT_MAX_BYTES = config('AUDIT_SINK_SEGMENT_MAX_BYTES', default=64 * 1024 * 1024, cast=int)
+AUDIT_SINK_SEGMENT_MAX_AGE = config('AUDIT_SINK_SEGMENT_MAX_AGE', default=300, cast=int)  # seconds
+AUDIT_SINK_FLUSH_INTERVAL = config('AUDIT_SINK_FLUSH_INTERVAL', default=1.0, cast=float)  # seconds
+
+# Background "print all" reports: rendered by a local thread pool, cached under MEDIA_ROOT/reports
+REPORT_JOB_WORKERS = config('REPORT_JOB_WORKERS', default=2, cast=int)
+REPORT_JOB_TIMEOUT = config('REPORT_JOB_TIMEOUT', default=1800, cast=int)  # seconds before a running job is considered dead
+REPORT_JOB_POLL_INTERVAL = config('REPORT_JOB_POLL_INTERVAL', default=3, cast=int)  # admin status page refresh, seconds
+REPORT_RENDER_PROCESSES = config('REPORT_RENDER_PROCESSES', default=0, cast=int)  # processes per report, 0 = one per CPU
+REPORT_PARALLEL_MIN_ROWS = config('REPORT_PARALLEL_MIN_ROWS', default=20000, cast=int)  # smaller reports render in one process
+
+# Request metrics: per-view latency/query/size histograms kept in each process
+REQUEST_METRICS = config('REQUEST_METRICS', default=False, cast=bool)
+
+# Query inspector (development): repeated SQL shapes per request and slow-query log
+QUERY_INSPECTOR = config('QUERY_INSPECTOR', default=False, cast=bool)
+QUERY_REPEAT_THRESHOLD = config('QUERY_REPEAT_THRESHOLD', default=5, cast=int)  # same SQL more often than this is reported
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=100, cast=int)  # 0 disables the slow-query log
+SLOW_QUERY_LOG = BASE_DIR / config('SLOW_QUERY_LOG', default='slow_queries.log')
+SLOW_QUERY_LOG_MAX_BYTES = config('SLOW_QUERY_LOG_MAX_BYTES', default=10 * 1024 * 1024, cast=int)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'timestamped': {'format': '%(asctime)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': SLOW_QUERY_LOG_MAX_BYTES,
+            'backupCount': 5,
+            'delay': True,  # no file until the first slow query
+            'formatter': 'timestamped',
+        },
+    },
+    'loggers': {
+        'sib.queries': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+        'sib.slow_queries': {'handlers': ['slow_queries'], 'level': 'WARNING', 'propagate': False},
+        'reports_app': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+        'logs_app': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
 # CORS configuration
 CORS_ALLOWED_ORIGINS = config('CORS_ALLOWED_ORIGINS', default='http://localhost:3000,http://127.0.0.1:3000').split(',')
 CORS_ALLOW_CREDENTIALS = config('CORS_ALLOW_CREDENTIALS', default=True, cast=bool)
@@ -122,13 +203,13 @@ CORS_ALLOW_HEADERS = [
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users_app.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'sib.pagination.StandardPagination',
     'PAGE_SIZE': 10,
 }
 
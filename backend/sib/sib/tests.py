@@ -0,0 +1,417 @@
+"""
+Query-count regression tests for the REST API.
+
+Every list and retrieve endpoint registered on the API routers is called at
+page sizes 10 and 100, as a superuser and as a user restricted by group and
+warehouse grants; the number of SQL queries must not depend on the page size,
+so a serializer field that triggers one query per row (N+1) fails here.
+The development query inspector (sib.query_inspector), the request metrics
+(sib.metrics) and the benchmark commands are tested at the end.
+"""
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import Group, User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from communication_app.models import Message
+from inventory_app.models import MatierePremiere, MouvementStock, ProduitFini, ProduitSemiFini, Stock
+from logs_app.models import HistoriqueActivite
+from production_app.models import MatiereProduction, NomenclatureProduits, Production
+from reports_app.models import ReportJob
+from sales_app.analytics import STATUTS_EXCLUS
+from sales_app.models import ArticleCommande, Client, Commande, Fournisseur, VenteJournaliere
+from users_app.models import Utilisateur, UtilisateurEntrepot
+from users_app.urls import router as users_router
+from warehouse.models import Entrepot
+
+from .metrics import RequestMetrics, request_metrics
+from .middleware import QueryInspectorMiddleware, RequestMetricsMiddleware
+from .query_inspector import inspect_queries, sql_shape
+from .urls import router
+
+ROWS = 120  # more than the largest page size
+PAGE_SIZES = (10, 100)
+RESTRICTED_ROWS = ROWS - 10  # warehouses granted to the restricted user
+GROUPS = ('Administrateurs', 'Magasiniers', 'Commerciaux', 'Ouvriers de production')
+# Warehouse-scoped endpoints the restricted user must be compared on
+RESTRICTED_ENDPOINTS = {'stock', 'mouvementstock', 'entrepot'}
+
+
+def api_endpoints():
+    """(list URL, basename) for every viewset registered on the API routers"""
+    for prefix, viewset, basename in router.registry:
+        yield f'/api/v1/{prefix}/', basename
+    for prefix, viewset, basename in users_router.registry:
+        yield f'/api/v1/users/{prefix}/', basename
+
+
+class APIQueryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Signals (profiles, stock mirrors, audit log) are bypassed by bulk_create
+        groups = [Group.objects.get_or_create(name=name)[0] for name in GROUPS]
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        cls.admin.groups.add(groups[0])
+        Utilisateur.objects.filter(user=cls.admin).update(acces_tous_entrepots=True)
+        admin_profile = Utilisateur.objects.get(user=cls.admin)
+
+        entrepots = Entrepot.objects.bulk_create(Entrepot(nom=f'Entrepôt {i}') for i in range(ROWS))
+        # Every group but the administrators, with read grants on most warehouses
+        cls.restricted = User.objects.create_user('restreint', password='restreint')
+        cls.restricted.groups.add(*groups[1:])
+        UtilisateurEntrepot.objects.bulk_create(
+            UtilisateurEntrepot(utilisateur=cls.restricted.utilisateur, entrepot=entrepot) for entrepot in entrepots[:RESTRICTED_ROWS]
+        )
+        users = User.objects.bulk_create(User(username=f'user{i}') for i in range(ROWS))
+        profiles = Utilisateur.objects.bulk_create(Utilisateur(user=user, nom=user.username) for user in users)
+        UtilisateurEntrepot.objects.bulk_create(
+            UtilisateurEntrepot(utilisateur=profile, entrepot=entrepots[(i + offset) % ROWS])
+            for i, profile in enumerate(profiles) for offset in (0, 1)
+        )
+
+        matieres = MatierePremiere.objects.bulk_create(
+            MatierePremiere(nom=f'Matière {i}', code_reference=f'MP{i}', unite='kg') for i in range(ROWS)
+        )
+        semi_finis = ProduitSemiFini.objects.bulk_create(
+            ProduitSemiFini(nom=f'Semi-fini {i}', code_reference=f'SF{i}', unite='u') for i in range(ROWS)
+        )
+        finis = ProduitFini.objects.bulk_create(
+            ProduitFini(nom=f'Produit {i}', code_reference=f'PF{i}', unite='u') for i in range(ROWS)
+        )
+        articles = [
+            ('matiere', ContentType.objects.get_for_model(MatierePremiere), matieres),
+            ('semi_fini', ContentType.objects.get_for_model(ProduitSemiFini), semi_finis),
+            ('fini', ContentType.objects.get_for_model(ProduitFini), finis),
+        ]
+
+        clients = Client.objects.bulk_create(Client(nom_entreprise=f'Client {i}') for i in range(ROWS))
+        fournisseurs = Fournisseur.objects.bulk_create(
+            Fournisseur(nom_entreprise=f'Fournisseur {i}', code_fournisseur=f'F{i}') for i in range(ROWS)
+        )
+
+        Stock.objects.bulk_create(
+            Stock(type_article=type_article, content_type=content_type, id_article=items[i].pk,
+                  entrepot=entrepots[i], quantite=Decimal(i))
+            for i in range(ROWS)
+            for type_article, content_type, items in [articles[i % 3]]
+        )
+        MouvementStock.objects.bulk_create(
+            MouvementStock(
+                type_mouvement=('entree', 'sortie', 'transfert')[i % 3], motif='ajustement',
+                content_type=content_type, id_article=items[i].pk, quantite=Decimal(1),
+                entrepot=entrepots[i], utilisateur=profiles[i],
+                source_type=('fournisseur', None, 'entrepot')[i % 3],
+                destination_type=(None, 'client', 'entrepot')[i % 3],
+                fournisseur_source=fournisseurs[i] if i % 3 == 0 else None,
+                client_destination=clients[i] if i % 3 == 1 else None,
+                entrepot_source=entrepots[i - 1] if i % 3 == 2 else None,
+                entrepot_source_fk=entrepots[i - 1] if i % 3 == 2 else None,
+                entrepot_destination_fk=entrepots[i] if i % 3 == 2 else None,
+            )
+            for i in range(ROWS)
+            for _, content_type, items in [articles[i % 3]]
+        )
+
+        commandes = Commande.objects.bulk_create(
+            Commande(id_client=clients[i], date_commande=date(2024, 1, 1), cree_par=profiles[i]) for i in range(ROWS)
+        )
+        ArticleCommande.objects.bulk_create(
+            ArticleCommande(id_commande=commande, id_produit=finis[(i + offset) % ROWS],
+                            quantite=Decimal(2), prix_unitaire=Decimal('9.50'))
+            for i, commande in enumerate(commandes) for offset in range(3)
+        )
+
+        productions = Production.objects.bulk_create(
+            Production(
+                produit_semi_fini=semi_finis[i] if i % 2 else None, produit_fini=None if i % 2 else finis[i],
+                quantite_prevue=Decimal(10), date_debut=date(2024, 1, 1), cree_par=profiles[i],
+            )
+            for i in range(ROWS)
+        )
+        MatiereProduction.objects.bulk_create(
+            MatiereProduction(id_production=production, id_matiere=matieres[i], quantite_utilisee=Decimal(1))
+            for i, production in enumerate(productions)
+        )
+        NomenclatureProduits.objects.bulk_create(
+            NomenclatureProduits(
+                content_type_parent=articles[1 + i % 2][1], id_produit_parent=articles[1 + i % 2][2][i].pk,
+                type_produit_parent=('semi_fini', 'fini')[i % 2],
+                content_type_composant=articles[i % 2][1], id_composant=articles[i % 2][2][i].pk,
+                type_composant=('matiere', 'semi_fini')[i % 2],
+                quantite_requise=Decimal(1), unite='u',
+            )
+            for i in range(ROWS)
+        )
+
+        Message.objects.bulk_create(
+            Message(id_expediteur=profiles[i], id_destinataire=profiles[(i + 1) % ROWS], message=f'Message {i}')
+            for i in range(ROWS)
+        )
+
+        # Log entries point at every kind of entity the API logs, deleted ones included.
+        # Entities are loaded per content type, so every page must see the same types:
+        # stock rows are limited to one article type.
+        logged = [
+            (Client, clients), (Commande, commandes), (Entrepot, entrepots), (Utilisateur, profiles),
+            (Production, productions), (Stock, list(Stock.objects.filter(type_article='matiere'))),
+            (MouvementStock, list(MouvementStock.objects.filter(content_type=articles[0][1]))),
+            (ArticleCommande, list(ArticleCommande.objects.all())),
+        ]
+        HistoriqueActivite.objects.bulk_create(
+            HistoriqueActivite(
+                id_utilisateur=profiles[i], action='Mise à jour',
+                content_type=ContentType.objects.get_for_model(model),
+                id_entite=objects[i // len(logged)].pk if i % 10 else 10 ** 6, details=f'Entrée {i}',
+            )
+            for i in range(ROWS)
+            for model, objects in [logged[i % len(logged)]]
+        )
+
+        ReportJob.objects.bulk_create(
+            ReportJob(report_type='sales_app.commande', filter_hash=str(i), data_version='1', demande_par=admin_profile)
+            for i in range(ROWS)
+        )
+
+    def setUp(self):
+        # Cached permission contexts are invalidated on commit, which never happens inside a TestCase
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, f'{url}: {response.status_code} {getattr(response, "data", "")}')
+        return response, queries
+
+    def assert_query_count_does_not_depend_on_page_size(self, url):
+        self.get(url, page_size=PAGE_SIZES[0])  # warm the permission cache
+        counts = {}
+        for page_size in PAGE_SIZES:
+            response, queries = self.get(url, page_size=page_size)
+            self.assertEqual(len(response.data['results']), min(page_size, response.data['count']))
+            counts[page_size] = queries
+        self.assertGreater(
+            len(response.data['results']), PAGE_SIZES[0],
+            f'{url}: not enough fixtures to compare page sizes'
+        )
+        small, large = (counts[page_size] for page_size in PAGE_SIZES)
+        self.assertEqual(
+            len(small), len(large),
+            f'{url}: {len(small)} queries for {PAGE_SIZES[0]} rows, {len(large)} for {PAGE_SIZES[1]} rows\n'
+            + '\n'.join(query['sql'] for query in large.captured_queries)
+        )
+
+    def test_list_query_count_does_not_depend_on_page_size(self):
+        for url, basename in api_endpoints():
+            with self.subTest(basename):
+                self.assert_query_count_does_not_depend_on_page_size(url)
+
+    def test_list_query_count_does_not_depend_on_page_size_for_restricted_users(self):
+        # Warehouse filtering and permission checks run for this user, not for the superuser
+        self.client.force_authenticate(self.restricted)
+        compared = set()
+        for url, basename in api_endpoints():
+            with self.subTest(basename):
+                response = self.client.get(url, {'page_size': PAGE_SIZES[0]})
+                if response.status_code == 403 or response.data['count'] <= PAGE_SIZES[0]:
+                    continue  # not visible to this user
+                self.assert_query_count_does_not_depend_on_page_size(url)
+                compared.add(basename)
+        self.assertLessEqual(RESTRICTED_ENDPOINTS, compared)
+        response, _ = self.get('/api/v1/entrepots/', page_size=PAGE_SIZES[1])
+        self.assertEqual(response.data['count'], RESTRICTED_ROWS)
+
+    def test_retrieve_query_count_is_bounded_by_list(self):
+        for url, basename in api_endpoints():
+            with self.subTest(basename):
+                response, list_queries = self.get(url, page_size=PAGE_SIZES[0])
+                pk = response.data['results'][0]['id']
+                response, queries = self.get(f'{url}{pk}/')
+                self.assertEqual(response.data['id'], pk)
+                self.assertLessEqual(
+                    len(queries), len(list_queries),
+                    f'{url}{pk}/: {len(queries)} queries\n' + '\n'.join(query['sql'] for query in queries.captured_queries)
+                )
+
+    def test_stock_quantite_disponible_annotation_matches_movements(self):
+        stock = Stock.objects.filter(type_article='matiere').first()
+        for type_mouvement, entrepot_source in (('ajustement', None), ('sortie', None), ('transfert', stock.entrepot)):
+            MouvementStock.objects.bulk_create([MouvementStock(
+                type_mouvement=type_mouvement, motif='ajustement', content_type=stock.content_type,
+                id_article=stock.id_article, quantite=Decimal('2.50'), entrepot=stock.entrepot,
+                utilisateur=Utilisateur.objects.get(user=self.admin), entrepot_source=entrepot_source,
+            )])
+        for annotated in Stock.objects.with_quantite_disponible():
+            self.assertEqual(annotated.quantite_calculee or 0, annotated.calculer_quantite_disponible(), annotated.pk)
+
+    def test_sparse_fieldsets_and_expansion(self):
+        response, full = self.get('/api/v1/commandes/', page_size=PAGE_SIZES[1])
+        self.assertIn('articles', response.data['results'][0])
+        response, flat = self.get('/api/v1/commandes/', page_size=PAGE_SIZES[1], fields='id,total,client')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'total', 'client'})
+        self.assertLess(len(flat), len(full))
+        response, _ = self.get('/api/v1/commandes/', page_size=PAGE_SIZES[0], expand='articles')
+        commande = response.data['results'][0]
+        self.assertNotIn('cree_par_details', commande)
+        self.assertNotIn('id_produit_details', commande['articles'][0])
+        response, _ = self.get('/api/v1/messages/', page_size=PAGE_SIZES[0], fields='id', expand='id_destinataire_details.user')
+        self.assertEqual(set(response.data['results'][0]['id_destinataire_details']), {
+            'id', 'user', 'nom', 'acces_tous_entrepots', 'cree_le'
+        })
+        self.assertEqual(self.client.get('/api/v1/commandes/', {'fields': 'inconnu'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/commandes/', {'expand': 'total'}).status_code, 400)
+
+
+class QueryInspectorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.entrepots = Entrepot.objects.bulk_create(Entrepot(nom=f'Entrepôt {i}') for i in range(4))
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        Utilisateur.objects.filter(user=cls.admin).update(acces_tous_entrepots=True)
+
+    def test_repeated_shapes_are_reported(self):
+        with self.assertLogs('sib.queries', 'WARNING') as logs:
+            with inspect_queries('boucle', repeat_threshold=2, slow_ms=0) as inspector:
+                for entrepot in self.entrepots:
+                    Entrepot.objects.get(pk=entrepot.pk)
+                for size in (2, 3):
+                    list(Entrepot.objects.filter(pk__in=[entrepot.pk for entrepot in self.entrepots[:size]]))
+        self.assertEqual(inspector.query_count, 6)
+        [(count, _, origin, shape)] = inspector.repeated()
+        self.assertEqual(count, 4)
+        self.assertIn('sib/tests.py', origin)
+        self.assertIn('N+1 probable | boucle | 4×', logs.output[0])
+        # IN lists of every length share one shape, under the threshold here
+        self.assertEqual(sql_shape('WHERE id IN (%s, %s, %s)'), sql_shape('WHERE id IN (%s, %s)'))
+
+    def test_slow_queries_are_logged(self):
+        with self.assertLogs('sib.slow_queries', 'WARNING') as logs:
+            with inspect_queries('lent', slow_ms=1e-6):
+                Entrepot.objects.count()
+        self.assertIn('| lent |', logs.output[0])
+        with self.assertNoLogs('sib.slow_queries', 'WARNING'), inspect_queries('lent', slow_ms=0):
+            Entrepot.objects.count()
+
+    def test_middleware(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with override_settings(QUERY_INSPECTOR=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                QueryInspectorMiddleware(lambda request: None)
+            with self.assertNoLogs('sib.queries', 'WARNING'):
+                self.assertEqual(client.get('/api/v1/entrepots/').status_code, 200)
+
+        client = APIClient()  # the middleware chain is built on the first request
+        client.force_authenticate(self.admin)
+        with override_settings(QUERY_INSPECTOR=True, QUERY_REPEAT_THRESHOLD=0):
+            with self.assertLogs('sib.queries', 'WARNING') as logs:
+                self.assertEqual(client.get('/api/v1/entrepots/').data['count'], 4)
+        self.assertIn('GET /api/v1/entrepots/', logs.output[0])
+
+
+class RequestMetricsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.entrepot = Entrepot.objects.create(nom='Entrepôt')
+        Group.objects.get_or_create(name='Administrateurs')
+        Group.objects.get_or_create(name='Commerciaux')
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        Utilisateur.objects.filter(user=cls.admin).update(acces_tous_entrepots=True)
+
+    def setUp(self):
+        request_metrics.reset()
+        self.addCleanup(request_metrics.reset)
+
+    def test_histograms_render_in_prometheus_format(self):
+        metrics = RequestMetrics()
+        metrics.record('entrepots.list', 'GET', 200, 0.02, 0.003, 3, 1000)
+        metrics.record('entrepots.list', 'GET', 200, 0.2, 0.004, 3, None)
+        metrics.record('entrepots.list', 'GET', 404, 0.004, 0, 0, 50)
+        lines = metrics.render().splitlines()
+        labels = 'view="entrepots.list",method="GET"'
+
+        self.assertIn('sib_requests_total{view="entrepots.list",method="GET",status="200"} 2', lines)
+        self.assertIn('sib_requests_total{view="entrepots.list",method="GET",status="404"} 1', lines)
+        self.assertIn('# TYPE sib_request_duration_seconds histogram', lines)
+        # cumulative buckets: 0.004 <= 0.005, 0.02 <= 0.025, 0.2 <= 0.25
+        buckets = [line for line in lines if line.startswith(f'sib_request_duration_seconds_bucket{{{labels},')]
+        self.assertEqual(buckets, [
+            f'sib_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}'
+            for bound, count in zip(
+                (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, '+Inf'), (1, 1, 2, 2, 2, 3, 3, 3, 3, 3, 3, 3)
+            )
+        ])
+        self.assertIn(f'sib_request_queries_bucket{{{labels},le="0"}} 1', lines)
+        self.assertIn(f'sib_request_queries_sum{{{labels}}} 6', lines)
+        self.assertIn(f'sib_request_queries_count{{{labels}}} 3', lines)
+        # streaming responses have no size
+        self.assertIn(f'sib_response_size_bytes_sum{{{labels}}} 1050', lines)
+        self.assertIn(f'sib_response_size_bytes_count{{{labels}}} 2', lines)
+
+    def test_middleware_labels_views_by_basename_and_action(self):
+        with override_settings(REQUEST_METRICS=False), self.assertRaises(MiddlewareNotUsed):
+            RequestMetricsMiddleware(lambda request: None)
+
+        client = APIClient()  # the middleware chain is built on the first request
+        client.force_authenticate(self.admin)
+        with override_settings(REQUEST_METRICS=True):
+            self.assertEqual(client.get('/api/v1/entrepots/').status_code, 200)
+            self.assertEqual(client.get(f'/api/v1/entrepots/{self.entrepot.pk}/').status_code, 200)
+            self.assertEqual(client.get('/api/v1/entrepots/0/').status_code, 404)
+        output = request_metrics.render()
+        self.assertIn('sib_requests_total{view="entrepot.list",method="GET",status="200"} 1', output)
+        self.assertIn('sib_requests_total{view="entrepot.retrieve",method="GET",status="200"} 1', output)
+        self.assertIn('sib_requests_total{view="entrepot.retrieve",method="GET",status="404"} 1', output)
+        self.assertIn('sib_request_queries_count{view="entrepot.retrieve",method="GET"} 2', output)
+
+    def test_endpoint_is_admin_only(self):
+        client = APIClient()
+        commercial = User.objects.create_user('commercial', password='x')
+        client.force_authenticate(commercial)
+        with override_settings(REQUEST_METRICS=True):
+            self.assertEqual(client.get('/api/v1/metrics').status_code, 403)
+        client.force_authenticate(self.admin)
+        with override_settings(REQUEST_METRICS=True):
+            response = client.get('/api/v1/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn(b'# TYPE sib_requests_total counter', response.content)
+        with override_settings(REQUEST_METRICS=False):
+            self.assertEqual(client.get('/api/v1/metrics').status_code, 404)
+
+
+class BenchmarkCommandTests(TransactionTestCase):
+    # bench_api calls the API from threads, which only see committed rows
+
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_then_replay(self):
+        output = StringIO()
+        call_command('seed_benchmark_data', scale=0.001, stdout=output)
+        self.assertIn('✅ Données de benchmark générées', output.getvalue())
+        # derived data that bulk_create does not maintain
+        self.assertTrue(ProduitFini.objects.filter(cout_standard__gt=0).exists())
+        self.assertTrue(ProduitSemiFini.objects.filter(cout_standard__gt=0).exists())
+        self.assertEqual(
+            sum(VenteJournaliere.objects.values_list('nombre_lignes', flat=True)),
+            ArticleCommande.objects.exclude(id_commande__statut__in=STATUTS_EXCLUS).count(),
+        )
+
+        output = StringIO()
+        call_command('bench_api', requests=20, threads=2, warmup=0, page_size=10, stdout=output)
+        self.assertIn('Total: 20 requêtes', output.getvalue())
+        self.assertNotIn('réponses en erreur', output.getvalue())
@@ -13,6 +13,7 @@ from rest_framework.authtoken.views import obtain_auth_token
 from rest_framework.routers import DefaultRouter
 from django.views.generic import RedirectView
 from django.contrib.auth import views as auth_views
+from .metrics import MetricsView
 
 # Import routers from each application
 from users_app.urls import router as users_router
@@ -22,6 +23,7 @@ from production_app.urls import router as production_router
 from communication_app.urls import router as communication_router
 from logs_app.urls import router as logs_router
 from warehouse.urls import router as warehouse_router
+from reports_app.urls import router as reports_router
 
 # Create a main router for all APIs
 router = DefaultRouter()
@@ -33,6 +35,7 @@ router.registry.extend(production_router.registry)
 router.registry.extend(communication_router.registry)
 router.registry.extend(logs_router.registry)
 router.registry.extend(warehouse_router.registry)
+router.registry.extend(reports_router.registry)
 
 urlpatterns = [
     # Redirect root to admin for better UX
@@ -62,6 +65,9 @@ urlpatterns = [
         path('communication/', include('communication_app.urls')),
         path('logs/', include('logs_app.urls')),
         path('warehouse/', include('warehouse.urls')),
+        path('reports/', include('reports_app.urls')),
+        # Prometheus scrape endpoint (see REQUEST_METRICS)
+        path('metrics', MetricsView.as_view(), name='metrics'),
     ])),
     
     # Legacy API endpoint for backward compatibility
@@ -0,0 +1,90 @@
+"""
+Token authentication with a cache in front of the Token + User lookup.
+
+The token, its user and the user's Utilisateur profile are cached for
+TOKEN_CACHE_TIMEOUT seconds under a hash of the token key (the password
+hash is not cached). Deleting the token, saving or deleting the user or the
+profile drops the entry (see users_app.signals), so deactivating a user
+takes effect on the next request. Off by default without a shared cache
+(REDIS_URL): other workers would keep a revoked token in local memory.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .models import Utilisateur
+
+TOKEN_CACHE_PREFIX = 'sib:token'
+USER_CACHED_FIELDS = [f.attname for f in User._meta.concrete_fields if f.attname != 'password']
+PROFILE_CACHED_FIELDS = [f.attname for f in Utilisateur._meta.concrete_fields]
+
+
+def _cache_key(key):
+    return f"{TOKEN_CACHE_PREFIX}:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def _snapshot(token):
+    user = token.user
+    try:
+        profile = user.utilisateur
+    except Utilisateur.DoesNotExist:
+        profile = None
+    return {
+        'token': (token.key, token.user_id, token.created),
+        'user': [getattr(user, name) for name in USER_CACHED_FIELDS],
+        'profile': [getattr(profile, name) for name in PROFILE_CACHED_FIELDS] if profile else None,
+    }
+
+
+def _restore(snapshot):
+    # from_db marks the instances as loaded; the password stays deferred
+    user = User.from_db('default', USER_CACHED_FIELDS, snapshot['user'])
+    if snapshot['profile'] is not None:
+        user.utilisateur = Utilisateur.from_db('default', PROFILE_CACHED_FIELDS, snapshot['profile'])
+    token = Token.from_db('default', ['key', 'user_id', 'created'], snapshot['token'])
+    token.user = user
+    return user, token
+
+
+def invalidate_token_cache(*keys):
+    """Forget cached tokens now and again once the transaction commits"""
+    cache_keys = [_cache_key(key) for key in keys]
+    if cache_keys:
+        cache.delete_many(cache_keys)
+        transaction.on_commit(lambda: cache.delete_many(cache_keys))
+
+
+def invalidate_user_tokens(user_id):
+    invalidate_token_cache(*Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in replacement for TokenAuthentication that needs no query when cached"""
+
+    def authenticate_credentials(self, key):
+        timeout = settings.TOKEN_CACHE_TIMEOUT
+        if not timeout:
+            return super().authenticate_credentials(key)
+
+        cache_key = _cache_key(key)
+        snapshot = cache.get(cache_key)
+        if snapshot is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user', 'user__utilisateur').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            snapshot = _snapshot(token)
+            cache.set(cache_key, snapshot, timeout)
+
+        user, token = _restore(snapshot)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return (user, token)
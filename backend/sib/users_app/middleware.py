@@ -1,5 +1,6 @@
 from django.utils.deprecation import MiddlewareMixin
-from users_app.permissions import get_user_accessible_warehouses
+from django.utils.functional import SimpleLazyObject
+from users_app.permissions import get_permission_context, get_user_accessible_warehouses
 
 class WarehouseAccessMiddleware(MiddlewareMixin):
     """
@@ -11,12 +12,12 @@ class WarehouseAccessMiddleware(MiddlewareMixin):
         Add warehouse access information to the request
         """
         if hasattr(request, 'user') and request.user.is_authenticated:
-            # Add accessible warehouses to request
-            request.accessible_warehouses = get_user_accessible_warehouses(request.user)
+            # Add accessible warehouses to request (built on first use only)
+            request.accessible_warehouses = SimpleLazyObject(lambda: get_user_accessible_warehouses(request.user))
             
             # Add a helper method to check warehouse access
             def has_warehouse_access(warehouse_id):
-                return request.accessible_warehouses.filter(id=warehouse_id).exists()
+                return get_permission_context(request.user).has_warehouse_access(int(warehouse_id))
             
             request.has_warehouse_access = has_warehouse_access
 
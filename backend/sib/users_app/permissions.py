@@ -1,11 +1,230 @@
-from rest_framework import permissions
-from django.contrib.auth.models import Permission, Group
+import threading
+import time
+
+from rest_framework import permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from django.conf import settings
+from django.contrib.auth.models import Permission, Group, User
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
+from django.db import transaction
 from django.http import Http404
 from django.shortcuts import get_object_or_404
 from warehouse.models import Entrepot
-from .models import Utilisateur
+from .models import Utilisateur, UtilisateurEntrepot
+
+NO_ACCESS = (False, False, False)
+FULL_ACCESS = (True, True, True)
+ACCESS_INDEX = {'read': 0, 'write': 1, 'delete': 2}
+
+# Warehouse access (peut_lire / peut_modifier / peut_supprimer) needed by each HTTP method
+WAREHOUSE_ACCESS_BY_METHOD = {
+    'GET': 'read', 'HEAD': 'read', 'OPTIONS': 'read',
+    'POST': 'write', 'PUT': 'write', 'PATCH': 'write',
+    'DELETE': 'delete',
+}
+
+# Largest number of objects a bulk request may touch
+BULK_MAX_OBJECTS = 500
+
+
+class PermissionContext:
+    """
+    What a user may do, loaded once per request: group names, the
+    "all warehouses" flag and the warehouse grants as
+    {entrepot_id: (read, write, delete)}.
+    """
+    def __init__(self, user_id=None, is_superuser=False, group_names=(), utilisateur_id=None,
+                 acces_tous_entrepots=False, warehouses=None):
+        self.user_id = user_id
+        self.is_superuser = is_superuser
+        self.group_names = frozenset(group_names)
+        self.utilisateur_id = utilisateur_id
+        self.acces_tous_entrepots = acces_tous_entrepots
+        self.warehouses = warehouses or {}
+        self._warehouse_ids = tuple(sorted(self.warehouses))
+
+    @classmethod
+    def load(cls, user):
+        """Two queries at most: groups and profile, then warehouse grants"""
+        if not user.is_authenticated:
+            return cls()
+        rows = list(User.objects.filter(pk=user.pk).values_list(
+            'groups__name', 'utilisateur__id', 'utilisateur__acces_tous_entrepots'
+        ))
+        group_names = {name for name, _, _ in rows if name}
+        utilisateur_id, acces_tous_entrepots = rows[0][1:] if rows else (None, False)
+        warehouses = {}
+        if utilisateur_id is not None and not acces_tous_entrepots:
+            warehouses = {
+                entrepot_id: (lire, modifier, supprimer)
+                for entrepot_id, lire, modifier, supprimer in UtilisateurEntrepot.objects.filter(
+                    utilisateur_id=utilisateur_id
+                ).values_list('entrepot_id', 'peut_lire', 'peut_modifier', 'peut_supprimer')
+            }
+        return cls(user.pk, user.is_superuser, group_names, utilisateur_id, bool(acces_tous_entrepots), warehouses)
+
+    @property
+    def has_profile(self):
+        return self.utilisateur_id is not None
+
+    @property
+    def warehouse_ids(self):
+        """IDs of the accessible warehouses as a tuple, or None when unrestricted"""
+        if self.has_profile and self.acces_tous_entrepots:
+            return None
+        return self._warehouse_ids
+
+    def warehouse_ids_with(self, access):
+        """IDs of the warehouses granting ``access`` as a tuple, or None when unrestricted"""
+        if self.has_profile and self.acces_tous_entrepots:
+            return None
+        index = ACCESS_INDEX[access]
+        return tuple(entrepot_id for entrepot_id in self._warehouse_ids if self.warehouses[entrepot_id][index])
+
+    def in_groups(self, group_names):
+        return not self.group_names.isdisjoint(group_names)
+
+    def has_any_warehouse(self):
+        return self.has_profile and (self.acces_tous_entrepots or bool(self.warehouses))
+
+    def has_warehouse_access(self, entrepot_id):
+        return self.has_profile and (self.acces_tous_entrepots or entrepot_id in self.warehouses)
+
+    def warehouse_access(self, entrepot_id):
+        """(read, write, delete) for a warehouse"""
+        if not self.has_profile:
+            return NO_ACCESS
+        if self.acces_tous_entrepots:
+            return FULL_ACCESS
+        return self.warehouses.get(entrepot_id, NO_ACCESS)
+
+    def can_access_warehouse(self, entrepot_id, access='read'):
+        return self.warehouse_access(entrepot_id)[ACCESS_INDEX[access]]
+
+
+# Cross-request cache of permission contexts. Each user has a version number
+# in the cache, bumped by the signals in users_app.signals whenever their
+# groups, profile or warehouse grants change; a cached context is only used
+# while its version is current.
+PERMISSION_CACHE_PREFIX = 'sib:permissions'
+_cache_stats = {'hits': 0, 'misses': 0}
+_cache_stats_lock = threading.Lock()
+
+
+def _version_key(user_id):
+    return f'{PERMISSION_CACHE_PREFIX}:version:{user_id}'
+
+
+def _context_key(user_id):
+    return f'{PERMISSION_CACHE_PREFIX}:context:{user_id}'
+
+
+def _count(outcome):
+    with _cache_stats_lock:
+        _cache_stats[outcome] += 1
+
+
+def load_permission_context(user):
+    """PermissionContext from the cache when current, otherwise from the database"""
+    timeout = settings.PERMISSION_CACHE_TIMEOUT
+    if not timeout or not user.is_authenticated:
+        return PermissionContext.load(user)
+
+    version_key, context_key = _version_key(user.pk), _context_key(user.pk)
+    cached = cache.get_many([version_key, context_key])
+    version = cached.get(version_key)
+    if version is None:
+        # Start from a value no earlier snapshot can carry
+        cache.add(version_key, time.time_ns(), None)
+        version = cache.get(version_key)
+    snapshot = cached.get(context_key)
+    if snapshot is not None and snapshot[0] == version:
+        _count('hits')
+        return snapshot[1]
+
+    _count('misses')
+    context = PermissionContext.load(user)
+    cache.set(context_key, (version, context), timeout)
+    return context
+
+
+def invalidate_permission_cache(*user_ids):
+    """Make the cached permission contexts of these users stale once the transaction commits"""
+    def bump():
+        for user_id in user_ids:
+            try:
+                cache.incr(_version_key(user_id))
+            except ValueError:
+                pass  # no version yet: the next read starts a new one
+    if user_ids:
+        transaction.on_commit(bump)
+
+
+def permission_cache_stats():
+    """Hits and misses of the permission cache in this process"""
+    with _cache_stats_lock:
+        hits, misses = _cache_stats['hits'], _cache_stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+        'timeout': settings.PERMISSION_CACHE_TIMEOUT,
+    }
+
+
+def get_permission_context(user):
+    """
+    PermissionContext of ``user``, kept on the user object so that every
+    permission check of the request shares it
+    """
+    context = getattr(user, '_permission_context', None)
+    if context is None or context.user_id != user.pk:
+        context = load_permission_context(user)
+        if user.is_authenticated:
+            user._permission_context = context
+    return context
+
+
+def access_for_method(method):
+    """'read', 'write' or 'delete' for an HTTP method"""
+    return WAREHOUSE_ACCESS_BY_METHOD.get(method.upper(), 'write')
+
+
+def split_objects_by_warehouse_access(user, objects, access='read'):
+    """
+    Check a batch of objects against the user's warehouse grants in one pass
+    and without queries. Returns (allowed, denied); objects that belong to
+    no warehouse are denied.
+    """
+    objects = list(objects)
+    if user.is_superuser:
+        return objects, []
+    context = get_permission_context(user)
+    allowed, denied = [], []
+    for obj in objects:
+        entrepot_id = get_object_warehouse_id(obj)
+        if entrepot_id is not None and context.can_access_warehouse(entrepot_id, access):
+            allowed.append(obj)
+        else:
+            denied.append(obj)
+    return allowed, denied
+
+
+def get_object_warehouse_id(obj):
+    """ID of the warehouse an object belongs to, without loading it"""
+    if isinstance(obj, Entrepot):
+        return obj.pk
+    for field in ('entrepot', 'entrepot_source', 'entrepot_destination'):
+        if hasattr(obj, f'{field}_id'):
+            return getattr(obj, f'{field}_id')
+        if hasattr(obj, field):
+            entrepot = getattr(obj, field)
+            return entrepot.pk if entrepot else None
+    return None
 
 # Base permission classes that work with Django groups
 class HasGroupPermission(permissions.BasePermission):
@@ -23,8 +242,7 @@ class HasGroupPermission(permissions.BasePermission):
             return True
         
         # Check if user belongs to any of the required groups
-        user_groups = request.user.groups.all()
-        return any(group.name in self.required_groups for group in user_groups)
+        return get_permission_context(request.user).in_groups(self.required_groups)
 
 class IsAdminOrReadOnly(HasGroupPermission):
     """
@@ -75,13 +293,7 @@ class HasWarehouseAccess(permissions.BasePermission):
             return True
         
         # Check if user has any warehouse access
-        try:
-            utilisateur = request.user.utilisateur
-            if utilisateur.acces_tous_entrepots:
-                return True
-            return utilisateur.entrepots_autorises.exists()
-        except Utilisateur.DoesNotExist:
-            return False
+        return get_permission_context(request.user).has_any_warehouse()
 
 class CanViewWarehouseStock(HasWarehouseAccess):
     """
@@ -92,9 +304,8 @@ class CanViewWarehouseStock(HasWarehouseAccess):
             return False
         
         # Check if user belongs to groups that can view stock
-        user_groups = request.user.groups.all()
         allowed_groups = ['Commerciaux', 'Magasiniers', 'Ouvriers de production', 'Administrateurs']
-        return any(group.name in allowed_groups for group in user_groups)
+        return get_permission_context(request.user).in_groups(allowed_groups)
 
 class CanManageWarehouseStock(HasWarehouseAccess):
     """
@@ -105,9 +316,8 @@ class CanManageWarehouseStock(HasWarehouseAccess):
             return False
         
         # Check if user belongs to groups that can manage stock
-        user_groups = request.user.groups.all()
         allowed_groups = ['Magasiniers', 'Administrateurs']
-        return any(group.name in allowed_groups for group in user_groups)
+        return get_permission_context(request.user).in_groups(allowed_groups)
 
 class CanAccessWarehouse(HasWarehouseAccess):
     """
@@ -183,26 +393,30 @@ class IsOwnerOrAdmin(permissions.BasePermission):
             return True
         
         # Check if user belongs to Administrateurs group
-        user_groups = request.user.groups.all()
-        if any(group.name == 'Administrateurs' for group in user_groups):
+        context = get_permission_context(request.user)
+        if context.in_groups(['Administrateurs']):
             return True
+        if not context.has_profile:
+            return False
         
-        # Check if user is the owner of the object
-        if hasattr(obj, 'id_expediteur'):
-            return obj.id_expediteur == request.user.utilisateur
-        elif hasattr(obj, 'cree_par'):
-            return obj.cree_par == request.user.utilisateur
-        elif hasattr(obj, 'utilisateur'):
-            return obj.utilisateur == request.user.utilisateur
+        # Check if user is the owner of the object (compare ids, no fetch)
+        for field in ('id_expediteur', 'cree_par', 'utilisateur'):
+            if hasattr(obj, f'{field}_id'):
+                return getattr(obj, f'{field}_id') == context.utilisateur_id
         
         return False
 
 # Object-level permissions for warehouse access
 class HasWarehouseObjectPermission(permissions.BasePermission):
     """
-    Check if user has access to a specific warehouse object
+    Check if user has access to a specific warehouse object: read for safe
+    methods, write for POST/PUT/PATCH and delete for DELETE
     """
     def has_object_permission(self, request, view, obj):
+        return self.has_objects_permission(request, view, [obj])
+
+    def has_objects_permission(self, request, view, objects):
+        """Batch version of has_object_permission: True if every object passes"""
         if not request.user.is_authenticated:
             return False
         
@@ -210,26 +424,8 @@ class HasWarehouseObjectPermission(permissions.BasePermission):
         if request.user.is_superuser:
             return True
         
-        # Get the warehouse from the object
-        entrepot = None
-        if hasattr(obj, 'entrepot'):
-            entrepot = obj.entrepot
-        elif hasattr(obj, 'entrepot_source'):
-            entrepot = obj.entrepot_source
-        elif hasattr(obj, 'entrepot_destination'):
-            entrepot = obj.entrepot_destination
-        
-        if not entrepot:
-            return False
-        
-        # Check warehouse access
-        try:
-            utilisateur = request.user.utilisateur
-            if utilisateur.acces_tous_entrepots:
-                return True
-            return utilisateur.entrepots_autorises.filter(entrepot=entrepot).exists()
-        except Utilisateur.DoesNotExist:
-            return False
+        _, denied = split_objects_by_warehouse_access(request.user, objects, access_for_method(request.method))
+        return not denied
 
 # Utility functions for warehouse access
 def get_user_warehouse_permissions(user, entrepot):
@@ -237,39 +433,26 @@ def get_user_warehouse_permissions(user, entrepot):
     Get warehouse-specific permissions for a user
     Returns a dict with permissions: {'read': True, 'write': False, 'delete': False}
     """
-    try:
-        utilisateur = user.utilisateur
-    except Utilisateur.DoesNotExist:
-        return {'read': False, 'write': False, 'delete': False}
-    
-    # If user has access to all warehouses
-    if utilisateur.acces_tous_entrepots:
-        return {'read': True, 'write': True, 'delete': True}
-    
-    # Check specific warehouse permissions
-    try:
-        access = utilisateur.entrepots_autorises.get(entrepot=entrepot)
-        return {
-            'read': access.peut_lire,
-            'write': access.peut_modifier,
-            'delete': access.peut_supprimer
-        }
-    except:
-        return {'read': False, 'write': False, 'delete': False}
+    entrepot_id = getattr(entrepot, 'pk', entrepot)
+    read, write, delete = get_permission_context(user).warehouse_access(entrepot_id)
+    return {'read': read, 'write': write, 'delete': delete}
+
+def get_user_accessible_warehouse_ids(user):
+    """
+    IDs of the warehouses a user has access to, as a tuple, or None when the
+    user has access to all of them (no filter needed)
+    """
+    return get_permission_context(user).warehouse_ids
 
 def get_user_accessible_warehouses(user):
     """
     Get all warehouses a user has access to
     """
-    try:
-        utilisateur = user.utilisateur
-    except Utilisateur.DoesNotExist:
-        return Entrepot.objects.none()
-    
-    if utilisateur.acces_tous_entrepots:
+    warehouse_ids = get_user_accessible_warehouse_ids(user)
+    if warehouse_ids is None:
         return Entrepot.objects.all()
     
-    return Entrepot.objects.filter(utilisateurs_autorises__utilisateur=utilisateur).distinct()
+    return Entrepot.objects.filter(pk__in=warehouse_ids)
 
 def require_warehouse_access(permission_type='read'):
     """
@@ -300,8 +483,10 @@ def filter_queryset_by_warehouse_access(queryset, user, warehouse_field='entrepo
     """
     Filter a queryset to only show items from warehouses the user has access to
     """
-    accessible_warehouses = get_user_accessible_warehouses(user)
-    return queryset.filter(**{f'{warehouse_field}__in': accessible_warehouses})
+    warehouse_ids = get_user_accessible_warehouse_ids(user)
+    if warehouse_ids is None:
+        return queryset
+    return queryset.filter(**{f'{warehouse_field}_id__in': warehouse_ids})
 
 class WarehouseAccessMixin:
     """
@@ -318,6 +503,74 @@ class WarehouseAccessMixin:
         context['accessible_warehouses'] = get_user_accessible_warehouses(self.request.user)
         return context
 
+class WarehouseBulkMixin:
+    """
+    Bulk endpoint for a ModelViewSet whose objects belong to a warehouse:
+    ``PATCH <list>/bulk/`` with [{"id": ..., <fields>}, ...] updates and
+    ``DELETE <list>/bulk/`` with {"ids": [...]} deletes. All objects are
+    checked against the user's warehouse grants in one pass and nothing is
+    changed if any of them is denied. Warehouses named in
+    ``warehouse_target_fields`` by an update need write access as well.
+    """
+    warehouse_target_fields = ('entrepot',)
+
+    @action(detail=False, methods=['patch', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        if request.method == 'DELETE':
+            items = None
+            ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        else:
+            items = request.data if isinstance(request.data, list) else None
+            ids = [item.get('id') for item in items if isinstance(item, dict)] if items is not None else None
+        try:
+            ids = [int(pk) for pk in ids]
+        except (TypeError, ValueError):
+            ids = None
+        if not ids or (items is not None and len(ids) != len(items)):
+            return Response({"error": "Liste d'objets avec leur id requise"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > BULK_MAX_OBJECTS or len(set(ids)) != len(ids):
+            return Response(
+                {"error": f"Au plus {BULK_MAX_OBJECTS} objets distincts par requête"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        objects = {obj.pk: obj for obj in self.get_queryset().filter(pk__in=ids)}
+        missing = [pk for pk in ids if pk not in objects]
+        if missing:
+            return Response({"error": "Objets non trouvés", "ids": missing}, status=status.HTTP_404_NOT_FOUND)
+        _, denied = split_objects_by_warehouse_access(request.user, objects.values(), access_for_method(request.method))
+        if denied:
+            return Response(
+                {"error": "Permissions insuffisantes sur l'entrepôt", "ids": [obj.pk for obj in denied]},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        if items is None:
+            with transaction.atomic():
+                for obj in objects.values():
+                    self.perform_destroy(obj)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        serializers = [self.get_serializer(objects[int(item['id'])], data=item, partial=True) for item in items]
+        errors = {serializer.instance.pk: serializer.errors for serializer in serializers if not serializer.is_valid()}
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        # Moving an object to another warehouse needs write access there too
+        targets = [
+            serializer.validated_data[field] for serializer in serializers for field in self.warehouse_target_fields
+            if serializer.validated_data.get(field)
+        ]
+        _, denied = split_objects_by_warehouse_access(request.user, targets, 'write')
+        if denied:
+            return Response(
+                {"error": "Permissions insuffisantes sur l'entrepôt", "entrepots": sorted({e.pk for e in denied})},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        with transaction.atomic():
+            for serializer in serializers:
+                self.perform_update(serializer)
+        return Response([serializer.data for serializer in serializers])
+
 def create_warehouse_permissions():
     """
     Create custom permissions for warehouse access
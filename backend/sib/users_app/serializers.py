@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User, Group
 from .models import Utilisateur, UtilisateurEntrepot
+from sib.fieldsets import SparseFieldsetMixin
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -72,7 +73,7 @@ class UtilisateurEntrepotSerializer(serializers.ModelSerializer):
         fields = ('id', 'entrepot', 'entrepot_nom', 'peut_lire', 'peut_modifier', 'peut_supprimer', 'permissions_summary', 'date_creation')
         read_only_fields = ('id', 'date_creation', 'permissions_summary')
 
-class UtilisateurSerializer(serializers.ModelSerializer):
+class UtilisateurSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True) # Affiche les détails de l'utilisateur Django lié
     user_id = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(), source='user', write_only=True, required=False
@@ -106,6 +107,7 @@ class UtilisateurSerializer(serializers.ModelSerializer):
             'entrepots_autorises', 'entrepots_ids'
         )
         read_only_fields = ('id', 'cree_le')
+        expandable_fields = ('user', 'entrepots_autorises')
 
     def create(self, validated_data):
         entrepots_ids = validated_data.pop('entrepots_ids', [])
@@ -1,7 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User, Group
-from .models import Utilisateur
+from .models import Utilisateur, UtilisateurEntrepot
+from .permissions import invalidate_permission_cache
+from .authentication import invalidate_token_cache, invalidate_user_tokens
+from rest_framework.authtoken.models import Token
 
 @receiver(post_save, sender=User)
 def create_or_update_user_profile(sender, instance, created, **kwargs):
@@ -34,3 +37,53 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
                 user=instance, 
                 nom=instance.username
             )
+
+
+# Permission cache invalidation (see users_app.permissions.load_permission_context)
+@receiver([post_save, post_delete], sender=Utilisateur)
+def invalidate_profile_permissions(sender, instance, **kwargs):
+    invalidate_permission_cache(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=UtilisateurEntrepot)
+def invalidate_warehouse_permissions(sender, instance, **kwargs):
+    user_id = Utilisateur.objects.filter(pk=instance.utilisateur_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        invalidate_permission_cache(user_id)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_group_membership_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # user.groups.add/remove/clear
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_permission_cache(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        # group.user_set.add/remove
+        invalidate_permission_cache(*pk_set)
+    elif action == 'pre_clear':
+        invalidate_permission_cache(*instance.user_set.values_list('pk', flat=True))
+
+
+@receiver([post_save, pre_delete], sender=Group)
+def invalidate_group_permissions(sender, instance, **kwargs):
+    # Renaming or deleting a group changes what its members may do
+    invalidate_permission_cache(*instance.user_set.values_list('pk', flat=True))
+
+
+# Token cache invalidation (see users_app.authentication)
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token_cache(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_token_cache(sender, instance, created, **kwargs):
+    # Covers deactivation (is_active=False) and any change to the cached user
+    if not created:
+        invalidate_user_tokens(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Utilisateur)
+def invalidate_profile_token_cache(sender, instance, **kwargs):
+    invalidate_user_tokens(instance.user_id)
@@ -0,0 +1,271 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.contrib.auth.models import Group, User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from inventory_app.models import MouvementStock, ProduitFini, Stock
+from sales_app.models import Client
+from warehouse.models import Entrepot
+
+from .authentication import CachedTokenAuthentication
+from .models import UtilisateurEntrepot
+from .permissions import (
+    FULL_ACCESS, NO_ACCESS, HasWarehouseObjectPermission, PermissionContext, filter_queryset_by_warehouse_access,
+    get_permission_context, load_permission_context, split_objects_by_warehouse_access,
+)
+
+
+@override_settings(PERMISSION_CACHE_TIMEOUT=300)
+class PermissionCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.magasiniers = Group.objects.create(name='Magasiniers')
+        cls.user = User.objects.create_user('magasinier', password='x')
+        cls.entrepot = Entrepot.objects.create(nom='Entrepôt A')
+
+    def setUp(self):
+        cache.clear()
+
+    def context(self):
+        return load_permission_context(User.objects.get(pk=self.user.pk))
+
+    def test_context_is_cached(self):
+        user = User.objects.get(pk=self.user.pk)
+        load_permission_context(user)
+        with self.assertNumQueries(0):
+            load_permission_context(user)
+        with override_settings(PERMISSION_CACHE_TIMEOUT=0), self.assertNumQueries(2):
+            load_permission_context(user)
+
+    def test_warehouse_grants_invalidate(self):
+        self.assertEqual(self.context().warehouses, {})
+        with self.captureOnCommitCallbacks(execute=True):
+            grant = UtilisateurEntrepot.objects.create(
+                utilisateur=self.user.utilisateur, entrepot=self.entrepot, peut_modifier=True
+            )
+            self.assertEqual(self.context().warehouses, {})  # stale until the commit
+        self.assertEqual(self.context().warehouses, {self.entrepot.pk: (True, True, False)})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            grant.peut_supprimer = True
+            grant.save()
+        self.assertEqual(self.context().warehouses, {self.entrepot.pk: (True, True, True)})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            grant.delete()
+        self.assertEqual(self.context().warehouses, {})
+
+    def test_profile_invalidates(self):
+        self.assertEqual(self.context().warehouse_ids, ())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.utilisateur.acces_tous_entrepots = True
+            self.user.utilisateur.save()
+        self.assertIsNone(self.context().warehouse_ids)
+
+    def test_group_changes_invalidate(self):
+        self.assertFalse(self.context().in_groups(['Magasiniers']))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(self.magasiniers)
+        self.assertTrue(self.context().in_groups(['Magasiniers']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.magasiniers.user_set.remove(self.user)
+        self.assertFalse(self.context().in_groups(['Magasiniers']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.magasiniers.user_set.add(self.user)
+        self.assertTrue(self.context().in_groups(['Magasiniers']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.magasiniers.name = 'Magasiniers (ancien)'
+            self.magasiniers.save()
+        self.assertFalse(self.context().in_groups(['Magasiniers']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.magasiniers.delete()
+        self.assertEqual(self.context().group_names, frozenset())
+
+
+@override_settings(TOKEN_CACHE_TIMEOUT=300)
+class TokenCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('commercial', password='x')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.authentication = CachedTokenAuthentication()
+
+    def test_token_is_cached(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            user, token = self.authentication.authenticate_credentials(self.token.key)
+        self.assertEqual((user.pk, token.key), (self.user.pk, self.token.key))
+        self.assertEqual(user.utilisateur.pk, self.user.utilisateur.pk)
+
+    def test_deactivated_user_is_refused(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)
+
+    def test_deleted_token_is_refused(self):
+        key = self.token.key
+        self.authentication.authenticate_credentials(key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(key)
+
+    def test_deleted_user_is_refused(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)
+
+
+@override_settings(PERMISSION_CACHE_TIMEOUT=0)
+class WarehousePermissionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.lecture, cls.ecriture, cls.suppression, cls.aucun = [
+            Entrepot.objects.create(nom=nom) for nom in ('Lecture', 'Écriture', 'Suppression', 'Aucun')
+        ]
+        cls.user = User.objects.create_user('magasinier', password='x')
+        cls.user.groups.add(Group.objects.create(name='Magasiniers'))
+        for entrepot, modifier, supprimer in ((cls.lecture, False, False), (cls.ecriture, True, False), (cls.suppression, True, True)):
+            UtilisateurEntrepot.objects.create(
+                utilisateur=cls.user.utilisateur, entrepot=entrepot, peut_modifier=modifier, peut_supprimer=supprimer
+            )
+        cls.tous = User.objects.create_user('responsable', password='x')
+        cls.tous.utilisateur.acces_tous_entrepots = True
+        cls.tous.utilisateur.save()
+        produit = ProduitFini.objects.create(nom='Produit', code_reference='PF1', unite='u')
+        cls.stocks = {
+            entrepot.pk: Stock.objects.create(
+                type_article='fini', content_type=ContentType.objects.get_for_model(ProduitFini),
+                id_article=produit.pk, entrepot=entrepot, quantite=Decimal(10),
+            )
+            for entrepot in (cls.lecture, cls.ecriture, cls.suppression, cls.aucun)
+        }
+
+    def setUp(self):
+        cache.clear()
+
+    def fresh(self, user):
+        return User.objects.get(pk=user.pk)
+
+    def test_grants(self):
+        context = PermissionContext.load(self.user)
+        self.assertEqual(context.warehouse_access(self.lecture.pk), (True, False, False))
+        self.assertEqual(context.warehouse_access(self.ecriture.pk), (True, True, False))
+        self.assertEqual(context.warehouse_access(self.suppression.pk), FULL_ACCESS)
+        self.assertEqual(context.warehouse_access(self.aucun.pk), NO_ACCESS)
+        self.assertTrue(context.can_access_warehouse(self.ecriture.pk, 'write'))
+        self.assertFalse(context.can_access_warehouse(self.ecriture.pk, 'delete'))
+        self.assertFalse(context.has_warehouse_access(self.aucun.pk))
+        self.assertEqual(context.warehouse_ids, tuple(sorted([self.lecture.pk, self.ecriture.pk, self.suppression.pk])))
+
+    def test_acces_tous_entrepots(self):
+        context = PermissionContext.load(self.tous)
+        self.assertIsNone(context.warehouse_ids)
+        self.assertEqual(context.warehouses, {})  # grants are not even loaded
+        self.assertEqual(context.warehouse_access(self.aucun.pk), FULL_ACCESS)
+        self.assertTrue(context.has_any_warehouse())
+
+    def test_user_without_profile_has_no_access(self):
+        self.user.utilisateur.delete()
+        context = PermissionContext.load(self.fresh(self.user))
+        self.assertFalse(context.has_profile)
+        self.assertEqual(context.warehouse_access(self.suppression.pk), NO_ACCESS)
+        self.assertFalse(context.has_any_warehouse())
+
+    def test_context_is_loaded_once_per_user_object(self):
+        user = self.fresh(self.user)
+        with self.assertNumQueries(2):
+            get_permission_context(user)
+            get_permission_context(user)
+
+    def test_filter_queryset_by_warehouse_access(self):
+        user = self.fresh(self.user)
+        queryset = filter_queryset_by_warehouse_access(Stock.objects.all(), user)
+        self.assertNotIn(UtilisateurEntrepot._meta.db_table, str(queryset.query))  # ids inlined, no subquery
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                sorted(stock.entrepot_id for stock in queryset), sorted([self.lecture.pk, self.ecriture.pk, self.suppression.pk])
+            )
+        self.assertEqual(set(filter_queryset_by_warehouse_access(Stock.objects.all(), self.fresh(self.tous))), set(self.stocks.values()))
+
+        self.user.utilisateur.delete()
+        self.assertFalse(filter_queryset_by_warehouse_access(Stock.objects.all(), self.fresh(self.user)).exists())
+
+    def test_split_mixed_batch(self):
+        stocks = [self.stocks[entrepot.pk] for entrepot in (self.lecture, self.ecriture, self.suppression, self.aucun)]
+        sans_entrepot = Client(pk=1, nom_entreprise='Client')
+        for access, nombre in (('read', 3), ('write', 2), ('delete', 1)):
+            user = self.fresh(self.user)
+            with self.assertNumQueries(2):  # the permission context only
+                allowed, denied = split_objects_by_warehouse_access(user, stocks + [sans_entrepot], access)
+            self.assertEqual(allowed, stocks[3 - nombre:3], access)
+            self.assertEqual(denied, stocks[:3 - nombre] + stocks[3:] + [sans_entrepot], access)
+
+        allowed, denied = split_objects_by_warehouse_access(self.fresh(self.tous), stocks + [sans_entrepot], 'delete')
+        self.assertEqual((allowed, denied), (stocks, [sans_entrepot]))
+
+    def test_has_objects_permission(self):
+        permission = HasWarehouseObjectPermission()
+        stocks = [self.stocks[self.ecriture.pk], self.stocks[self.suppression.pk]]
+        for method, attendu in (('GET', True), ('PATCH', True), ('DELETE', False)):
+            request = SimpleNamespace(user=self.fresh(self.user), method=method)
+            self.assertEqual(permission.has_objects_permission(request, None, stocks), attendu, method)
+        request = SimpleNamespace(user=self.fresh(self.user), method='GET')
+        self.assertFalse(permission.has_object_permission(request, None, self.stocks[self.aucun.pk]))
+
+    def test_movement_bulk_endpoint(self):
+        mouvements = {
+            entrepot.pk: MouvementStock.objects.create(
+                type_mouvement='entree', motif='reception', content_type=self.stocks[entrepot.pk].content_type,
+                id_article=self.stocks[entrepot.pk].id_article, quantite=Decimal(5), entrepot=entrepot,
+                utilisateur=self.tous.utilisateur,
+            )
+            for entrepot in (self.lecture, self.ecriture, self.suppression)
+        }
+        api = APIClient()
+        api.force_authenticate(self.user)
+        url = '/api/v1/inventory/mouvements-stock/bulk/'
+
+        response = api.patch(url, [
+            {'id': mouvements[self.ecriture.pk].pk, 'quantite': '7.00'},
+            {'id': mouvements[self.lecture.pk].pk, 'quantite': '7.00'},
+        ], format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['ids'], [mouvements[self.lecture.pk].pk])
+        self.assertFalse(MouvementStock.objects.filter(quantite=7).exists())
+
+        response = api.patch(url, [{'id': mouvements[self.ecriture.pk].pk, 'entrepot_source': self.aucun.pk}], format='json')
+        self.assertEqual((response.status_code, response.data['entrepots']), (403, [self.aucun.pk]))
+
+        response = api.patch(url, [
+            {'id': mouvements[self.ecriture.pk].pk, 'quantite': '7.00'},
+            {'id': mouvements[self.suppression.pk].pk, 'quantite': '7.00'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(MouvementStock.objects.filter(quantite=7).count(), 2)
+
+        ids = [mouvements[self.ecriture.pk].pk, mouvements[self.suppression.pk].pk]
+        self.assertEqual(api.delete(url, {'ids': ids}, format='json').status_code, 403)
+        self.assertEqual(api.delete(url, {'ids': ids[1:]}, format='json').status_code, 204)
+        self.assertEqual(MouvementStock.objects.count(), 2)
@@ -1,10 +1,11 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path
-from .views import UtilisateurViewSet, CurrentUserView
+from .views import UtilisateurViewSet, CurrentUserView, PermissionCacheStatsView
 
 router = DefaultRouter()
 router.register(r'utilisateurs', UtilisateurViewSet)
 
 urlpatterns = router.urls + [
     path('me/', CurrentUserView.as_view(), name='current_user_profile'),
+    path('permission-cache/', PermissionCacheStatsView.as_view(), name='permission_cache_stats'),
 ]
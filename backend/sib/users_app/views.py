@@ -4,12 +4,13 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from .models import Utilisateur
 from .serializers import UtilisateurSerializer, UserSerializer # Import UserSerializer
-from .permissions import IsAdmin, IsAdminOrReadOnly, CanManageUsers
+from .permissions import IsAdmin, IsAdminOrReadOnly, CanManageUsers, get_permission_context, permission_cache_stats
 from logs_app.mixins import LoggingMixin
+from sib.fieldsets import SparseQuerysetMixin
 from django.core.exceptions import ObjectDoesNotExist
 
-class UtilisateurViewSet(LoggingMixin, viewsets.ModelViewSet):
-    queryset = Utilisateur.objects.all().select_related('user')
+class UtilisateurViewSet(SparseQuerysetMixin, LoggingMixin, viewsets.ModelViewSet):
+    queryset = Utilisateur.objects.all()  # related rows: see SparseQuerysetMixin
     serializer_class = UtilisateurSerializer
     permission_classes = [CanManageUsers]  # Only admins can manage users
 
@@ -19,14 +20,14 @@ class UtilisateurViewSet(LoggingMixin, viewsets.ModelViewSet):
 
         # Check if user is superuser or staff
         if self.request.user.is_staff or self.request.user.is_superuser:
-            return Utilisateur.objects.all().select_related('user')
+            return self.queryset.all()
 
         # Check if user belongs to Administrateurs group
-        if self.request.user.groups.filter(name='Administrateurs').exists():
-            return Utilisateur.objects.all().select_related('user')
+        if get_permission_context(self.request.user).in_groups(['Administrateurs']):
+            return self.queryset.all()
         
         # Regular users can only see their own profile
-        return Utilisateur.objects.filter(user=self.request.user).select_related('user')
+        return self.queryset.filter(user=self.request.user)
 
     def destroy(self, request, *args, **kwargs):
         """Override destroy method to handle cascade deletion properly"""
@@ -57,3 +58,10 @@ class CurrentUserView(APIView):
                 {"detail": "User profile not found"}, 
                 status=404
             )
+
+class PermissionCacheStatsView(APIView):
+    """Hit rate of the permission cache in the worker process serving the request"""
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return Response(permission_cache_stats())
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from .models import Entrepot
-from users_app.permissions import get_user_accessible_warehouses
+from users_app.permissions import get_permission_context
 
 @admin.register(Entrepot)
 class EntrepotAdmin(admin.ModelAdmin):
@@ -14,12 +14,9 @@ class EntrepotAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         
         # If user has access to all warehouses, show everything
-        if hasattr(request.user, 'utilisateur') and request.user.utilisateur:
-            if request.user.utilisateur.acces_tous_entrepots:
-                return qs
-            else:
-                # Only show warehouses the user has access to
-                accessible_warehouses = get_user_accessible_warehouses(request.user)
-                return qs.filter(id__in=accessible_warehouses.values_list('id', flat=True))
+        context = get_permission_context(request.user)
+        if context.has_profile and not context.acces_tous_entrepots:
+            # Only show warehouses the user has access to
+            return qs.filter(id__in=context.warehouse_ids)
         
         return qs